@@ -0,0 +1,256 @@
+"""
+End to end timings of the explorer and log viewer against the local fake API server of fake_apiserver.py, headless.
+
+    PYTHONPATH=. python benchmarks/bench_cluster.py --contexts 2 --namespaces 20 --objects 2000 --crds 10 --output bench.jsonl
+    PYTHONPATH=. python benchmarks/bench_cluster.py --contexts 2 --namespaces 20 --objects 2000 --crds 10 --compare bench.jsonl
+
+Every phase runs in a fresh interpreter, so import time counts towards the first paint and peak RSS is its own:
+  cold  empty snapshot cache: first paint, expanding --expand namespaces of every context, following the logs of a
+        Deployment for --log-seconds
+  warm  the same expands again, painted from the snapshot the cold phase saved
+
+Both phases run --repeat times against a new snapshot cache each time, the median of every metric is reported.
+Widgets are painted at most every --paint-interval seconds while something changed, like Textual does on idle.
+Results are one JSON line per run, --output appends it to a file and --compare prints the change against the last run in
+a file that used the same arguments.
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from fake_apiserver import FakeApiServer, add_arguments, cluster_args
+
+# Imports of t9s happen in the measured phase, the first paint is timed from here
+START = time.perf_counter()
+
+# Metrics where more is better, every other one is a time or a size
+HIGHER_IS_BETTER = {"log_lines_per_s"}
+
+
+class HeadlessApp:
+    """What the widgets ask the running App for, a console that renders into memory and a log"""
+
+    def __init__(self, width, height, verbose=False):
+        from rich.console import Console
+
+        self.console = Console(file=io.StringIO(), width=width, height=height, force_terminal=True, color_system="truecolor")
+        self.verbose = verbose
+
+    def log(self, *args, **kwargs) -> None:
+        print(*args, file=sys.stderr) if self.verbose else None
+
+
+class Screen:
+    """Stands in for the Textual compositor: refresh() marks a widget, paint() renders every marked widget"""
+
+    def __init__(self, app: HeadlessApp, interval):
+        from textual._context import active_app
+
+        active_app.set(app)
+        self.interval = interval
+        self.dirty = set()
+        self.painted = 0.0
+
+    def attach(self, widget, width, height):
+        from textual.geometry import Size
+
+        widget._update_size(Size(width, height))
+        widget.refresh = lambda *args, **kwargs: self.dirty.add(widget)
+        return widget
+
+    def paint(self, force=False) -> None:
+        if not force and time.perf_counter() - self.painted < self.interval:
+            return
+        for widget in list(self.dirty):
+            widget.render_lines()
+        self.dirty.clear()
+        self.painted = time.perf_counter()
+
+
+def object_nodes(node) -> list:
+    return [child for child in node.children if child.data.kind != "Loading"]
+
+
+async def expand(tree, screen, node) -> dict:
+    """Clicks a namespace node, times until its first objects are painted and until its LIST is complete"""
+    start = time.perf_counter()
+    first = None
+    await tree.start_load(node, tree.load_namespace)
+    while node.id in tree.loading:
+        if first is None and object_nodes(node):
+            screen.paint(force=True)
+            first = time.perf_counter() - start
+        screen.paint()
+        await asyncio.sleep(0.002)
+    screen.paint(force=True)
+    done = time.perf_counter() - start
+    return dict(first_objects_s=done if first is None else first, expand_s=done, nodes=len(object_nodes(node)))
+
+
+async def follow_logs(tree, screen, args) -> dict:
+    from t9s.modules.widgets.log_viewer import LogViewer
+
+    deployment = next(child.data for ctx in tree.root.children for ns in ctx.children for child in ns.children if child.data.kind == "Deployment")
+    viewer = screen.attach(LogViewer(), args.width - 60, args.height - 8)
+    viewer.loop = asyncio.get_running_loop()
+    viewer.update_resource(deployment)
+    # Counted from the first drain on, so the tail lines every stream starts with are left out
+    first, start = None, None
+    while start is None or time.perf_counter() - start < args.log_seconds:
+        # LogViewer drains on a 0.5s timer
+        await asyncio.sleep(0.5)
+        viewer.drain()
+        screen.paint(force=True)
+        if start is None and len(viewer.logs):
+            first, start = viewer.logs.dropped + len(viewer.logs), time.perf_counter()
+    received = viewer.logs.dropped + len(viewer.logs) - first
+    streams = len(viewer.streams.streams)
+    viewer.reset()
+    return dict(log_lines_per_s=round(received / (time.perf_counter() - start)), log_streams=streams)
+
+
+async def run_phase(phase, args) -> dict:
+    app = HeadlessApp(args.width, args.height, verbose=args.verbose)
+    screen = Screen(app, args.paint_interval)
+    from t9s.modules.widgets.explorer import ExplorerTree
+    from t9s.modules.kubernetes.informer import informers
+    from t9s.modules.utils.stats import stats
+
+    tree = screen.attach(ExplorerTree(console=app.console), 60, args.height - 8)
+    await tree.on_mount()
+    contexts = list(tree.root.children)
+    await tree.load_ns(contexts[0])
+    screen.paint(force=True)
+    results = dict(first_paint_s=time.perf_counter() - START)
+
+    expands = list()
+    for ctx in contexts:
+        await tree.load_ns(ctx) if not ctx.loaded else None
+        for node in [n for n in ctx.children if n.data.kind == "Namespace"][: args.expand]:
+            expands.append(await expand(tree, screen, node))
+    results.update(
+        expand_p50_s=statistics.median(e["expand_s"] for e in expands),
+        expand_max_s=max(e["expand_s"] for e in expands),
+        first_objects_p50_s=statistics.median(e["first_objects_s"] for e in expands),
+        tree_nodes=len(tree.nodes),
+    )
+    if phase == "cold" and args.log_seconds > 0:
+        results.update(await follow_logs(tree, screen, args))
+
+    api, renders = stats.rows()
+    results.update(
+        api_requests=sum(row["calls"] for row in api),
+        api_shared=sum(row["shared"] for row in api),
+        api_bytes=sum(row["bytes"] for row in api),
+        **{f"render_p95_ms_{row['widget']}": row["p95_ms"] for row in renders},
+    )
+    informers.stop_all()
+    # ru_maxrss is in KiB on Linux and in bytes on macOS
+    results["peak_rss_mb"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+    return {k: round(v, 4) if isinstance(v, float) else v for k, v in results.items()}
+
+
+def run_child(phase, args, env) -> dict:
+    argv = [sys.executable, os.path.abspath(__file__), "--phase", phase] + sys.argv[1:]
+    out = subprocess.run(argv, env=env, stdout=subprocess.PIPE, check=True, timeout=args.timeout).stdout
+    return json.loads(out.decode().strip().splitlines()[-1])
+
+
+def median(values):
+    value = statistics.median(values)
+    return int(value) if float(value).is_integer() else round(value, 4)
+
+
+def git_revision() -> str:
+    try:
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        revision = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=root, capture_output=True, text=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=root, capture_output=True, text=True).stdout.strip()
+        return revision + ("-dirty" if dirty else "")
+    except OSError:
+        return ""
+
+
+def params(args) -> dict:
+    return dict(contexts=args.contexts, expand=args.expand, log_seconds=args.log_seconds, repeat=args.repeat, **cluster_args(args))
+
+
+def compare(previous: dict, current: dict) -> None:
+    print(f"\ncompared to {previous['revision']} of {time.strftime('%Y-%m-%d %H:%M', time.localtime(previous['ts']))}")
+    print(f"{'metric':<36} {'before':>12} {'after':>12} {'change':>9}")
+    for phase in current["phases"]:
+        for metric, after in current["phases"][phase].items():
+            before = previous["phases"].get(phase, {}).get(metric)
+            if not isinstance(before, (int, float)) or not before:
+                continue
+            change = (after - before) / before * 100
+            better = change > 0 if metric in HIGHER_IS_BETTER else change < 0
+            print(f"{phase + '.' + metric:<36} {before:>12} {after:>12} {change:>+8.1f}%{'' if abs(change) < 5 else ' +' if better else ' -'}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    add_arguments(parser)
+    parser.add_argument("--expand", type=int, default=3, help="namespaces expanded per context")
+    parser.add_argument("--log-seconds", type=float, default=5)
+    parser.add_argument("--width", type=int, default=200)
+    parser.add_argument("--height", type=int, default=60)
+    parser.add_argument("--repeat", type=int, default=3, help="runs of both phases, the median is reported")
+    parser.add_argument("--paint-interval", type=float, default=1 / 30)
+    parser.add_argument("--timeout", type=float, default=600, help="seconds a phase may take")
+    parser.add_argument("--output", help="JSON lines file the result is appended to")
+    parser.add_argument("--compare", help="JSON lines file of earlier results")
+    parser.add_argument("--verbose", action="store_true", help="print the t9s log to stderr")
+    parser.add_argument("--phase", choices=["cold", "warm"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.phase:
+        print(json.dumps(asyncio.run(run_phase(args.phase, args))), flush=True)
+        # Watches and log streams are not waited for
+        os._exit(0)
+
+    server = FakeApiServer(contexts=args.contexts, **cluster_args(args)).start()
+    with tempfile.TemporaryDirectory(prefix="t9s-bench-") as tmp:
+        env = dict(
+            os.environ,
+            KUBECONFIG=server.write_kubeconfig(os.path.join(tmp, "kubeconfig")),
+            T9S_CONFIG=os.path.join(tmp, "config.yaml"),
+            T9S_STATS=os.path.join(tmp, "stats.jsonl"),
+        )
+        try:
+            runs = list()
+            for i in range(args.repeat):
+                # The cold phase of every repeat starts from an empty snapshot cache, the warm one reads what it saved
+                repeat_env = dict(env, T9S_SNAPSHOTS=os.path.join(tmp, f"snapshots-{i}.db"))
+                runs.append({phase: run_child(phase, args, repeat_env) for phase in ["cold", "warm"]})
+        finally:
+            server.stop()
+
+    # Median of each metric over the repeats, one run on a busy machine says little
+    phases = {phase: {metric: median(run[phase].get(metric, 0) for run in runs) for metric in runs[0][phase]} for phase in runs[0]}
+    result = dict(ts=time.time(), revision=git_revision(), python=platform.python_version(), params=params(args), phases=phases)
+    print(f"{'metric':<36} {'value':>12}")
+    for phase, metrics in phases.items():
+        for metric, value in metrics.items():
+            print(f"{phase + '.' + metric:<36} {value:>12}")
+    if args.compare and os.path.exists(args.compare):
+        with open(args.compare) as f:
+            earlier = [r for r in map(json.loads, filter(str.strip, f)) if r.get("params") == result["params"]]
+        compare(earlier[-1], result) if earlier else print(f"\nno earlier run with the same arguments in {args.compare}")
+    if args.output:
+        with open(args.output, "a") as f:
+            f.write(json.dumps(result) + "\n")
+
+
+if __name__ == "__main__":
+    main()
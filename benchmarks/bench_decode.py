@@ -0,0 +1,99 @@
+"""
+Decode time and allocations of a PartialObjectMetadataList page, the body every informer LIST returns, for each JSON
+parser installed (json, orjson, pysimdjson) whole and projected to the fields the tree keeps.
+
+    PYTHONPATH=. python benchmarks/bench_decode.py --objects 500 2000 --managed-fields 2
+
+Time is the median of --repeat runs. Allocations are traced with tracemalloc in a separate run: peak is the most held
+during the decode, retained what the result holds after it. The parse buffers of pysimdjson are not Python allocations
+and do not show up.
+"""
+
+import argparse
+import gc
+import json
+import statistics
+import time
+import tracemalloc
+
+from t9s.modules.kubernetes.decoder import BACKENDS, Decoder
+from t9s.modules.kubernetes.k8s import METADATA_ITEM_FIELDS
+
+
+def managed_fields(manager, containers) -> dict:
+    """What a controller or the kubelet leaves in metadata.managedFields of a Pod, usually most of its metadata"""
+    fields = {
+        "f:metadata": {"f:labels": {".": {}, "f:app": {}, "f:tier": {}}, "f:ownerReferences": {".": {}, 'k:{"uid":"0"}': {}}},
+        "f:spec": {"f:containers": {f'k:{{"name":"c{c}"}}': {".": {}, "f:image": {}, "f:name": {}, "f:resources": {}} for c in range(containers)}},
+        "f:status": {
+            "f:conditions": {f'k:{{"type":"{t}"}}': {".": {}, "f:status": {}, "f:type": {}} for t in ["Ready", "Initialized", "PodScheduled"]}
+        },
+    }
+    return dict(manager=manager, operation="Update", apiVersion="v1", time="2024-01-01T00:00:00Z", fieldsType="FieldsV1", fieldsV1=fields)
+
+
+def generate(n, managers, containers) -> bytes:
+    items = list()
+    for i in range(n):
+        metadata = {
+            "name": f"app-{i // 8}-5d8f7c-{i:05d}",
+            "generateName": f"app-{i // 8}-5d8f7c-",
+            "namespace": "bench",
+            "uid": f"6f1c2b9e-0000-4000-8000-{i:012d}",
+            "resourceVersion": str(100000 + i),
+            "creationTimestamp": "2024-01-01T00:00:00Z",
+            "labels": {"app": f"app-{i // 8}", "tier": "web", "pod-template-hash": "5d8f7c"},
+            "annotations": {"bench.t9s.io/generated": "true"},
+            "ownerReferences": [
+                {"apiVersion": "apps/v1", "kind": "ReplicaSet", "name": f"app-{i // 8}-5d8f7c", "uid": f"r-{i // 8}", "controller": True}
+            ],
+            "managedFields": [managed_fields(f"manager-{m}", containers) for m in range(managers)],
+        }
+        items.append({"kind": "PartialObjectMetadata", "apiVersion": "meta.k8s.io/v1", "metadata": metadata})
+    body = {"kind": "PartialObjectMetadataList", "apiVersion": "meta.k8s.io/v1", "metadata": {"resourceVersion": "100000"}, "items": items}
+    return json.dumps(body).encode()
+
+
+def timed(func, data, repeat) -> float:
+    times = list()
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(data)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def allocated(func, data) -> tuple[float, float]:
+    """(peak, retained) MB of Python allocations of one decode"""
+    gc.collect()
+    tracemalloc.start()
+    result = func(data)
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return peak / 1024 / 1024, retained / 1024 / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--objects", type=int, nargs="+", default=[500, 2000])
+    parser.add_argument("--managed-fields", type=int, default=2, help="managedFields entries per object")
+    parser.add_argument("--containers", type=int, default=2)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    backends = [backend for backend in BACKENDS if Decoder.installed(backend)]
+    print(f"parsers installed: {', '.join(backends)}")
+    print(f"{'objects':>8} {'MB':>6} {'parser':<10} {'decode':<10} {'time (ms)':>10} {'peak (MB)':>10} {'retained (MB)':>14}")
+    for n in args.objects:
+        data = generate(n, args.managed_fields, args.containers)
+        for backend in backends:
+            decoder = Decoder(backend)
+            for mode, func in [("whole", decoder.loads), ("projected", lambda d: decoder.loads_list(d, METADATA_ITEM_FIELDS))]:
+                seconds = timed(func, data, args.repeat)
+                peak, retained = allocated(func, data)
+                print(f"{n:>8} {len(data) / 1024 / 1024:>6.1f} {backend:<10} {mode:<10} {seconds * 1000:>10.1f} {peak:>10.1f} {retained:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
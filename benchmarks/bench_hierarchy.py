@@ -0,0 +1,97 @@
+"""
+Tree build time for a namespace of N objects (Deployments -> ReplicaSets -> Pods).
+
+    PYTHONPATH=. python benchmarks/bench_hierarchy.py --sizes 1000 10000 100000
+
+"legacy" is the nested-dict hierarchy plus linear UID lookup that ExplorerTree.load_objects used before the UID index,
+it is skipped above --legacy-max objects because it is quadratic.
+"""
+
+import argparse
+import asyncio
+import time
+
+from rich.console import Console
+
+from t9s.modules.kubernetes.hierarchy import ResourceIndex
+from t9s.modules.kubernetes.objects import Resource
+from t9s.modules.widgets.explorer import ExplorerTree
+
+
+def generate(n) -> list[Resource]:
+    objs = list[Resource]()
+    for i in range(max(1, n // 10)):
+        objs.append(Resource(name=f"deploy-{i}", kind="Deployment", context="bench", namespace="bench", uid=f"d-{i}"))
+        objs.append(Resource(name=f"rs-{i}", kind="ReplicaSet", context="bench", namespace="bench", uid=f"r-{i}", owner=f"d-{i}"))
+        for j in range(8):
+            objs.append(Resource(name=f"pod-{i}-{j}", kind="Pod", context="bench", namespace="bench", uid=f"p-{i}-{j}", owner=f"r-{i}"))
+    return objs
+
+
+def legacy_build(objs: list[Resource]):
+    def traverse(hierarchy, graph, names):
+        for name in names:
+            hierarchy[name] = traverse({}, graph, graph[name])
+        return hierarchy
+
+    lst = [(o.owner if o.owner is not None else "root", o.uid) for o in objs]
+    graph = {name: set() for tup in lst for name in tup}
+    has_parent = {name: False for tup in lst for name in tup}
+    for parent, child in lst:
+        graph[parent].add(child)
+        has_parent[child] = True
+    roots = [name for name, parents in has_parent.items() if not parents]
+    hierarchy = traverse({}, graph, roots).get("root", {})
+    pending = [hierarchy]
+    while pending:
+        level = pending.pop()
+        for uid in level:
+            next(o for o in objs if o.uid == uid)
+            pending.append(level[uid])
+
+
+def index_build(objs: list[Resource]):
+    index = ResourceIndex(objs=objs)
+    for root in index.roots():
+        for _ in index.walk(root.uid):
+            pass
+
+
+async def tree_build(objs: list[Resource]):
+    tree = ExplorerTree(console=Console())
+
+    async def get_objs(ctx, ns):
+        return objs
+
+    tree.get_objs_for_ctx_ns = get_objs
+    await tree.add(tree.root.id, "bench", Resource(name="bench", kind="Context", context="bench"))
+    await tree.nodes[tree.id].add("bench", Resource(name="bench", kind="Namespace", context="bench", namespace="bench"))
+    ns_node = tree.nodes[tree.id]
+    start = time.perf_counter()
+    await tree.load_objects(ns_node)
+    return time.perf_counter() - start
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--legacy-max", type=int, default=10000)
+    args = parser.parse_args()
+
+    print(f"{'objects':>10} {'legacy (s)':>12} {'index (s)':>12} {'tree (s)':>12}")
+    for n in args.sizes:
+        objs = generate(n)
+        legacy = f"{timed(legacy_build, objs):12.4f}" if n <= args.legacy_max else f"{'skipped':>12}"
+        index = timed(index_build, objs)
+        tree = asyncio.run(tree_build(objs))
+        print(f"{len(objs):>10} {legacy} {index:12.4f} {tree:12.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,316 @@
+"""
+Local stand-in for the Kubernetes API, one HTTP server per context, serving what t9s reads: aggregated discovery,
+namespaces, paginated metadata LISTs (per namespace and across all of them), GETs of single objects, watches that stay
+open without events, and followed pod logs written at a fixed rate.
+
+Every namespace holds the same generated objects: per 10 objects one Deployment, its ReplicaSet and 8 Pods, plus
+crd_objects objects of each of the crds custom kinds. Objects are generated on first use and are the same every run.
+
+    python benchmarks/fake_apiserver.py --contexts 2 --namespaces 10 --objects 1000 --crds 5 --kubeconfig /tmp/bench-kubeconfig
+
+serves until interrupted, with KUBECONFIG=/tmp/bench-kubeconfig t9s shows the fake clusters.
+"""
+
+import argparse
+import json
+import threading
+import time
+from datetime import datetime, timezone
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+CRD_GROUP = "bench.t9s.io"
+CORE_KINDS = [("", "v1", "Pod", "pods"), ("apps", "v1", "Deployment", "deployments"), ("apps", "v1", "ReplicaSet", "replicasets")]
+RESOURCE_VERSION = "1000"
+
+
+class FakeCluster:
+    def __init__(self, name, namespaces=10, objects=1000, crds=5, crd_objects=5, containers=1, log_rate=1000, log_line_bytes=120):
+        self.name = name
+        self.namespaces = [f"ns-{i}" for i in range(namespaces)]
+        self.objects = objects
+        self.crds = crds
+        self.crd_objects = crd_objects
+        self.containers = containers
+        self.log_rate = log_rate
+        self.log_line_bytes = log_line_bytes
+        self.stopped = threading.Event()
+
+    def kinds(self) -> list[tuple[str, str, str, str]]:
+        """(group, version, kind, plural) of every served kind"""
+        return CORE_KINDS + [(CRD_GROUP, "v1", f"Widget{i}", f"widget{i}s") for i in range(self.crds)]
+
+    def discovery(self, root) -> dict:
+        groups = dict()
+        for group, version, kind, plural in self.kinds():
+            if (root == "/api") == (group == ""):
+                groups.setdefault(group, list()).append(
+                    {
+                        "resource": plural,
+                        "responseKind": {"group": group, "version": version, "kind": kind},
+                        "scope": "Namespaced",
+                        "verbs": ["get", "list", "watch"],
+                    }
+                )
+        return {
+            "kind": "APIGroupDiscoveryList",
+            "apiVersion": "apidiscovery.k8s.io/v2",
+            "items": [
+                {"metadata": {"name": group}, "versions": [{"version": "v1", "resources": resources}]} for group, resources in groups.items()
+            ],
+        }
+
+    def crd_list(self) -> dict:
+        items = [
+            {"metadata": {"name": f"{plural}.{group}", "uid": f"crd-{plural}", "resourceVersion": RESOURCE_VERSION}}
+            for group, _, _, plural in self.kinds()
+            if group == CRD_GROUP
+        ]
+        return {"kind": "PartialObjectMetadataList", "metadata": {"resourceVersion": RESOURCE_VERSION}, "items": items}
+
+    @staticmethod
+    def metadata(ns, name, uid, labels, owner=None) -> dict:
+        metadata = {
+            "name": name,
+            "namespace": ns,
+            "uid": uid,
+            "resourceVersion": RESOURCE_VERSION,
+            "creationTimestamp": "2024-01-01T00:00:00Z",
+            "labels": labels,
+            "annotations": {"bench.t9s.io/generated": "true"},
+        }
+        if owner is not None:
+            metadata["ownerReferences"] = [{"apiVersion": "apps/v1", "kind": owner[0], "name": owner[1], "uid": owner[2], "controller": True}]
+        return metadata
+
+    @lru_cache(maxsize=None)
+    def items(self, ns, plural) -> list[dict]:
+        """Full objects of a kind in a namespace"""
+        items = list()
+        if plural in ["deployments", "replicasets", "pods"]:
+            for i in range(max(1, self.objects // 10)):
+                labels = {"app": f"app-{i}", "tier": ["web", "api", "worker"][i % 3]}
+                deploy = (f"app-{i}", f"{self.name}/{ns}/d-{i}")
+                rs = (f"app-{i}-5d8f7c", f"{self.name}/{ns}/r-{i}")
+                if plural == "deployments":
+                    items.append({"kind": "Deployment", "metadata": self.metadata(ns, deploy[0], deploy[1], labels), "spec": {"replicas": 8}})
+                elif plural == "replicasets":
+                    items.append(
+                        {
+                            "kind": "ReplicaSet",
+                            "metadata": self.metadata(ns, rs[0], rs[1], labels, ("Deployment",) + deploy),
+                            "spec": {"replicas": 8},
+                        }
+                    )
+                else:
+                    for j in range(8):
+                        pod = self.metadata(ns, f"{rs[0]}-{j:05d}", f"{self.name}/{ns}/p-{i}-{j}", labels, ("ReplicaSet",) + rs)
+                        containers = [{"name": f"c{c}", "image": "registry.local/app:1.0"} for c in range(self.containers)]
+                        items.append({"kind": "Pod", "metadata": pod, "spec": {"containers": containers}, "status": {"phase": "Running"}})
+        elif plural.startswith("widget"):
+            kind = plural[:-1].capitalize()
+            for i in range(self.crd_objects):
+                items.append(
+                    {
+                        "kind": kind,
+                        "metadata": self.metadata(ns, f"{plural[:-1]}-{i}", f"{self.name}/{ns}/{plural}-{i}", {"app": f"app-{i}"}),
+                        "spec": {},
+                    }
+                )
+        return items
+
+    @lru_cache(maxsize=None)
+    def metadata_items(self, namespaces: tuple, plural) -> list[dict]:
+        return [{"kind": "PartialObjectMetadata", "metadata": item["metadata"]} for ns in namespaces for item in self.items(ns, plural)]
+
+    def listed(self, namespaces, plural, query) -> dict:
+        """PartialObjectMetadataList page, the continue token is the offset of the next page"""
+        items = self.metadata_items(tuple(namespaces), plural)
+        start = int(query.get("continue", ["0"])[0] or 0)
+        limit = int(query.get("limit", ["0"])[0] or 0) or len(items)
+        metadata = {"resourceVersion": RESOURCE_VERSION}
+        if start + limit < len(items):
+            metadata["continue"] = str(start + limit)
+        return {"kind": "PartialObjectMetadataList", "apiVersion": "meta.k8s.io/v1", "metadata": metadata, "items": items[start : start + limit]}
+
+    def get(self, ns, plural, name) -> dict:
+        return next((item for item in self.items(ns, plural) if item["metadata"]["name"] == name), None)
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    cluster: FakeCluster = None
+
+    def log_message(self, *args):
+        pass
+
+    def send_json(self, body, status=200):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def not_found(self):
+        self.send_json({"kind": "Status", "status": "Failure", "reason": "NotFound", "code": 404}, status=404)
+
+    def start_chunked(self, content_type):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+    def write_chunk(self, data: bytes):
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        parts = url.path.strip("/").split("/")
+        cluster = self.cluster
+        try:
+            if url.path in ["/api", "/apis"]:
+                return self.send_json(cluster.discovery(url.path))
+            if url.path == "/apis/apiextensions.k8s.io/v1/customresourcedefinitions":
+                return self.watch(query) if "watch" in query else self.send_json(cluster.crd_list())
+            if url.path == "/api/v1/namespaces":
+                items = [
+                    {"metadata": {"name": ns, "uid": f"{cluster.name}/{ns}", "resourceVersion": RESOURCE_VERSION}} for ns in cluster.namespaces
+                ]
+                return self.send_json({"kind": "NamespaceList", "metadata": {"resourceVersion": RESOURCE_VERSION}, "items": items})
+            # /api/v1/... or /apis/group/version/..., the rest is [namespaces/ns/]plural[/name[/log]]
+            rest = parts[2:] if parts[0] == "api" else parts[3:]
+            namespaces = cluster.namespaces
+            if rest and rest[0] == "namespaces" and len(rest) > 2:
+                if rest[1] not in cluster.namespaces:
+                    return self.not_found()
+                namespaces, rest = [rest[1]], rest[2:]
+            if not rest or rest[0] not in [plural for _, _, _, plural in cluster.kinds()]:
+                return self.not_found()
+            if len(rest) == 1:
+                return self.watch(query) if "watch" in query else self.send_json(cluster.listed(namespaces, rest[0], query))
+            item = cluster.get(namespaces[0], rest[0], rest[1]) if len(namespaces) == 1 else None
+            if item is None:
+                return self.not_found()
+            if len(rest) == 3 and rest[2] == "log":
+                return self.logs(item, query)
+            return self.send_json(item)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def watch(self, query):
+        """An open watch without events until its timeout"""
+        self.start_chunked("application/json")
+        deadline = time.monotonic() + int(query.get("timeoutSeconds", ["60"])[0])
+        while time.monotonic() < deadline and not self.cluster.stopped.wait(0.2):
+            pass
+        self.write_chunk(b"")
+        self.close_connection = True
+
+    def logs(self, pod, query):
+        """tailLines old lines, then log_rate lines a second until the client goes away"""
+        self.start_chunked("text/plain")
+        name = pod["metadata"]["name"]
+        padding = "x" * max(0, self.cluster.log_line_bytes - 80)
+        count = 0
+
+        def lines(n):
+            nonlocal count
+            now = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%f")
+            out = list()
+            for _ in range(n):
+                count += 1
+                out.append(f'{now}{count % 1000:03d}Z level=info pod={name} line={count} msg="request served" {padding}\n')
+            return "".join(out).encode()
+
+        self.write_chunk(lines(int(query.get("tailLines", ["100"])[0])))
+        if query.get("follow", ["false"])[0] != "true":
+            return self.write_chunk(b"")
+        # Written in 20ms batches, a rate that is not a multiple of 50 is rounded up
+        batch = max(1, -(-self.cluster.log_rate // 50))
+        next_batch = time.monotonic()
+        while not self.cluster.stopped.is_set():
+            self.write_chunk(lines(batch))
+            next_batch += 0.02
+            time.sleep(max(0.0, next_batch - time.monotonic()))
+        self.write_chunk(b"")
+        self.close_connection = True
+
+
+class FakeApiServer:
+    """One fake cluster per context, each on its own port of 127.0.0.1"""
+
+    def __init__(self, contexts=1, **cluster_args):
+        self.clusters = [FakeCluster(f"bench-{i}", **cluster_args) for i in range(contexts)]
+        self.servers: list[ThreadingHTTPServer] = list()
+
+    def start(self) -> "FakeApiServer":
+        for cluster in self.clusters:
+            server = ThreadingHTTPServer(("127.0.0.1", 0), type("ClusterHandler", (Handler,), {"cluster": cluster}))
+            server.daemon_threads = True
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            self.servers.append(server)
+        return self
+
+    def stop(self) -> None:
+        for cluster, server in zip(self.clusters, self.servers):
+            cluster.stopped.set()
+            server.shutdown()
+            server.server_close()
+
+    def write_kubeconfig(self, path) -> str:
+        config = {
+            "apiVersion": "v1",
+            "kind": "Config",
+            "clusters": [{"name": c.name, "cluster": {"server": f"http://127.0.0.1:{s.server_port}"}} for c, s in zip(self.clusters, self.servers)],
+            "users": [{"name": "bench", "user": {"token": "bench"}}],
+            "contexts": [{"name": c.name, "context": {"cluster": c.name, "user": "bench"}} for c in self.clusters],
+            "current-context": self.clusters[0].name,
+        }
+        # JSON is valid YAML
+        with open(path, "w") as f:
+            json.dump(config, f)
+        return path
+
+
+def cluster_args(args) -> dict:
+    return dict(
+        namespaces=args.namespaces,
+        objects=args.objects,
+        crds=args.crds,
+        crd_objects=args.crd_objects,
+        containers=args.containers,
+        log_rate=args.log_rate,
+        log_line_bytes=args.log_line_bytes,
+    )
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--contexts", type=int, default=2)
+    parser.add_argument("--namespaces", type=int, default=10, help="namespaces per context")
+    parser.add_argument("--objects", type=int, default=1000, help="Deployments, ReplicaSets and Pods per namespace")
+    parser.add_argument("--crds", type=int, default=5, help="custom kinds per context")
+    parser.add_argument("--crd-objects", type=int, default=5, help="objects of each custom kind per namespace")
+    parser.add_argument("--containers", type=int, default=1, help="containers per pod")
+    parser.add_argument("--log-rate", type=int, default=1000, help="log lines per second of each followed container")
+    parser.add_argument("--log-line-bytes", type=int, default=120)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    add_arguments(parser)
+    parser.add_argument("--kubeconfig", default="bench-kubeconfig")
+    args = parser.parse_args()
+    server = FakeApiServer(contexts=args.contexts, **cluster_args(args)).start()
+    print(f"KUBECONFIG={server.write_kubeconfig(args.kubeconfig)}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
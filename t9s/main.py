@@ -1,21 +1,37 @@
 """
 TODO: Add a style config file and use that all over the project so people can theme it later
 """
+
+import time
+
+# Taken before anything else is imported, --profile-startup measures from here
+STARTED = time.perf_counter()
+
+import argparse
+import asyncio
 import sys
 
 from rich.console import Console
 
-from t9s.modules.widgets.log_viewer import LogViewer, LogUpdate
+from t9s.modules.widgets.log_viewer import LogViewer
 from t9s.modules.widgets.header import T9s_Header
 from t9s.modules.widgets.footer import T9s_Footer
 from t9s.modules.widgets.explorer import ExplorerTree
 from t9s.modules.widgets.viewer import ObjectViewer
 from t9s.modules.widgets.info import ObjectInfo
+from t9s.modules.widgets.search import SearchBar, SearchSelect
+from t9s.modules.widgets.stats_viewer import StatsViewer
+from t9s.modules.widgets.table_viewer import TableViewer
+from t9s.modules.kubernetes.informer import informers
 from t9s.modules.kubernetes.objects import Resource
+from t9s.modules.utils.lazy import kubernetes
+from t9s.modules.utils.startup import StartupProfile
+from t9s.modules.utils.stats import stats, STATS_PATH
 from textual.app import App
 from textual.widgets import ScrollView, TreeControl
 
 console = Console()
+IMPORTED = time.perf_counter()
 
 
 # noinspection PyBroadException
@@ -27,50 +43,105 @@ class T9s(App):
         log: str = "",
         log_verbosity: int = 1,
         title: str = "t9s",
+        profile: StartupProfile = None,
     ):
         super().__init__(screen, driver_class, log, log_verbosity, title)
         self.explorer = None
+        self.profile = profile
+        self.first_frame = False
 
     async def on_load(self) -> None:
         await self.bind("e", "view.toggle('explorer')", "Toggle Explorer")
         await self.bind("i", "view.toggle('info')", "Toggle Info")
         await self.bind("y", "yaml_json_switcher()", "Toggle YAML/JSON")
+        await self.bind("m", "managed_fields_switcher()", "Toggle managedFields")
+        await self.bind("f", "fold_switcher()", "Toggle Folding")
         await self.bind("l", "logs_switcher()", "Toggle Logs")
         await self.bind("k", "live_logs_switcher()", "Toggle Live Logs")
+        await self.bind("t", "table_switcher()", "Toggle Table")
+        await self.bind("s", "stats_switcher()", "Toggle Stats")
+        await self.bind("/", "search()", "Search")
         await self.bind("1", "focus_explorer()", "Focus Explorer", show=False)
         await self.bind("2", "focus_info()", "Focus Info", show=False)
         await self.bind("3", "focus_viewer()", "Focus Viewer", show=False)
+        await self.bind("d", "memory_report()", "Memory Report", show=False)
+        await self.bind("x", "export_stats()", "Export Stats", show=False)
         await self.bind("q", "quit", "Quit")
 
     # noinspection PyAttributeOutsideInit
     async def on_mount(self) -> None:
+        self.profile.mark("app started") if self.profile else None
+        # ExplorerTree, ObjectViewer and LogViewer do their own scrolling and only render the visible lines, so they are not wrapped in a ScrollView
         self.explorer = ExplorerTree(console=console)
-        self.explorer_panel = ScrollView(contents=self.explorer, auto_width=True)
         self.info = ObjectInfo()
         self.info_panel = ScrollView(contents=self.info)
         self.viewer = ObjectViewer()
-        self.viewer_panel = ScrollView(contents=self.viewer)
         self.log_viewer = LogViewer()
-        self.log_viewer_panel = ScrollView(contents=self.log_viewer)
-        self.log_viewer_panel.visible = False
+        self.log_viewer.visible = False
+        self.table_viewer = TableViewer()
+        self.table_viewer.visible = False
+        self.stats_viewer = StatsViewer()
+        self.stats_viewer.visible = False
+        self.search_bar = SearchBar()
+        self.search_bar.visible = False
 
         await self.view.dock(T9s_Header(), edge="top", size=8)
         await self.view.dock(T9s_Footer(), edge="bottom")
-        await self.view.dock(self.explorer_panel, edge="left", size=60, name="explorer")
+        await self.view.dock(self.search_bar, edge="bottom", size=14, name="search")
+        await self.view.dock(self.explorer, edge="left", size=60, name="explorer")
         await self.view.dock(self.info_panel, edge="left", size=60, name="info")
-        await self.view.dock(self.viewer_panel, edge="left", name="viewer")
-        await self.view.dock(self.log_viewer_panel, edge="left", name="log_viewer")
+        await self.view.dock(self.viewer, edge="left", name="viewer")
+        await self.view.dock(self.log_viewer, edge="left", name="log_viewer")
+        await self.view.dock(self.table_viewer, edge="left", name="table_viewer")
+        await self.view.dock(self.stats_viewer, edge="left", name="stats_viewer")
+        self.profile.mark("widgets docked") if self.profile else None
+
+    def refresh(self, repaint: bool = True, layout: bool = False) -> None:
+        super().refresh(repaint, layout)
+        self.on_frame()
+
+    def display(self, renderable) -> None:
+        super().display(renderable)
+        self.on_frame()
+
+    def on_frame(self) -> None:
+        # The first frame is the first one that shows the explorer
+        if self.first_frame or self.explorer is None or self.explorer.render_cache is None:
+            return
+        self.first_frame = True
+        # Nothing on screen needs the kubernetes client yet, it is imported while the user looks at the first frame
+        kubernetes.preload()
+        if self.profile:
+            self.profile.mark("first frame")
+            # Without the sys.exit of shutdown(), run() returns once the terminal is restored and the report is printed after it
+            asyncio.ensure_future(App.shutdown(self))
 
     async def action_yaml_json_switcher(self) -> None:
         self.viewer.switch_format()
-        await self.viewer_panel.update(self.viewer.render())
+
+    async def action_managed_fields_switcher(self) -> None:
+        self.viewer.switch_stripped()
+
+    async def action_fold_switcher(self) -> None:
+        self.viewer.switch_folded()
 
     async def action_live_logs_switcher(self) -> None:
         if self.log_viewer.live_reload:
             self.log_viewer.set_live_reload(False)
         else:
             self.log_viewer.set_live_reload(True)
-        await self.log_viewer_panel.update(self.log_viewer.render())
+        self.log_viewer.refresh()
+
+    async def action_memory_report(self) -> None:
+        report = await self.explorer.data.memory_report()
+        self.viewer.update_resource(resource=Resource(name="memory", kind="Report", json_value=report))
+        self.show_panel(self.viewer)
+
+    def show_panel(self, panel) -> None:
+        """Object viewer, log viewer, table viewer and stats share the right hand side, one at a time"""
+        for p in [self.viewer, self.log_viewer, self.table_viewer, self.stats_viewer]:
+            p.visible = p is panel
+        self.table_viewer.show() if panel is self.table_viewer else None
 
     async def action_focus_explorer(self) -> None:
         await self.explorer.focus()
@@ -82,33 +153,60 @@ class T9s(App):
         await self.viewer.focus()
 
     async def action_logs_switcher(self) -> None:
-        if self.viewer_panel.visible:
-            self.viewer_panel.visible = False
-            self.log_viewer_panel.visible = True
-        else:
-            self.viewer_panel.visible = True
-            self.log_viewer_panel.visible = False
+        self.show_panel(self.viewer if self.log_viewer.visible else self.log_viewer)
+
+    async def action_table_switcher(self) -> None:
+        self.show_panel(self.viewer if self.table_viewer.visible else self.table_viewer)
+
+    async def action_stats_switcher(self) -> None:
+        self.show_panel(self.viewer if self.stats_viewer.visible else self.stats_viewer)
+
+    async def action_export_stats(self) -> None:
+        try:
+            count = stats.export(STATS_PATH)
+            self.log(f"Exported {count} stats rows to {STATS_PATH}")
+        except Exception as err:
+            self.log(f"Exporting stats to {STATS_PATH} failed: {err}")
+
+    async def action_search(self) -> None:
+        self.search_bar.open()
+        await self.search_bar.focus()
+
+    async def handle_search_select(self, message: SearchSelect) -> None:
+        self.search_bar.visible = False
+        await self.explorer.focus()
+        node = await self.explorer.jump_to(message.resource) if message.resource else None
+        await self.show_resource(node.data) if node else None
 
     async def handle_tree_click(self, message: TreeControl[Resource]) -> None:
-        if message.node.data.kind not in ["Context", "Namespace"]:
-            self.info.update_resource(resource=message.node.data)
-            await self.info_panel.update(self.info.render())
-            self.viewer.update_resource(resource=message.node.data)
-            await self.viewer_panel.update(self.viewer.render())
-            self.log_viewer.update_resource(resource=message.node.data)
-            await self.log_viewer_panel.update(self.log_viewer.render())
-
-    async def handle_log_update(self, message: LogUpdate) -> None:
-        if self.log_viewer.live_reload:
-            await self.log_viewer_panel.update(message.render_op, home=False)
-            self.log_viewer.refresh(layout=True)
-            self.log_viewer_panel.refresh(layout=True)
-            self.log_viewer_panel.scroll_in_to_view(9999999999)
+        if message.node.data.kind not in ["Context", "Namespace", "AllNamespaces", "Loading"]:
+            await self.show_resource(message.node.data)
+
+    async def show_resource(self, resource: Resource) -> None:
+        self.info.update_resource(resource=resource)
+        await self.info_panel.update(self.info.render())
+        self.viewer.update_resource(resource=resource)
+        self.log_viewer.update_resource(resource=resource)
+        self.table_viewer.update_resource(resource=resource)
 
     async def shutdown(self):
         self.log_viewer.reset()
+        informers.stop_all()
         await super().shutdown()
         sys.exit(0)
 
 
-T9s.run(console=console, log="textual.log")
+def app():
+    parser = argparse.ArgumentParser(prog="t9s")
+    parser.add_argument("--profile-startup", action="store_true", help="quit after the first frame and print where the startup time went")
+    args = parser.parse_args()
+    profile = StartupProfile(started=STARTED) if args.profile_startup else None
+    profile.mark("imports", at=IMPORTED) if profile else None
+    try:
+        T9s.run(console=console, log="textual.log", profile=profile)
+    finally:
+        print(profile.report()) if profile else None
+
+
+if __name__ == "__main__":
+    app()
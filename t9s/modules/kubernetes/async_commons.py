@@ -0,0 +1,53 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from t9s.modules.kubernetes.clients import MAX_CONCURRENT_REQUESTS
+from t9s.modules.kubernetes.commons import Commons
+from t9s.modules.kubernetes.objects import Resource
+
+# Shared by every widget, the kubernetes client is blocking so all API work runs here and never on the event loop
+executor = ThreadPoolExecutor(max_workers=MAX_CONCURRENT_REQUESTS, thread_name_prefix="t9s-api")
+
+
+class AsyncCommons:
+    """
+    Awaitable versions of the Commons calls. Cancelling the awaiting task returns control immediately,
+    the request already in flight on the executor finishes in the background and its result is dropped.
+    """
+
+    def __init__(self, logger):
+        self.log = logger
+        self.commons = Commons(logger=self.log)
+
+    @staticmethod
+    async def run(func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, functools.partial(func, *args, **kwargs))
+
+    async def get_ns_list(self, ctx) -> list[str]:
+        return await self.run(self.commons.get_ns_list, ctx=ctx)
+
+    async def get_cached_ns_list(self, ctx) -> tuple[list[str], float]:
+        return await self.run(self.commons.get_cached_ns_list, ctx=ctx)
+
+    async def get_cached_ns_objects(self, ctx, ns) -> tuple[list[Resource], float]:
+        return await self.run(self.commons.get_cached_ns_objects, ctx=ctx, ns=ns)
+
+    async def watch_ns_objects(self, ctx, ns) -> list[Resource]:
+        return await self.run(self.commons.watch_ns_objects, ctx=ctx, ns=ns)
+
+    async def list_all_ns_objects(self, ctx, ns) -> list[Resource]:
+        await self.watch_ns_objects(ctx=ctx, ns=ns)
+        # Waited for on the event loop, namespaces that are slow to list do not hold a worker of the executor
+        await self.commons.informers.wait_synced(ctx=ctx)
+        return await self.run(self.commons.save_listed_ns_objects, ctx=ctx, ns=ns)
+
+    async def get_full_object(self, resource: Resource) -> Resource:
+        return await self.run(self.commons.get_full_object, resource=resource)
+
+    async def get_kind_table(self, resource: Resource):
+        return await self.run(self.commons.get_kind_table, resource=resource)
+
+    async def memory_report(self) -> dict:
+        return await self.run(self.commons.memory_report)
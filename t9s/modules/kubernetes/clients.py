@@ -0,0 +1,101 @@
+import os
+import threading
+
+import yaml
+
+from t9s.modules.utils.lazy import kubernetes as k8s
+
+# Upper bound on concurrent API requests per context, the connection pool of each context is sized to match
+MAX_CONCURRENT_REQUESTS = 16
+
+
+def kubeconfig_contexts() -> list[str]:
+    """
+    Context names of the kubeconfig files in $KUBECONFIG (or ~/.kube/config) in order, read without the kubernetes
+    client, which takes longer to import than the whole first frame
+    """
+    names = list()
+    for path in os.environ.get("KUBECONFIG", "~/.kube/config").split(os.pathsep):
+        path = os.path.expanduser(path)
+        if not path or not os.path.exists(path):
+            continue
+        with open(path) as f:
+            kubeconfig = yaml.load(f, Loader=getattr(yaml, "CSafeLoader", yaml.SafeLoader)) or {}
+        for ctx in kubeconfig.get("contexts") or []:
+            if ctx.get("name") and ctx["name"] not in names:
+                names.append(ctx["name"])
+    return names
+
+
+# noinspection PyBroadException
+class ClientRegistry:
+    """
+    Process-wide registry of API clients. The kubeconfig contexts are read once, and the ApiClient of a context
+    (and with it its connection pool) is only created the first time that context is used.
+    """
+
+    def __init__(self, pool_size=MAX_CONCURRENT_REQUESTS):
+        self.pool_size = pool_size
+        self._lock = threading.RLock()
+        self._contexts: list[str] = None
+        self._api_clients: dict[str, "k8s.client.ApiClient"] = dict()
+        self._apis: dict[tuple[str, str], object] = dict()
+
+    @property
+    def contexts(self) -> list[str]:
+        with self._lock:
+            if self._contexts is None:
+                # Adding try/catch block so that t9s does not blow up if the KUBECONFIG has no clusters/entries
+                try:
+                    self._contexts = kubeconfig_contexts()
+                except Exception:
+                    self._contexts = list()
+            return self._contexts
+
+    def api_client(self, ctx) -> "k8s.client.ApiClient":
+        with self._lock:
+            if ctx not in self._api_clients:
+                configuration = k8s.client.Configuration()
+                k8s.config.load_kube_config(context=ctx, client_configuration=configuration)
+                configuration.connection_pool_maxsize = self.pool_size
+                self._api_clients[ctx] = k8s.client.ApiClient(configuration=configuration)
+            return self._api_clients[ctx]
+
+    def context_of(self, api_client) -> str:
+        with self._lock:
+            return next((ctx for ctx, client in self._api_clients.items() if client is api_client), None)
+
+    def get(self, ctx, api_cls: str):
+        """Returns the typed API wrapper (CoreV1Api, AppsV1Api, ...) of a context by class name, all wrappers share one ApiClient"""
+        with self._lock:
+            if (ctx, api_cls) not in self._apis:
+                self._apis[(ctx, api_cls)] = getattr(k8s.client, api_cls)(api_client=self.api_client(ctx))
+            return self._apis[(ctx, api_cls)]
+
+
+class ClientMap:
+    """Read-only mapping of context name to a typed API wrapper, backed by the registry"""
+
+    def __init__(self, registry: ClientRegistry, api_cls: str):
+        self.registry = registry
+        self.api_cls = api_cls
+
+    def __getitem__(self, ctx):
+        if ctx not in self.registry.contexts:
+            raise KeyError(ctx)
+        return self.registry.get(ctx, self.api_cls)
+
+    def __contains__(self, ctx):
+        return ctx in self.registry.contexts
+
+    def __iter__(self):
+        return iter(self.registry.contexts)
+
+    def __len__(self):
+        return len(self.registry.contexts)
+
+    def keys(self):
+        return list(self.registry.contexts)
+
+
+registry = ClientRegistry()
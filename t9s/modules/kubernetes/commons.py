@@ -1,8 +1,36 @@
-from concurrent.futures import wait
+from datetime import datetime, timezone
 
-import concurrent.futures
+from t9s.modules.kubernetes.decoder import field_tree, project
+from t9s.modules.kubernetes.discovery import discovery
+from t9s.modules.kubernetes.full_objects import full_objects
+from t9s.modules.kubernetes.hierarchy import ResourceIndex
+from t9s.modules.kubernetes.informer import informers
 from t9s.modules.kubernetes.k8s import K8s
-from t9s.modules.kubernetes.objects import Resource, CustomResourceDefinition
+from t9s.modules.kubernetes.objects import Resource, KindLister, ApiResource, intern
+from t9s.modules.utils.config import config
+from t9s.modules.utils.memory import memory_report
+from t9s.modules.utils.snapshot import snapshots
+
+# Listed when discovery returns nothing
+FALLBACK_RESOURCES = [
+    ApiResource(group="", version="v1", kind="Pod", plural="pods"),
+    ApiResource(group="apps", version="v1", kind="Deployment", plural="deployments"),
+    ApiResource(group="apps", version="v1", kind="ReplicaSet", plural="replicasets"),
+    ApiResource(group="", version="v1", kind="ConfigMap", plural="configmaps"),
+    ApiResource(group="", version="v1", kind="Secret", plural="secrets"),
+    ApiResource(group="", version="v1", kind="ServiceAccount", plural="serviceaccounts"),
+    ApiResource(group="", version="v1", kind="PersistentVolumeClaim", plural="persistentvolumeclaims"),
+]
+# What the snapshot keeps of an object, enough to paint the tree and nothing that could hold secret data
+SNAPSHOT_ITEM_FIELDS = (
+    "metadata.name",
+    "metadata.namespace",
+    "metadata.uid",
+    "metadata.resourceVersion",
+    "metadata.creationTimestamp",
+    "metadata.ownerReferences",
+    "metadata.labels",
+)
 
 
 # noinspection PyBroadException
@@ -10,193 +38,193 @@ class Commons:
     def __init__(self, logger):
         self.log = logger
         self.k8s = K8s(logger=self.log)
+        self.informers = informers
+        self.discovery = discovery
+        self.full_objects = full_objects
+        self.config = config
+        self.snapshots = snapshots
 
     def get_ns_list(self, ctx):
         ns_list = list()
-        success, response = self.k8s.list_ns(client=self.k8s.core_clients[ctx])
+        try:
+            client = self.k8s.core_clients[ctx]
+        except Exception as err:
+            # Clients are built on first use, so a broken kubeconfig entry only shows up here
+            self.log(f"Unable to create a client for {ctx}: {err}")
+            return ns_list
+        success, response = self.k8s.list_ns(client=client)
         if success:
             for item in response["items"]:
                 ns_list.append(item["metadata"]["name"])
+            self.snapshots.put(f"namespaces/{ctx}", ns_list)
         return ns_list
 
-    def traverse(self, hierarchy, graph, names):
-        for name in names:
-            hierarchy[name] = self.traverse({}, graph, graph[name])
-        return hierarchy
+    def get_cached_ns_list(self, ctx) -> tuple[list[str], float]:
+        """Namespaces of the context as last seen, and when, or (None, None)"""
+        return self.snapshots.get(f"namespaces/{ctx}")
 
-    def get_hierarchy(self, objs: list[Resource]):
-        lst = list()
-        for o in objs:
-            lst.append((o.owner if o.owner is not None else "root", o.uid))
-        graph = {name: set() for tup in lst for name in tup}
-        has_parent = {name: False for tup in lst for name in tup}
-        for parent, child in lst:
-            graph[parent].add(child)
-            has_parent[child] = True
-        roots = [name for name, parents in has_parent.items() if not parents]
-        h = self.traverse({}, graph, roots)
-        return h["root"] if "root" in h else {}
-
-    def _query_convert_item_to_resource(self, ctx, ns, query_func, client, crd: CustomResourceDefinition = None, kind=None) -> list[Resource]:
-        objs = list[Resource]()
-        if crd:
-            success, response = query_func(client, ns, crd.group, crd.version, crd.plural)
-        else:
-            success, response = query_func(client, ns)
-        if success:
-            for item in response["items"]:
-                resource = self.item_to_resource(ctx=ctx, ns=ns, item=item, kind=kind)
-                objs.append(resource) if resource else None
-        return objs
+    @staticmethod
+    def get_hierarchy(objs: list[Resource]) -> ResourceIndex:
+        return ResourceIndex(objs=objs)
 
     @staticmethod
-    def item_to_resource(ctx, ns, item, kind=None):
+    def item_to_resource(ctx, ns, item, kind=None, path=None):
+        """path is the collection path of the kind with a {namespace} placeholder"""
+        # Objects listed across all namespaces carry their own
+        namespace = item.get("metadata", {}).get("namespace", ns)
         return Resource(
             name=item.get("metadata", {}).get("name", "Undefined"),
             kind=item.get("kind", "Undefined") if not kind else kind,
             context=ctx,
-            namespace=ns,
+            namespace=namespace,
             uid=item.get("metadata", {}).get("uid", None),
             owner=item.get("metadata", {}).get("ownerReferences", [{}])[0].get("uid", None),
-            metadata=item.get("metadata", {}),
-            spec=item.get("spec", {}),
-            status=item.get("status", {}),
             json_value=item,
+            collection=path.format(namespace=namespace) if path else None,
         )
 
-    def list_all_namespaced_crds(self, ctx):
-        crd_list = list[CustomResourceDefinition]()
-        success, response = self.k8s.get_all_crds(self.k8s.api_ext_clients[ctx])
-        if success:
-            for crd in response["items"]:
-                # TODO: this will fail if multiple version of a crd are installed in a cluster
-                version = crd.get("status", {}).get("storedVersions")[0]
-                printer_cols = list()
-                for ver in crd.get("spec", {}).get("versions", [{}]):
-                    if ver.get("name") == version:
-                        printer_cols = ver.get("additionalPrinterColumns")
-                if crd.get("spec", {}).get("scope") == "Namespaced":
-                    crd_list.append(
-                        CustomResourceDefinition(
-                            group=crd.get("spec", {}).get("group", ""),
-                            kind=crd.get("spec", {}).get("names", {}).get("kind", ""),
-                            plural=crd.get("spec", {}).get("names", {}).get("plural", ""),
-                            scope=crd.get("spec", {}).get("scope", "Namespaced"),
-                            version=version,
-                            printer_cols=printer_cols,
-                        )
-                    )
-        return crd_list
-
-    def list_all_ns_objects(self, ctx, ns):
-        objs = list[Resource]()
-        crds = self.list_all_namespaced_crds(ctx=ctx)
-
-        with concurrent.futures.ThreadPoolExecutor() as executor:
-            futures = list()
-
-            for crd in crds:
-                futures.append(
-                    executor.submit(
-                        self._query_convert_item_to_resource,
-                        ctx=ctx,
-                        ns=ns,
-                        query_func=self.k8s.list_custom_objects_in_ns,
-                        client=self.k8s.custom_clients[ctx],
-                        crd=crd,
-                        kind=None,
-                    )
-                )
-
-            futures.append(
-                executor.submit(
-                    self._query_convert_item_to_resource,
-                    ctx=ctx,
-                    ns=ns,
-                    query_func=self.k8s.list_pods_in_ns,
-                    client=self.k8s.core_clients[ctx],
-                    crd=None,
-                    kind="Pod",
-                )
-            )
-
-            futures.append(
-                executor.submit(
-                    self._query_convert_item_to_resource,
-                    ctx=ctx,
-                    ns=ns,
-                    query_func=self.k8s.list_deployments_in_ns,
-                    client=self.k8s.apps_clients[ctx],
-                    kind="Deployment",
-                )
-            )
-
-            futures.append(
-                executor.submit(
-                    self._query_convert_item_to_resource,
-                    ctx=ctx,
-                    ns=ns,
-                    query_func=self.k8s.list_replicasets_in_ns,
-                    client=self.k8s.apps_clients[ctx],
-                    kind="ReplicaSet",
-                )
-            )
-
-            futures.append(
-                executor.submit(
-                    self._query_convert_item_to_resource,
-                    ctx=ctx,
-                    ns=ns,
-                    query_func=self.k8s.list_configmaps_in_ns,
-                    client=self.k8s.core_clients[ctx],
-                    kind="ConfigMap",
+    @staticmethod
+    def metadata_item_to_resource(ctx, ns, item, kind=None, path=None):
+        """Resource for a PartialObjectMetadata item, managedFields are dropped as they are often most of the metadata"""
+        item.get("metadata", {}).pop("managedFields", None)
+        resource = Commons.item_to_resource(ctx=ctx, ns=ns, item=item, kind=kind, path=path)
+        resource.partial = True
+        return resource
+
+    def get_full_object(self, resource: Resource) -> Resource:
+        return self.full_objects.fetch(resource, k8s=self.k8s, to_resource=self.item_to_resource)
+
+    def list_namespaced_resources(self, ctx) -> list[ApiResource]:
+        resources = self.discovery.get_namespaced_resources(ctx=ctx, k8s=self.k8s)
+        # Discovery can be forbidden or broken, the basics are still worth trying
+        return resources or FALLBACK_RESOURCES
+
+    def get_ns_kind_listers(self, ctx) -> list[KindLister]:
+        """One lister per discovered kind that passes the include/exclude config, all of them list and watch through the same path"""
+        client = self.k8s.core_clients[ctx]
+        included, excluded = self.config.included_kinds, self.config.excluded_kinds
+        listers = list[KindLister]()
+        for res in self.list_namespaced_resources(ctx=ctx):
+            if (included and not res.matches(included)) or res.matches(excluded):
+                continue
+            # Only metadata is listed and watched, full objects are fetched with get_full_object when they are shown
+            listers.append(
+                KindLister(
+                    kind=res.kind,
+                    client=client,
+                    path=res.path,
+                    list_func=self.k8s.list_metadata,
+                    watch_func=self.k8s.watch_metadata,
+                    group=res.group,
                 )
             )
-
-            futures.append(
-                executor.submit(
-                    self._query_convert_item_to_resource,
-                    ctx=ctx,
-                    ns=ns,
-                    query_func=self.k8s.list_secrets_in_ns,
-                    client=self.k8s.core_clients[ctx],
-                    kind="Secret",
-                )
+        return listers
+
+    def watch_ns_objects(self, ctx, ns):
+        """
+        Starts the informers of the context if needed and returns what is cached so far of the namespace, or of every
+        namespace for ns None. Everything else arrives page by page through the informer deltas.
+        """
+        # The first expand in a context starts its informers, a single LIST and WATCH per kind across all namespaces.
+        # Every later call, for any namespace of the context, is served from the informer cache with no API calls.
+        if not self.informers.covers(ctx):
+            self.informers.start_context(
+                ctx=ctx, listers=self.get_ns_kind_listers(ctx=ctx), to_resource=self.metadata_item_to_resource, logger=self.log
             )
+        return self.informers.snapshot(ctx=ctx, ns=ns)
 
-            futures.append(
-                executor.submit(
-                    self._query_convert_item_to_resource,
-                    ctx=ctx,
-                    ns=ns,
-                    query_func=self.k8s.list_service_accounts_in_ns,
-                    client=self.k8s.core_clients[ctx],
-                    kind="ServiceAccount",
-                )
-            )
+    def save_listed_ns_objects(self, ctx, ns) -> list[Resource]:
+        """Snapshots what the informers of the namespace hold, called once they listed everything"""
+        # TODO: Sort items by group
+        objs = self.informers.snapshot(ctx=ctx, ns=ns)
+        self.save_ns_objects(ctx=ctx, ns=ns, objs=objs)
+        return objs
 
-            futures.append(
-                executor.submit(
-                    self._query_convert_item_to_resource,
-                    ctx=ctx,
-                    ns=ns,
-                    query_func=self.k8s.list_pv_claims_in_ns,
-                    client=self.k8s.core_clients[ctx],
-                    kind="PersistentVolumeClaim",
-                )
-            )
-            wait(futures)
-            for future in concurrent.futures.as_completed(futures):
-                objs += future.result()
+    def save_ns_objects(self, ctx, ns, objs: list[Resource]) -> None:
+        """
+        Snapshots the listed objects per namespace, ns None saves every namespace found in objs.
+        Only the fields the tree needs are saved, annotations like last-applied-configuration can hold whole Secrets.
+        """
+        by_ns = dict[str, list]()
+        for o in objs:
+            item = project(o.json_value, field_tree(SNAPSHOT_ITEM_FIELDS))
+            by_ns.setdefault(o.namespace, list()).append(dict(kind=o.kind, collection=o.collection, item=item))
+        for namespace in [ns] if ns is not None else by_ns.keys():
+            self.snapshots.put(f"objects/{ctx}/{namespace}", by_ns.get(namespace, list()))
+
+    def get_cached_ns_objects(self, ctx, ns) -> tuple[list[Resource], float]:
+        """Objects of the namespace as last listed, and when, or ([], None)"""
+        entries, saved = self.snapshots.get(f"objects/{ctx}/{ns}")
+        objs = list[Resource]()
+        for entry in entries or []:
+            resource = self.metadata_item_to_resource(ctx=ctx, ns=ns, item=entry["item"], kind=entry["kind"])
+            resource.collection = intern(entry["collection"])
+            objs.append(resource)
+        return objs, saved
+
+    def get_kind_table(self, resource: Resource):
+        """
+        Server side Table of every object of the kind of resource in its namespace, as (columns, rows).
+        Only the columns kubectl shows without -o wide are kept. Returns None if the kind can not be listed.
+        """
+        if not resource.collection:
+            return None
+        columns, keep, rows = None, None, list[list[str]]()
+        for success, response in self.k8s.paginate(self.k8s.list_table, self.k8s.core_clients[resource.context], resource.collection):
+            if not success:
+                self.log(f"Listing {resource.collection} as Table failed: {response}")
+                return None
+            if columns is None:
+                definitions = response.get("columnDefinitions", [])
+                keep = [i for i, c in enumerate(definitions) if c.get("priority", 0) == 0]
+                columns = [definitions[i] for i in keep]
+            for row in response.get("rows", []):
+                cells = row.get("cells", [])
+                rows.append([self.format_cell(cells[i] if i < len(cells) else None, columns[n]) for n, i in enumerate(keep)])
+        return [c.get("name", "") for c in columns or []], rows
 
-        # TODO: Add daemonset, statefulset, job, cronjobs etc that is supported in the apps api
-        # TODO: Sort items by group
+    @staticmethod
+    def format_cell(value, column: dict) -> str:
+        if value is None:
+            return "<none>"
+        # Like kubectl, timestamps are shown as an age
+        if column.get("format") == "date" or column.get("name") == "Age":
+            try:
+                created = datetime.strptime(value, "%Y-%m-%dT%H:%M:%SZ").replace(tzinfo=timezone.utc)
+                return Commons.human_duration((datetime.now(timezone.utc) - created).total_seconds())
+            except (TypeError, ValueError):
+                return str(value)
+        return str(value)
 
-        return objs
+    @staticmethod
+    def human_duration(seconds: float) -> str:
+        seconds = max(0, int(seconds))
+        minutes, hours, days = seconds // 60, seconds // 3600, seconds // 86400
+        if seconds < 120:
+            return f"{seconds}s"
+        if minutes < 10:
+            return f"{minutes}m{seconds % 60}s" if seconds % 60 else f"{minutes}m"
+        if hours < 3:
+            return f"{minutes}m"
+        if hours < 8:
+            return f"{hours}h{minutes % 60}m" if minutes % 60 else f"{hours}h"
+        if hours < 48:
+            return f"{hours}h"
+        if days < 8:
+            return f"{days}d{hours % 24}h" if hours % 24 else f"{days}d"
+        if days < 365 * 2:
+            return f"{days}d"
+        return f"{days // 365}y{days % 365}d" if days < 365 * 8 else f"{days // 365}y"
+
+    def memory_report(self) -> dict:
+        """Debug report of what the informer and full object caches hold"""
+        seen = set()
+        return dict(informers=memory_report(self.informers.all_objects(), seen), full_objects=memory_report(self.full_objects.list(), seen))
 
     @staticmethod
     def get_container_list_from_pod(pod: Resource):
         containers = list()
-        if "spec" in pod.json_value and "containers" in pod.json_value["spec"]:
-            for container in pod.json_value["spec"]["containers"]:
-                containers.append(container["name"])
+        spec = pod.json_value.get("spec", {})
+        for container in spec.get("initContainers", []) + spec.get("containers", []):
+            containers.append(container["name"])
+        return containers
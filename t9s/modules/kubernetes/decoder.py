@@ -0,0 +1,93 @@
+import importlib.util
+import json
+from functools import lru_cache
+
+from t9s.modules.utils.config import config
+
+BACKENDS = ["json", "orjson", "simdjson"]
+
+
+@lru_cache(maxsize=None)
+def field_tree(fields: tuple) -> dict:
+    """Nested dict of dotted field paths, ("metadata.name", "metadata.uid", "kind") is {metadata: {name: {}, uid: {}}, kind: {}}"""
+    tree = dict()
+    for field in fields:
+        node = tree
+        for part in field.split("."):
+            node = node.setdefault(part, dict())
+    return tree
+
+
+def project(value, tree: dict):
+    """Only the fields of tree out of a decoded value, an empty subtree keeps the whole value"""
+    if not tree or not isinstance(value, dict):
+        return value
+    return {key: project(value[key], subtree) for key, subtree in tree.items() if key in value}
+
+
+# noinspection PyBroadException
+class Decoder:
+    """
+    JSON decoding of API responses, with the fastest parser installed. orjson and pysimdjson are optional:
+      - loads() parses a whole body with orjson, or the json module without it
+      - loads_list() keeps only the given fields of every item of a list. pysimdjson parses lazily, so the rest of an
+        item (managedFields most of all) never becomes Python objects. Without it the body is parsed whole and projected.
+    The parser can be pinned in the config, api.decoder is one of json, orjson or simdjson.
+    """
+
+    def __init__(self, backend=None):
+        backend = backend or (config.values.get("api") or {}).get("decoder")
+        # A pinned parser that is not installed falls back to the fastest one that is
+        self.backend = backend if backend in BACKENDS and self.installed(backend) else self.fastest()
+        self._loads = None
+        self._simdjson = None
+
+    @staticmethod
+    def installed(backend) -> bool:
+        # pysimdjson installs as simdjson
+        return backend == "json" or importlib.util.find_spec(backend) is not None
+
+    @staticmethod
+    def fastest() -> str:
+        return next(backend for backend in reversed(BACKENDS) if Decoder.installed(backend))
+
+    def loads(self, data):
+        if self._loads is None:
+            # Imported on first use, like the kubernetes client nothing of this is needed for the first frame
+            self._loads = importlib.import_module("orjson").loads if self.backend != "json" and self.installed("orjson") else json.loads
+        return self._loads(data)
+
+    def loads_list(self, data, fields: tuple):
+        """A list body whose items only have fields, given as dotted paths. Everything but the items is kept whole"""
+        if self.backend != "simdjson":
+            body = self.loads(data)
+            items = body.get("items") if isinstance(body, dict) else None
+            if items:
+                tree = field_tree(fields)
+                body["items"] = [project(item, tree) for item in items]
+            return body
+        if self._simdjson is None:
+            self._simdjson = importlib.import_module("simdjson")
+        # A parser can not be shared between threads, and can not parse again while its last document is in use
+        doc = self._simdjson.Parser().parse(data)
+        if not isinstance(doc, self._simdjson.Object):
+            return self.materialize(doc)
+        tree = field_tree(fields)
+        return {
+            key: [self.pick(item, tree) for item in doc[key]] if key == "items" and doc[key] else self.materialize(doc[key]) for key in doc.keys()
+        }
+
+    def materialize(self, value):
+        if isinstance(value, self._simdjson.Object):
+            return value.as_dict()
+        if isinstance(value, self._simdjson.Array):
+            return value.as_list()
+        return value
+
+    def pick(self, value, tree: dict):
+        if not tree or not isinstance(value, self._simdjson.Object):
+            return self.materialize(value)
+        return {key: self.pick(value[key], subtree) for key, subtree in tree.items() if key in value}
+
+
+decoder = Decoder()
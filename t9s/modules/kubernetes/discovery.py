@@ -0,0 +1,179 @@
+import dataclasses
+import threading
+import time
+
+from t9s.modules.kubernetes.k8s import K8s, METADATA_ACCEPT
+from t9s.modules.kubernetes.objects import ApiResource
+from t9s.modules.utils.snapshot import snapshots
+
+AGGREGATED_DISCOVERY_ACCEPT = (
+    "application/json;g=apidiscovery.k8s.io;v=v2;as=APIGroupDiscoveryList,"
+    "application/json;g=apidiscovery.k8s.io;v=v2beta1;as=APIGroupDiscoveryList,"
+    "application/json"
+)
+
+
+# noinspection PyBroadException
+class CrdWatcher(threading.Thread):
+    """Invalidates the discovery cache of a context as soon as a CRD is added, changed or removed"""
+
+    def __init__(self, ctx, client, resource_version, on_change, logger, *args, **kwargs):
+        super(CrdWatcher, self).__init__(*args, daemon=True, **kwargs)
+        self.ctx = ctx
+        self.client = client
+        self.resource_version = resource_version
+        self.on_change = on_change
+        self.log = logger
+
+    def run(self):
+        try:
+            for event in K8s.watch_path(
+                self.client,
+                "/apis/apiextensions.k8s.io/v1/customresourcedefinitions",
+                resource_version=self.resource_version,
+                accept=METADATA_ACCEPT,
+            ):
+                if event.get("type") in ["ADDED", "MODIFIED", "DELETED"]:
+                    break
+        except Exception as err:
+            self.log(f"CRD watch in {self.ctx} failed: {err}")
+        # Either a CRD changed or the watch ended, in both cases the next lookup has to rediscover
+        self.on_change(self.ctx)
+
+
+# noinspection PyBroadException
+class DiscoveryCache:
+    """Per context cache of the namespaced resource types served by the cluster, built from the API discovery endpoints"""
+
+    def __init__(self, ttl=300):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._ctx_locks: dict[str, threading.Lock] = dict()
+        self._entries: dict[str, tuple[float, list[ApiResource]]] = dict()
+        self._watchers: dict[str, CrdWatcher] = dict()
+
+    def _ctx_lock(self, ctx) -> threading.Lock:
+        with self._lock:
+            return self._ctx_locks.setdefault(ctx, threading.Lock())
+
+    def invalidate(self, ctx):
+        with self._lock:
+            self._entries.pop(ctx, None)
+
+    def get_namespaced_resources(self, ctx, k8s: K8s) -> list[ApiResource]:
+        with self._ctx_lock(ctx):
+            with self._lock:
+                entry = self._entries.get(ctx)
+            if entry and time.monotonic() - entry[0] < self.ttl:
+                return entry[1]
+            if entry is None:
+                # What the last run discovered is good enough to start listing, it is rediscovered in the background
+                cached, _ = snapshots.get(f"discovery/{ctx}")
+                if cached:
+                    resources = [ApiResource(**r) for r in cached]
+                    with self._lock:
+                        self._entries[ctx] = (time.monotonic(), resources)
+                    threading.Thread(target=self.revalidate, args=(ctx, k8s), daemon=True).start()
+                    return resources
+            return self.refresh(ctx=ctx, k8s=k8s)
+
+    def revalidate(self, ctx, k8s: K8s):
+        try:
+            with self._ctx_lock(ctx):
+                self.refresh(ctx=ctx, k8s=k8s)
+        except Exception as err:
+            k8s.log(f"Discovery in {ctx} failed: {err}")
+
+    def refresh(self, ctx, k8s: K8s) -> list[ApiResource]:
+        resources, resource_version = self.discover(ctx=ctx, k8s=k8s)
+        with self._lock:
+            self._entries[ctx] = (time.monotonic(), resources)
+        snapshots.put(f"discovery/{ctx}", [dataclasses.asdict(r) for r in resources]) if resources else None
+        watcher = self._watchers.get(ctx)
+        if resource_version and (watcher is None or not watcher.is_alive()):
+            self._watchers[ctx] = CrdWatcher(ctx, k8s.api_ext_clients[ctx], resource_version, self.invalidate, k8s.log)
+            self._watchers[ctx].start()
+        return resources
+
+    def discover(self, ctx, k8s: K8s):
+        """Every namespaced resource that can be listed and watched, in the preferred version of its group"""
+        client = k8s.api_ext_clients[ctx]
+        # Only needed for the resourceVersion the CRD watch starts from
+        success, response = k8s.list_crd_metadata(client)
+        resource_version = response.get("metadata", {}).get("resourceVersion") if success else None
+
+        resources = list[ApiResource]()
+        for root in ["/api", "/apis"]:
+            success, response = k8s.get_path(client, root, accept=AGGREGATED_DISCOVERY_ACCEPT)
+            if not success:
+                continue
+            if response.get("kind") == "APIGroupDiscoveryList":
+                resources += self.parse_aggregated_discovery(response)
+            elif root == "/api":
+                resources += self.discover_core(client, k8s, response)
+            else:
+                resources += self.discover_per_group(client, k8s, response)
+        return [r for r in resources if r.namespaced and {"list", "watch"} <= set(r.verbs)], resource_version
+
+    @staticmethod
+    def parse_aggregated_discovery(response) -> list[ApiResource]:
+        resources = list[ApiResource]()
+        for group in response.get("items", []):
+            # Versions are listed in order of preference, the core group has no name
+            versions = group.get("versions", [])
+            if not versions:
+                continue
+            version = versions[0]
+            for res in version.get("resources", []):
+                resources.append(
+                    ApiResource(
+                        group=group.get("metadata", {}).get("name", ""),
+                        version=version.get("version"),
+                        kind=res.get("responseKind", {}).get("kind", ""),
+                        plural=res.get("resource"),
+                        namespaced=res.get("scope") == "Namespaced",
+                        verbs=res.get("verbs", []),
+                    )
+                )
+        return resources
+
+    @staticmethod
+    def parse_resource_list(group, version, response) -> list[ApiResource]:
+        resources = list[ApiResource]()
+        for res in response.get("resources", []):
+            # Skip subresources like pods/log
+            if "/" in res.get("name", ""):
+                continue
+            resources.append(
+                ApiResource(
+                    group=group,
+                    version=version,
+                    kind=res.get("kind", ""),
+                    plural=res.get("name"),
+                    namespaced=res.get("namespaced", False),
+                    verbs=res.get("verbs", []),
+                )
+            )
+        return resources
+
+    @staticmethod
+    def discover_core(client, k8s: K8s, response) -> list[ApiResource]:
+        version = (response.get("versions") or ["v1"])[0]
+        success, resources = k8s.get_path(client, f"/api/{version}")
+        return DiscoveryCache.parse_resource_list("", version, resources) if success else list[ApiResource]()
+
+    @staticmethod
+    def discover_per_group(client, k8s: K8s, response) -> list[ApiResource]:
+        found = list[ApiResource]()
+        for group in response.get("groups", []):
+            name = group.get("name", "")
+            version = group.get("preferredVersion", {}).get("version") or next(iter(group.get("versions", [])), {}).get("version")
+            if not version:
+                continue
+            success, resources = k8s.get_path(client, f"/apis/{name}/{version}")
+            if success:
+                found += DiscoveryCache.parse_resource_list(name, version, resources)
+        return found
+
+
+discovery = DiscoveryCache()
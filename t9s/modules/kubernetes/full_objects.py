@@ -0,0 +1,63 @@
+import threading
+from collections import OrderedDict
+
+from t9s.modules.kubernetes.k8s import K8s
+from t9s.modules.kubernetes.objects import Resource
+
+MAX_FULL_OBJECTS = 256
+
+
+class FullObjectCache:
+    """
+    Bounded LRU of complete objects. Informers only list metadata, the full object of a selected resource is fetched
+    once per resourceVersion and dropped again when it falls out of the cache.
+    """
+
+    def __init__(self, maxsize=MAX_FULL_OBJECTS):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[tuple, Resource] = OrderedDict()
+
+    @staticmethod
+    def key(resource: Resource):
+        return resource.context, resource.uid, resource.metadata.get("resourceVersion")
+
+    def get(self, resource: Resource) -> Resource:
+        key = self.key(resource)
+        with self._lock:
+            full = self._entries.get(key)
+            if full is not None:
+                self._entries.move_to_end(key)
+            return full
+
+    def put(self, listed: Resource, full: Resource):
+        with self._lock:
+            # The fetched copy may be newer than the listed one, it is found under both versions
+            for key in {self.key(listed), self.key(full)}:
+                self._entries[key] = full
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def list(self) -> list[Resource]:
+        with self._lock:
+            return list({id(full): full for full in self._entries.values()}.values())
+
+    def fetch(self, resource: Resource, k8s: K8s, to_resource) -> Resource:
+        """Returns the full object of a listed resource, None if it could not be fetched"""
+        if not resource.partial:
+            return resource
+        full = self.get(resource)
+        if full is not None:
+            return full
+        success, response = k8s.get_path(k8s.core_clients[resource.context], resource.api_path)
+        if not success:
+            k8s.log(f"Fetching {resource.api_path} failed: {response}")
+            return None
+        full = to_resource(ctx=resource.context, ns=resource.namespace, item=response, kind=resource.kind)
+        full.collection = resource.collection
+        self.put(resource, full)
+        return full
+
+
+full_objects = FullObjectCache()
@@ -0,0 +1,81 @@
+from typing import Iterator
+
+from t9s.modules.kubernetes.objects import Resource
+
+
+class ResourceIndex:
+    """
+    UID -> Resource index plus an owner UID -> child UIDs adjacency map. Built in a single pass over the objects
+    and kept up to date one object at a time as informer deltas arrive.
+    Objects whose owner is not part of the index (not a listed kind, or not loaded yet) are treated as roots.
+    """
+
+    def __init__(self, objs: list[Resource] = None):
+        self.by_uid: dict[str, Resource] = dict()
+        # dict values are unused, dict keys keep insertion order which keeps the tree stable between updates
+        self.children: dict[str, dict[str, None]] = dict()
+        for o in objs or []:
+            self.add(o)
+
+    def __len__(self):
+        return len(self.by_uid)
+
+    def __contains__(self, uid):
+        return uid in self.by_uid
+
+    def get(self, uid) -> Resource:
+        return self.by_uid.get(uid)
+
+    def add(self, resource: Resource):
+        """Adds or replaces a resource, returns the resource it replaced if any"""
+        previous = self.by_uid.get(resource.uid)
+        if previous is not None and previous.owner != resource.owner and previous.owner in self.children:
+            self.children[previous.owner].pop(resource.uid, None)
+        self.by_uid[resource.uid] = resource
+        if resource.owner is not None:
+            self.children.setdefault(resource.owner, dict())[resource.uid] = None
+        return previous
+
+    def remove(self, uid) -> Resource:
+        resource = self.by_uid.pop(uid, None)
+        if resource is not None and resource.owner in self.children:
+            self.children[resource.owner].pop(uid, None)
+            if not self.children[resource.owner]:
+                del self.children[resource.owner]
+        return resource
+
+    def is_root(self, resource: Resource) -> bool:
+        return resource.owner is None or resource.owner not in self.by_uid
+
+    def roots(self) -> list[Resource]:
+        return [o for o in self.by_uid.values() if self.is_root(o)]
+
+    def has_children(self, uid) -> bool:
+        return bool(self.children.get(uid))
+
+    def get_children(self, uid) -> list[Resource]:
+        return [self.by_uid[child] for child in self.children.get(uid, {}) if child in self.by_uid]
+
+    def walk(self, uid) -> Iterator[Resource]:
+        """Depth first iteration over everything owned, directly or indirectly, by uid"""
+        stack = list(reversed(self.get_children(uid)))
+        seen = {uid}
+        while stack:
+            resource = stack.pop()
+            # ownerReferences can form cycles in broken clusters
+            if resource.uid in seen:
+                continue
+            seen.add(resource.uid)
+            yield resource
+            stack.extend(reversed(self.get_children(resource.uid)))
+
+    def is_owned_by(self, uid, owner_uid) -> bool:
+        """True if owner_uid is somewhere up the owner chain of uid"""
+        seen = set()
+        resource = self.by_uid.get(uid)
+        while resource is not None and resource.owner is not None and resource.owner not in seen:
+            if resource.owner == owner_uid:
+                return True
+            seen.add(resource.owner)
+            resource = self.by_uid.get(resource.owner)
+        return False
@@ -0,0 +1,303 @@
+import asyncio
+import threading
+
+from t9s.modules.kubernetes.k8s import K8s
+from t9s.modules.kubernetes.objects import Resource, KindLister
+from t9s.modules.utils.config import config
+from t9s.modules.utils.stats import stats, describe_path
+
+HTTP_STATUS_FORBIDDEN = 403
+HTTP_STATUS_NOT_FOUND = 404
+HTTP_STATUS_GONE = 410
+# Contexts informed at once. Each has a thread and a watch per kind, shared by all of its namespaces, the least
+# recently used context is stopped to make room for another one
+DEFAULT_MAX_CONTEXTS = 3
+
+
+# noinspection PyBroadException
+class Informer(threading.Thread):
+    """
+    Keeps a local copy of one kind across all namespaces of a context: a single LIST, then a WATCH from the
+    returned resourceVersion that applies ADDED/MODIFIED/DELETED deltas to the copy.
+    """
+
+    def __init__(self, ctx, lister: KindLister, to_resource, on_delta, logger, *args, **kwargs):
+        super(Informer, self).__init__(*args, daemon=True, **kwargs)
+        self.ctx = ctx
+        self.lister = lister
+        self.to_resource = to_resource
+        self.on_delta = on_delta
+        self.log = logger
+        # By namespace then uid, so that one namespace is read without going through the others
+        self.objects: dict[str, dict[str, Resource]] = dict()
+        self.synced = threading.Event()
+        # (loop, asyncio.Event) of the coroutines in wait_synced
+        self._sync_waiters = list()
+        self._stop_event = threading.Event()
+        self._lock = threading.Lock()
+        self.resource_version = None
+        # Open watch stream, aborted by stop()
+        self.response = None
+        self.collection = lister.collection(None)
+
+    def stop(self):
+        self._stop_event.set()
+        # The watch would only notice between events, or at its timeout
+        response = self.response
+        K8s.abort(response) if response is not None else None
+
+    def stopped(self):
+        return self._stop_event.is_set()
+
+    def list(self, ns=None) -> list[Resource]:
+        """Objects of one namespace, or of every namespace for ns None"""
+        with self._lock:
+            if ns is not None:
+                return list(self.objects.get(ns, {}).values())
+            return [o for by_uid in self.objects.values() for o in by_uid.values()]
+
+    def get(self, ns, uid) -> Resource:
+        with self._lock:
+            return self.objects.get(ns, {}).get(uid)
+
+    def put(self, resource: Resource) -> None:
+        self.objects.setdefault(resource.namespace, dict())[resource.uid] = resource
+
+    def remove(self, resource: Resource) -> None:
+        by_uid = self.objects.get(resource.namespace, {})
+        by_uid.pop(resource.uid, None)
+        self.objects.pop(resource.namespace, None) if not by_uid else None
+
+    def relist(self):
+        # Each page is added (and announced) as soon as it is parsed, so consumers can show the first objects right away
+        seen = set()
+        resource_version = None
+        pages = K8s.paginate(self.lister.list_func, self.lister.client, self.collection, **self.lister.kwargs)
+        while True:
+            # The request scheduler bounds how many LIST pages of all informers are in flight at once
+            success, response = next(pages, (None, None))
+            if self.stopped():
+                return None
+            if success is None:
+                break
+            if not success:
+                return response
+            # All pages of a paginated LIST come from the same snapshot
+            resource_version = resource_version or response.get("metadata", {}).get("resourceVersion")
+            page = list[Resource]()
+            for item in response.get("items", []):
+                resource = self.to_resource(ctx=self.ctx, ns=None, item=item, kind=self.lister.kind, path=self.lister.path)
+                if resource and resource.uid:
+                    page.append(resource)
+            with self._lock:
+                for resource in page:
+                    self.put(resource)
+                    seen.add(resource.uid)
+            for resource in page:
+                self.on_delta("ADDED", resource)
+        with self._lock:
+            removed = [o for by_uid in self.objects.values() for uid, o in by_uid.items() if uid not in seen]
+            for o in removed:
+                self.remove(o)
+        self.resource_version = resource_version
+        for o in removed:
+            self.on_delta("DELETED", o)
+        return None
+
+    def apply(self, event_type, item):
+        self.resource_version = item.get("metadata", {}).get("resourceVersion", self.resource_version)
+        if event_type not in ["ADDED", "MODIFIED", "DELETED"]:
+            return
+        resource = self.to_resource(ctx=self.ctx, ns=None, item=item, kind=self.lister.kind, path=self.lister.path)
+        if not resource or not resource.uid:
+            return
+        with self._lock:
+            if event_type == "DELETED":
+                self.remove(resource)
+            else:
+                self.put(resource)
+        self.on_delta(event_type, resource)
+
+    def opened(self, response):
+        self.response = response
+        # Stopped while the watch was being opened
+        K8s.abort(response) if self.stopped() else None
+
+    def watch(self):
+        try:
+            for event in self.lister.watch_func(
+                self.lister.client,
+                self.collection,
+                resource_version=self.resource_version,
+                timeout_seconds=60,
+                opened=self.opened,
+                **self.lister.kwargs,
+            ):
+                if self.stopped():
+                    return
+                self.apply(event["type"], event["object"])
+        finally:
+            self.response = None
+
+    def mark_synced(self):
+        with self._lock:
+            self.synced.set()
+            waiters, self._sync_waiters = self._sync_waiters, list()
+        for loop, event in waiters:
+            loop.call_soon_threadsafe(event.set)
+
+    async def wait_synced(self):
+        """Waits on the event loop until the first LIST is done, without holding a thread"""
+        with self._lock:
+            if self.synced.is_set():
+                return
+            event = asyncio.Event()
+            self._sync_waiters.append((asyncio.get_running_loop(), event))
+        await event.wait()
+
+    def run(self):
+        try:
+            self.inform()
+        finally:
+            # Also when it ends before its first LIST, stopped or forbidden, so that nobody waits for it
+            self.mark_synced()
+
+    def inform(self):
+        backoff = 1
+        while not self.stopped():
+            if self.resource_version is None:
+                try:
+                    err = self.relist()
+                except Exception as exc:
+                    # Connection errors and the like, retried like an API error instead of ending the informer
+                    self.log(f"List of {self.lister.kind} in {self.ctx} failed: {exc}")
+                    err = exc
+                self.mark_synced()
+                if err is not None:
+                    if getattr(err, "status", None) in [HTTP_STATUS_FORBIDDEN, HTTP_STATUS_NOT_FOUND]:
+                        return
+                    stats.record_retry(self.ctx, describe_path(self.collection)[0], "list")
+                    self._stop_event.wait(backoff)
+                    backoff = min(backoff * 2, 60)
+                    continue
+            try:
+                self.watch()
+                backoff = 1
+            except Exception as err:
+                if self.stopped():
+                    return
+                if getattr(err, "status", None) == HTTP_STATUS_GONE:
+                    self.resource_version = None
+                else:
+                    self.log(f"Watch on {self.lister.kind} in {self.ctx} failed: {err}")
+                    stats.record_retry(self.ctx, describe_path(self.collection)[0], "watch")
+                    self._stop_event.wait(backoff)
+                    backoff = min(backoff * 2, 60)
+
+
+class InformerCache:
+    """
+    Process-wide set of informers keyed by (context, kind). Every kind is listed and watched once across all namespaces
+    of a context, a namespace is served from those, so threads and watches grow with the kinds and not with the namespaces.
+    At most max_contexts are informed at once, set in the config as
+        informers:
+          max_contexts: 3
+    """
+
+    def __init__(self, max_contexts=None):
+        self.max_contexts = max_contexts or int((config.values.get("informers") or {}).get("max_contexts", DEFAULT_MAX_CONTEXTS))
+        self._lock = threading.Lock()
+        # In order of use, the least recently used first
+        self._informers: dict[str, dict[str, Informer]] = dict()
+        self._listeners = list()
+        self._eviction_listeners = list()
+
+    def covers(self, ctx) -> bool:
+        with self._lock:
+            return ctx in self._informers
+
+    def start_context(self, ctx, listers: list[KindLister], to_resource, logger):
+        with self._lock:
+            if ctx in self._informers:
+                return
+            informers = {lister.key: Informer(ctx, lister, to_resource, self._notify, logger) for lister in listers}
+            self._informers[ctx] = informers
+            # The new context is the most recently used one and never evicted itself
+            evicted = list(self._informers)[: max(0, len(self._informers) - max(1, self.max_contexts))]
+        for key in evicted:
+            self.stop_context(key)
+            for callback in list(self._eviction_listeners):
+                callback(key)
+        for informer in informers.values():
+            informer.start()
+
+    def stop_context(self, ctx):
+        with self._lock:
+            informers = self._informers.pop(ctx, {})
+        for informer in informers.values():
+            informer.stop()
+
+    def stop_all(self):
+        with self._lock:
+            keys = list(self._informers.keys())
+        for ctx in keys:
+            self.stop_context(ctx)
+
+    def informers_for(self, ctx) -> list[Informer]:
+        with self._lock:
+            if ctx not in self._informers:
+                return list()
+            # Moved to the end, the most recently used contexts are the last to be evicted
+            self._informers[ctx] = self._informers.pop(ctx)
+            return list(self._informers[ctx].values())
+
+    async def wait_synced(self, ctx, timeout=60) -> None:
+        """Waits until every informer of the context listed once, or for timeout seconds"""
+        try:
+            await asyncio.wait_for(asyncio.gather(*[informer.wait_synced() for informer in self.informers_for(ctx)]), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    def snapshot(self, ctx, ns) -> list[Resource]:
+        """Whatever is cached right now of a namespace, or of the whole context for ns None, without waiting for the LISTs"""
+        objs = list[Resource]()
+        for informer in self.informers_for(ctx):
+            objs += informer.list(ns)
+        return objs
+
+    def all_objects(self) -> list[Resource]:
+        with self._lock:
+            informers = [informer for by_kind in self._informers.values() for informer in by_kind.values()]
+        objs = list[Resource]()
+        for informer in informers:
+            objs += informer.list()
+        return objs
+
+    def get(self, ctx, ns, uid) -> Resource:
+        for informer in self.informers_for(ctx):
+            resource = informer.get(ns, uid)
+            if resource:
+                return resource
+        return None
+
+    def latest(self, resource: Resource) -> Resource:
+        """Returns the freshest cached copy of a resource, or the resource itself if it is not cached"""
+        cached = self.get(resource.context, resource.namespace, resource.uid) if resource.uid else None
+        return cached if cached else resource
+
+    def subscribe_evictions(self, callback):
+        """callback(ctx) is called when the informers of a context are stopped to make room for others"""
+        self._eviction_listeners.append(callback)
+
+    def subscribe(self, callback):
+        self._listeners.append(callback)
+
+    def unsubscribe(self, callback):
+        self._listeners.remove(callback) if callback in self._listeners else None
+
+    def _notify(self, event_type, resource: Resource):
+        for callback in list(self._listeners):
+            callback(event_type, resource)
+
+
+informers = InformerCache()
@@ -1,121 +1,196 @@
-import json
-import kubernetes as k8s
-from kubernetes.client import ApiException
+import socket
+import time
+
+from t9s.modules.kubernetes.clients import ClientMap, registry
+from t9s.modules.kubernetes.decoder import decoder, field_tree, project
+from t9s.modules.kubernetes.scheduler import scheduler
+from t9s.modules.utils.lazy import kubernetes as k8s
+from t9s.modules.utils.stats import stats, describe_path
+
+# Items per LIST page, bounds how much of a large namespace is held as raw JSON at once
+PAGE_SIZE = 500
+# Server side projection to ObjectMeta, the tree needs names, uids and owners but not spec and status
+METADATA_LIST_ACCEPT = "application/json;as=PartialObjectMetadataList;g=meta.k8s.io;v=v1,application/json"
+METADATA_ACCEPT = "application/json;as=PartialObjectMetadata;g=meta.k8s.io;v=v1,application/json"
+# Server side printing, the API server computes the columns kubectl shows including CRD additionalPrinterColumns
+TABLE_ACCEPT = "application/json;as=Table;g=meta.k8s.io;v=v1,application/json"
+# What the tree, the search index and the render cache read of a listed object, the rest is fetched when it is shown
+METADATA_ITEM_FIELDS = (
+    "apiVersion",
+    "kind",
+    "metadata.name",
+    "metadata.namespace",
+    "metadata.uid",
+    "metadata.resourceVersion",
+    "metadata.creationTimestamp",
+    "metadata.ownerReferences",
+    "metadata.labels",
+    "metadata.annotations",
+)
 
 
 # noinspection PyBroadException
 class K8s:
     def __init__(self, logger):
-        self.config = k8s.config
-        self.client = k8s.client
+        self.registry = registry
         self.contexts: list[str] = list()
-        self.core_clients: dict[str, k8s.client.CoreV1Api] = dict()
-        self.custom_clients: dict[str, k8s.client.CustomObjectsApi] = dict()
-        self.api_ext_clients: dict[str, k8s.client.ApiextensionsV1Api] = dict()
-        self.apps_clients: dict[str, k8s.client.AppsV1Api] = dict()
-        self.plural_of = dict()
+        # By class name, the kubernetes client is only imported once a context is used
+        self.core_clients = ClientMap(self.registry, "CoreV1Api")
+        self.custom_clients = ClientMap(self.registry, "CustomObjectsApi")
+        self.api_ext_clients = ClientMap(self.registry, "ApiextensionsV1Api")
+        self.apps_clients = ClientMap(self.registry, "AppsV1Api")
         self.load_contexts_and_clients()
         self.log = logger
 
     def load_contexts_and_clients(self):
-        # Adding try/catch block so that tappr init does not blow up if the KUBECONFIG has no clusters/entries
+        # Clients are created lazily by the shared registry the first time a context is used
         if len(self.contexts) == 0:
-            try:
-                contexts_obj, current_context = self.config.list_kube_config_contexts()
-                for ctx in contexts_obj:
-                    try:
-                        self.core_clients[ctx["name"]] = self.client.CoreV1Api(api_client=self.config.new_client_from_config(context=ctx["name"]))
-                        self.custom_clients[ctx["name"]] = self.client.CustomObjectsApi(
-                            api_client=self.config.new_client_from_config(context=ctx["name"])
-                        )
-                        self.api_ext_clients[ctx["name"]] = self.client.ApiextensionsV1Api(
-                            api_client=self.config.new_client_from_config(context=ctx["name"])
-                        )
-                        self.apps_clients[ctx["name"]] = self.client.AppsV1Api(api_client=self.config.new_client_from_config(context=ctx["name"]))
-                        self.contexts.append(ctx["name"])
-                    except Exception:
-                        pass
-            except Exception:
-                pass
+            self.contexts = list(self.registry.contexts)
 
     @staticmethod
-    def get_all_crds(client: k8s.client.ApiextensionsV1Api):
-        try:
-            response = client.list_custom_resource_definition(_preload_content=False)
-            return True, json.loads(response.data)
-        except ApiException as err:
-            return False, err
+    def paginate(list_func, *args, limit=PAGE_SIZE, **kwargs):
+        """Yields (success, response) for each page of a list_* call, following the continue token"""
+        _continue = None
+        while True:
+            success, response = list_func(*args, limit=limit, _continue=_continue, **kwargs)
+            yield success, response
+            _continue = response.get("metadata", {}).get("continue") if success else None
+            if not _continue:
+                return
 
     @staticmethod
-    def list_custom_objects_in_ns(client: k8s.client.CustomObjectsApi, namespace, group, version, plural):
-        try:
-            response = client.list_namespaced_custom_object(
-                group=group, version=version, namespace=namespace, plural=plural, _preload_content=False
-            )
-            return True, json.loads(response.data)
-        except ApiException as err:
-            return False, err
+    def get_path(client, path, query_params=None, accept="application/json", fields: tuple = None):
+        """
+        GET on a raw API path through the generic ApiClient, used for endpoints that need a custom Accept header.
+        Identical GETs in flight at the same time are sent once, see RequestScheduler. With fields the items of a list
+        only keep those, see Decoder.loads_list.
+        """
+        kind, verb = describe_path(path)
+        ctx = registry.context_of(client.api_client)
+        query_params = query_params or []
+
+        def decode(data):
+            return decoder.loads_list(data, fields) if fields else decoder.loads(data)
+
+        def request():
+            start = time.perf_counter()
+            try:
+                response = client.api_client.call_api(
+                    path,
+                    "GET",
+                    query_params=query_params,
+                    header_params={"Accept": accept},
+                    auth_settings=["BearerToken"],
+                    _return_http_data_only=True,
+                    _preload_content=False,
+                    _request_timeout=scheduler.request_timeout(),
+                )
+                data = response.data
+                elapsed = time.perf_counter() - start
+                body = decode(data)
+            except Exception as err:
+                stats.record_call(ctx, kind, verb, time.perf_counter() - start, error=err)
+                raise
+            # Lists have items, Tables have rows
+            objects = len(body.get("items") or body.get("rows") or []) if isinstance(body, dict) else 0
+            stats.record_call(ctx, kind, verb, elapsed, size=len(data), objects=objects)
+            return data, body
 
-    @staticmethod
-    def list_ns(client: k8s.client.CoreV1Api):
         try:
-            response = client.list_namespace(_preload_content=False)
-            return True, json.loads(response.data)
-        except ApiException as err:
+            (data, body), shared = scheduler.call(ctx, (ctx, path, tuple(query_params), accept, fields), request, kind=kind, verb=verb)
+        except Exception as err:
+            # Connection errors of urllib3 are not ApiExceptions, callers handle both as a failed request
             return False, err
+        # Callers change what they get, so the ones that shared a request parse their own copy
+        return True, decode(data) if shared else body
 
     @staticmethod
-    def list_pods_in_ns(client: k8s.client.CoreV1Api, namespace):
+    def watch_path(client, path, resource_version, accept="application/json", timeout_seconds=300, opened=None):
+        """Yields the events of a raw watch, opened(response) is called once the stream is open so that it can be aborted"""
+        kind, verb = describe_path(path, watch=True)
+        ctx = registry.context_of(client.api_client)
+
+        def request():
+            start = time.perf_counter()
+            try:
+                response = client.api_client.call_api(
+                    path,
+                    "GET",
+                    query_params=[
+                        ("watch", "true"),
+                        ("resourceVersion", resource_version),
+                        ("allowWatchBookmarks", "true"),
+                        ("timeoutSeconds", timeout_seconds),
+                    ],
+                    header_params={"Accept": accept},
+                    auth_settings=["BearerToken"],
+                    _return_http_data_only=True,
+                    _preload_content=False,
+                    # The server ends the watch after timeout_seconds, a quiet watch is not a stalled one before that
+                    _request_timeout=scheduler.request_timeout(idle=timeout_seconds),
+                )
+            except Exception as err:
+                stats.record_call(ctx, kind, verb, time.perf_counter() - start, error=err)
+                raise
+            # Latency of a watch is the time to its response headers, events are counted as they arrive
+            stats.record_call(ctx, kind, verb, time.perf_counter() - start)
+            return response
+
+        # Watches are never shared and do not hold a concurrency slot while they stream
+        response, _ = scheduler.call(ctx, None, request, kind=kind, verb=verb, long_lived=True)
+        opened(response) if opened else None
+        size, events = 0, 0
         try:
-            response = client.list_namespaced_pod(namespace=namespace, _preload_content=False)
-            return True, json.loads(response.data)
-        except ApiException as err:
-            return False, err
+            for line in k8s.watch.watch.iter_resp_lines(response):
+                size += len(line)
+                events += 1
+                yield decoder.loads(line)
+        finally:
+            stats.record_transfer(ctx, kind, verb, size=size, objects=events)
+            response.close()
+            response.release_conn()
 
     @staticmethod
-    def list_deployments_in_ns(client: k8s.client.AppsV1Api, namespace):
+    def abort(response) -> None:
+        """Ends a streaming response from another thread, a read blocked on it returns right away"""
         try:
-            response = client.list_namespaced_deployment(namespace=namespace, _preload_content=False)
-            return True, json.loads(response.data)
-        except ApiException as err:
-            return False, err
+            # urllib3 2.3 has shutdown(), before that the socket is reached through the connection
+            shutdown = getattr(response, "shutdown", None)
+            if shutdown:
+                shutdown()
+            elif response.connection is not None and response.connection.sock is not None:
+                response.connection.sock.shutdown(socket.SHUT_RDWR)
+        except Exception:
+            pass
 
     @staticmethod
-    def list_replicasets_in_ns(client: k8s.client.AppsV1Api, namespace):
-        try:
-            response = client.list_namespaced_replica_set(namespace=namespace, _preload_content=False)
-            return True, json.loads(response.data)
-        except ApiException as err:
-            return False, err
+    def list_crd_metadata(client: "k8s.client.ApiextensionsV1Api"):
+        # Only names and resourceVersions, full CRD bodies carry the whole OpenAPI schema
+        return K8s.get_path(client, "/apis/apiextensions.k8s.io/v1/customresourcedefinitions", accept=METADATA_LIST_ACCEPT)
 
     @staticmethod
-    def list_configmaps_in_ns(client: k8s.client.CoreV1Api, namespace):
-        try:
-            response = client.list_namespaced_config_map(namespace=namespace, _preload_content=False)
-            return True, json.loads(response.data)
-        except ApiException as err:
-            return False, err
+    def list_metadata(client, path, limit=None, _continue=None):
+        """LIST returning only the metadata of each object, path is a collection path in one or across all namespaces"""
+        query_params = [(name, value) for name, value in [("limit", limit), ("continue", _continue)] if value]
+        return K8s.get_path(client, path, query_params=query_params, accept=METADATA_LIST_ACCEPT, fields=METADATA_ITEM_FIELDS)
 
     @staticmethod
-    def list_secrets_in_ns(client: k8s.client.CoreV1Api, namespace):
-        try:
-            response = client.list_namespaced_secret(namespace=namespace, _preload_content=False)
-            return True, json.loads(response.data)
-        except ApiException as err:
-            return False, err
+    def list_table(client, path, limit=None, _continue=None):
+        """LIST rendered as a meta.k8s.io Table without the objects, path is a collection path"""
+        query_params = [("includeObject", "None")] + [(name, value) for name, value in [("limit", limit), ("continue", _continue)] if value]
+        return K8s.get_path(client, path, query_params=query_params, accept=TABLE_ACCEPT)
 
     @staticmethod
-    def list_service_accounts_in_ns(client: k8s.client.CoreV1Api, namespace):
-        try:
-            response = client.list_namespaced_service_account(namespace=namespace, _preload_content=False)
-            return True, json.loads(response.data)
-        except ApiException as err:
-            return False, err
+    def watch_metadata(client, path, resource_version, timeout_seconds=60, opened=None):
+        for event in K8s.watch_path(client, path, resource_version, accept=METADATA_ACCEPT, timeout_seconds=timeout_seconds, opened=opened):
+            # Raw watches report errors (like 410 Gone) in band, raise them like the typed Watch does
+            if event.get("type") == "ERROR":
+                status = event.get("object", {})
+                raise k8s.client.ApiException(status=status.get("code"), reason=status.get("message"))
+            # Same fields as the LIST the watch follows
+            event["object"] = project(event.get("object"), field_tree(METADATA_ITEM_FIELDS))
+            yield event
 
     @staticmethod
-    def list_pv_claims_in_ns(client: k8s.client.CoreV1Api, namespace):
-        try:
-            response = client.list_namespaced_persistent_volume_claim(namespace=namespace, _preload_content=False)
-            return True, json.loads(response.data)
-        except ApiException as err:
-            return False, err
+    def list_ns(client: "k8s.client.CoreV1Api"):
+        return K8s.get_path(client, "/api/v1/namespaces")
@@ -0,0 +1,240 @@
+import asyncio
+import ssl
+import time
+from typing import TYPE_CHECKING
+from urllib.parse import urlencode, urlsplit
+
+from t9s.modules.kubernetes.async_commons import executor
+from t9s.modules.kubernetes.clients import ClientMap, registry
+from t9s.modules.kubernetes.k8s import K8s
+from t9s.modules.kubernetes.objects import LogEvent
+from t9s.modules.kubernetes.scheduler import scheduler
+from t9s.modules.utils.stats import stats
+
+if TYPE_CHECKING:
+    from kubernetes.client import Configuration
+
+# Lines buffered between the streams and the UI, a full queue pauses the socket reads
+LOG_QUEUE_SIZE = 5000
+# Streams followed at once, the rest wait for a free slot
+MAX_LOG_STREAMS = 64
+RECONNECT_BACKOFF_MAX = 30
+
+core_clients = ClientMap(registry, "CoreV1Api")
+
+
+class LogStreamError(Exception):
+    def __init__(self, status, reason):
+        super().__init__(f"{status} {reason}")
+        self.status = status
+
+
+def ssl_context(configuration: "Configuration"):
+    if not configuration.verify_ssl:
+        context = ssl.create_default_context()
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_NONE
+    else:
+        context = ssl.create_default_context(cafile=configuration.ssl_ca_cert)
+    if configuration.cert_file:
+        context.load_cert_chain(configuration.cert_file, configuration.key_file)
+    return context
+
+
+def connection_settings(ctx) -> tuple["Configuration", dict, ssl.SSLContext]:
+    """
+    (configuration, auth headers, TLS context or None) of a context. Blocking, the kubeconfig is loaded on first use
+    (maybe running an exec plugin), the token may be refreshed and certificates are read from disk.
+    """
+    configuration = registry.api_client(ctx).configuration
+    auth_headers = {auth["key"]: auth["value"] for auth in configuration.auth_settings().values() if auth["in"] == "header" and auth["value"]}
+    return configuration, auth_headers, ssl_context(configuration) if urlsplit(configuration.host).scheme == "https" else None
+
+
+def container_ended(ctx, namespace, pod, container) -> bool:
+    """
+    Whether the log of a container will not grow anymore: the pod is gone or done, or the container terminated and its
+    restart policy does not start it again (init containers that succeeded). Blocking, the pod is fetched.
+    """
+    success, response = K8s.get_path(core_clients[ctx], f"/api/v1/namespaces/{namespace}/pods/{pod}")
+    if not success:
+        return getattr(response, "status", None) == 404
+    spec, status = response.get("spec", {}), response.get("status", {})
+    if status.get("phase") in ["Succeeded", "Failed"]:
+        return True
+    pod_policy = spec.get("restartPolicy") or "Always"
+    # Sidecars are init containers with their own restartPolicy Always, the others run once
+    policies = {c.get("name"): c.get("restartPolicy") or "Never" for c in spec.get("initContainers", [])}
+    for container_status in status.get("initContainerStatuses", []) + status.get("containerStatuses", []):
+        if container_status.get("name") != container:
+            continue
+        terminated = (container_status.get("state") or {}).get("terminated")
+        if terminated is None:
+            return False
+        policy = policies.get(container, pod_policy)
+        return policy == "Never" or (policy == "OnFailure" and terminated.get("exitCode") == 0)
+    return False
+
+
+async def open_log_stream(ctx, namespace, pod, container, query: dict):
+    """Sends a follow=true pod log request over a plain asyncio connection, returns the reader positioned at the body"""
+    loop = asyncio.get_running_loop()
+    configuration, auth_headers, context = await loop.run_in_executor(executor, connection_settings, ctx)
+    url = urlsplit(configuration.host)
+    tls = context is not None
+    port = url.port or (443 if tls else 80)
+    reader, writer = await asyncio.open_connection(
+        url.hostname,
+        port,
+        ssl=context,
+        server_hostname=(configuration.assert_hostname or url.hostname) if tls else None,
+    )
+    params = urlencode({"container": container, "follow": "true", "timestamps": "true", **query})
+    headers = {"Host": url.netloc, "Accept": "*/*", "Connection": "close", "User-Agent": "t9s", **auth_headers}
+    request = f"GET {url.path.rstrip('/')}/api/v1/namespaces/{namespace}/pods/{pod}/log?{params} HTTP/1.1\r\n"
+    request += "".join(f"{k}: {v}\r\n" for k, v in headers.items()) + "\r\n"
+    writer.write(request.encode())
+    await writer.drain()
+
+    status_line = (await reader.readline()).decode(errors="replace").split(" ", 2)
+    response_headers = dict()
+    while True:
+        line = (await reader.readline()).decode(errors="replace").strip()
+        if not line:
+            break
+        name, _, value = line.partition(":")
+        response_headers[name.strip().lower()] = value.strip()
+    status = int(status_line[1]) if len(status_line) > 1 and status_line[1].isdigit() else 0
+    if status != 200:
+        writer.close()
+        raise LogStreamError(status, status_line[2].strip() if len(status_line) > 2 else "")
+    return reader, writer, response_headers.get("transfer-encoding", "").lower() == "chunked"
+
+
+async def iter_lines(reader: asyncio.StreamReader, chunked: bool):
+    pending = b""
+    while True:
+        if chunked:
+            size = int((await reader.readline()).split(b";")[0].strip() or b"0", 16)
+            if size == 0:
+                break
+            data = await reader.readexactly(size)
+            await reader.readline()
+        else:
+            data = await reader.read(64 * 1024)
+            if not data:
+                break
+        pending += data
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            yield line.decode(errors="replace")
+    if pending:
+        yield pending.decode(errors="replace")
+
+
+# noinspection PyBroadException
+class LogMultiplexer:
+    """
+    Follows any number of container log streams as tasks on the running event loop instead of one thread each.
+    Every stream feeds one bounded queue, when the UI stops draining it the streams stop reading their sockets.
+    Dropped connections are resumed from the last seen timestamp with sinceTime, a stream that ends is only reopened
+    while its container may still write, so finished (init) containers give their slot to the waiting streams.
+    At most max_streams streams run at once, further streams are started as running ones finish or are stopped.
+    """
+
+    def __init__(self, logger, max_pending=LOG_QUEUE_SIZE, max_streams=MAX_LOG_STREAMS):
+        self.log = logger
+        self.max_pending = max_pending
+        self.max_streams = max_streams
+        self.queue: asyncio.Queue[LogEvent] = asyncio.Queue(maxsize=max_pending)
+        self.streams: dict[str, asyncio.Task] = dict()
+        self.waiting: dict[str, tuple] = dict()
+
+    def follow(self, ctx, namespace, pod, container, group, tail_lines=100) -> str:
+        key = f"{ctx}/{namespace}/{pod}/{container}"
+        if key not in self.streams and key not in self.waiting:
+            self.waiting[key] = (key, ctx, namespace, pod, container, group, tail_lines)
+            self.start_waiting()
+        return key
+
+    def start_waiting(self):
+        while self.waiting and len(self.streams) < self.max_streams:
+            key = next(iter(self.waiting))
+            args = self.waiting.pop(key)
+            task = asyncio.ensure_future(self.run(*args, self.queue))
+            task.add_done_callback(lambda t, k=key: self.finished(k, t))
+            self.streams[key] = task
+
+    def finished(self, key, task: asyncio.Task):
+        if self.streams.get(key) is task:
+            del self.streams[key]
+        self.start_waiting()
+
+    def stop(self, key):
+        self.waiting.pop(key, None)
+        task = self.streams.pop(key, None)
+        task.cancel() if task else None
+        self.start_waiting()
+
+    def stop_all(self):
+        self.waiting.clear()
+        for key in list(self.streams):
+            self.stop(key)
+
+    def reset(self):
+        """Stops every stream and drops whatever they left in the queue"""
+        self.stop_all()
+        self.queue = asyncio.Queue(maxsize=self.max_pending)
+
+    def drain(self) -> list[LogEvent]:
+        events = list[LogEvent]()
+        while not self.queue.empty():
+            events.append(self.queue.get_nowait())
+        return events
+
+    async def run(self, key, ctx, namespace, pod, container, group, tail_lines, queue: asyncio.Queue):
+        loop = asyncio.get_running_loop()
+        last_ts = None
+        backoff = 1
+        while True:
+            writer = None
+            size, lines, delivered = 0, 0, 0
+            # Opening a stream takes a token of the context like any request, reconnects of many pods are spread out
+            await asyncio.sleep(scheduler.reserve(ctx))
+            start = time.perf_counter()
+            try:
+                query = {"sinceTime": last_ts[:19] + "Z"} if last_ts else {"tailLines": tail_lines}
+                reader, writer, chunked = await open_log_stream(ctx, namespace, pod, container, query)
+                stats.record_call(ctx, "pods/log", "follow", time.perf_counter() - start)
+                async for line in iter_lines(reader, chunked):
+                    size += len(line)
+                    lines += 1
+                    ts, _, msg = line.partition(" ")
+                    # sinceTime has second precision, skip what was already delivered before the reconnect
+                    if not ts or (last_ts and ts <= last_ts):
+                        continue
+                    last_ts = ts
+                    delivered += 1
+                    await queue.put(LogEvent(group=group, msg=msg, ts=ts, stream=key))
+                # The server ended a follow stream, most of the time because the container exited
+                if await loop.run_in_executor(executor, container_ended, ctx, namespace, pod, container):
+                    return
+            except asyncio.CancelledError:
+                raise
+            except Exception as err:
+                self.log(f"Log stream {key} failed: {err}")
+                if writer is None:
+                    stats.record_call(ctx, "pods/log", "follow", time.perf_counter() - start, error=err)
+                else:
+                    # The stream broke after it was opened, it is already counted as a call
+                    stats.record_error(ctx, "pods/log", "follow", err)
+                if getattr(err, "status", None) == 404:
+                    return
+            finally:
+                stats.record_transfer(ctx, "pods/log", "follow", size=size, objects=lines)
+                writer.close() if writer else None
+            stats.record_retry(ctx, "pods/log", "follow")
+            # Only a stream that brought new lines starts over from a short backoff, one that reopens empty keeps backing off
+            backoff = 1 if delivered else backoff
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, RECONNECT_BACKOFF_MAX)
@@ -1,29 +1,120 @@
-from dataclasses import dataclass
+import sys
+from dataclasses import dataclass, field
+from typing import Callable
+
+
+def intern(value: str) -> str:
+    return sys.intern(value) if isinstance(value, str) else value
 
 
-@dataclass
 class Resource:
-    name: str = None
-    kind: str = None
-    context: str = None
-    namespace: str = None
-    uid: str = None
-    owner: str = None
-    has_children: bool = False
-    metadata: dict = None
-    spec: dict = None
-    status: dict = None
-    json_value: dict = None
+    """
+    Hundreds of thousands of these are kept across contexts: no per instance __dict__, kind/context/namespace strings
+    shared through interning, and metadata/spec/status are views into json_value instead of references of their own.
+    """
+
+    __slots__ = ("name", "kind", "context", "namespace", "uid", "owner", "has_children", "json_value", "collection", "partial")
+
+    def __init__(
+        self,
+        name: str = None,
+        kind: str = None,
+        context: str = None,
+        namespace: str = None,
+        uid: str = None,
+        owner: str = None,
+        has_children: bool = False,
+        json_value: dict = None,
+        collection: str = None,
+        partial: bool = False,
+    ):
+        self.name = name
+        self.kind = intern(kind)
+        self.context = intern(context)
+        self.namespace = intern(namespace)
+        self.uid = uid
+        self.owner = owner
+        self.has_children = has_children
+        self.json_value = json_value
+        # Collection path the object was listed from, shared by every object of the kind in the namespace
+        self.collection = intern(collection)
+        # Only the metadata was listed, the full object is fetched on demand
+        self.partial = partial
+
+    @property
+    def metadata(self) -> dict:
+        return self.json_value.get("metadata", {}) if self.json_value else {}
+
+    @property
+    def spec(self) -> dict:
+        return self.json_value.get("spec", {}) if self.json_value else {}
+
+    @property
+    def status(self) -> dict:
+        return self.json_value.get("status", {}) if self.json_value else {}
+
+    @property
+    def api_path(self) -> str:
+        """GET path of the object, set for listed objects"""
+        return f"{self.collection}/{self.name}" if self.collection else None
+
+    def __repr__(self):
+        return f"Resource(kind={self.kind!r}, context={self.context!r}, namespace={self.namespace!r}, name={self.name!r}, uid={self.uid!r})"
+
+    def __eq__(self, other):
+        if not isinstance(other, Resource):
+            return NotImplemented
+        return all(getattr(self, attr) == getattr(other, attr) for attr in self.__slots__)
+
+    __hash__ = None
 
 
 @dataclass
-class CustomResourceDefinition:
+class ApiResource:
+    """A resource type served by the API server, as found through discovery"""
+
     group: str
+    version: str
     kind: str
     plural: str
-    scope: str = None
-    version: str = None
-    printer_cols: list = None
+    namespaced: bool = True
+    verbs: list = field(default_factory=list)
+
+    @property
+    def key(self):
+        return f"{self.plural}.{self.group}" if self.group else self.plural
+
+    @property
+    def path(self):
+        """Collection path, with a {namespace} placeholder for namespaced resources"""
+        prefix = f"/apis/{self.group}/{self.version}" if self.group else f"/api/{self.version}"
+        return f"{prefix}/namespaces/{{namespace}}/{self.plural}" if self.namespaced else f"{prefix}/{self.plural}"
+
+    def matches(self, names: list[str]) -> bool:
+        """True if any of names is the kind (Deployment), the plural (deployments) or plural.group (deployments.apps)"""
+        return self.kind in names or self.plural in names or self.key in names
+
+
+@dataclass
+class KindLister:
+    kind: str
+    client: object
+    # Collection path with a {namespace} placeholder
+    path: str
+    # K8s wrapper used for LIST, returns (success, response)
+    list_func: Callable
+    # K8s wrapper used for WATCH, yields events as dicts
+    watch_func: Callable
+    group: str = None
+    kwargs: dict = field(default_factory=dict)
+
+    @property
+    def key(self):
+        return f"{self.kind}.{self.group}" if self.group else self.kind
+
+    def collection(self, namespace) -> str:
+        """Collection path in one namespace, or across all namespaces when namespace is None"""
+        return self.path.format(namespace=namespace) if namespace else self.path.replace("namespaces/{namespace}/", "")
 
 
 @dataclass
@@ -31,3 +122,5 @@ class LogEvent:
     group: str
     msg: str
     ts: str
+    # Source of the line (container), lines of one stream arrive in timestamp order
+    stream: str = None
@@ -0,0 +1,163 @@
+import email.utils
+import random
+import threading
+import time
+from datetime import timezone
+
+from t9s.modules.kubernetes.clients import MAX_CONCURRENT_REQUESTS
+from t9s.modules.utils.config import config
+from t9s.modules.utils.stats import stats
+
+# Per context, like the client-go rate limiter kubectl uses
+DEFAULT_QPS = 50
+DEFAULT_BURST = 100
+# Attempts of a request the API server throttles with 429 before its error is returned
+DEFAULT_MAX_RETRIES = 5
+RETRY_BACKOFF_MAX = 30
+# Seconds to connect and between two reads of a response, a stalled connection gives its slot back after them
+DEFAULT_CONNECT_TIMEOUT = 10
+DEFAULT_READ_TIMEOUT = 30
+HTTP_STATUS_TOO_MANY_REQUESTS = 429
+
+
+class TokenBucket:
+    """Allows qps requests per second on average and up to burst at once"""
+
+    def __init__(self, qps: float, burst: int):
+        self.qps = qps
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Takes a token, returns the seconds to wait before it may be used. Tokens go negative, so waiters keep their order"""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.qps) - 1
+            self.updated = now
+            return -self.tokens / self.qps if self.tokens < 0 else 0.0
+
+
+class Flight:
+    """A request in flight, the callers that ask for the same one wait for its result instead of sending it again"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: BaseException = None
+
+
+def retry_after(err) -> float:
+    """Seconds of the Retry-After header of an ApiException, given as seconds or as an HTTP date. None if missing or malformed"""
+    value = (getattr(err, "headers", None) or {}).get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        date = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    # A date without a zone is naive and can not be compared, HTTP dates are GMT
+    return max(0.0, date.replace(tzinfo=date.tzinfo or timezone.utc).timestamp() - time.time())
+
+
+# noinspection PyBroadException
+class RequestScheduler:
+    """
+    Every API request of t9s goes through here:
+      - identical GETs in flight at the same time are sent once and their callers share the response
+      - each context has a token bucket of qps and burst
+      - at most max_concurrent short requests are in flight across all contexts, watches only take a token
+      - a 429 is retried after its Retry-After, or an exponential backoff without one, plus jitter
+      - requests time out after connect_timeout and read_timeout, see request_timeout()
+    The limits can be set in the config:
+        api:
+          qps: 50
+          burst: 100
+          max_concurrent: 16
+          connect_timeout: 10
+          read_timeout: 30
+    """
+
+    def __init__(self, qps=None, burst=None, max_concurrent=None, max_retries=None, connect_timeout=None, read_timeout=None):
+        values = config.values.get("api") or {}
+        self.qps = float(qps or values.get("qps") or DEFAULT_QPS)
+        self.burst = int(burst or values.get("burst") or DEFAULT_BURST)
+        self.max_retries = int(max_retries or values.get("max_retries") or DEFAULT_MAX_RETRIES)
+        self.connect_timeout = float(connect_timeout or values.get("connect_timeout") or DEFAULT_CONNECT_TIMEOUT)
+        self.read_timeout = float(read_timeout or values.get("read_timeout") or DEFAULT_READ_TIMEOUT)
+        self.slots = threading.BoundedSemaphore(int(max_concurrent or values.get("max_concurrent") or MAX_CONCURRENT_REQUESTS))
+        self._lock = threading.Lock()
+        self._buckets: dict[str, TokenBucket] = dict()
+        self._in_flight: dict[tuple, Flight] = dict()
+
+    def bucket(self, ctx) -> TokenBucket:
+        with self._lock:
+            if ctx not in self._buckets:
+                self._buckets[ctx] = TokenBucket(self.qps, self.burst)
+            return self._buckets[ctx]
+
+    def request_timeout(self, idle=0) -> tuple[float, float]:
+        """(connect, read) timeouts of a request, idle adds the seconds a watch may legitimately go without an event"""
+        return self.connect_timeout, self.read_timeout + idle
+
+    def reserve(self, ctx) -> float:
+        """Seconds to wait before sending a request to ctx, for callers on the event loop that cannot block"""
+        return self.bucket(ctx).reserve()
+
+    def call(self, ctx, key, func, kind=None, verb=None, long_lived=False):
+        """
+        Returns (func(), shared) where shared tells that the result came from an identical request of another caller,
+        which then owns it. key identifies identical requests, None never shares. Exceptions of func are raised.
+        """
+        if key is None:
+            return self.send(ctx, func, kind, verb, long_lived), False
+        with self._lock:
+            flight = self._in_flight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._in_flight[key] = Flight()
+        if not leader:
+            stats.record_shared(ctx, kind, verb)
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result, True
+        try:
+            flight.result = self.send(ctx, func, kind, verb, long_lived)
+            return flight.result, False
+        except BaseException as err:
+            flight.error = err
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+            flight.done.set()
+
+    def send(self, ctx, func, kind, verb, long_lived):
+        bucket = self.bucket(ctx)
+        attempt = 0
+        while True:
+            time.sleep(bucket.reserve())
+            try:
+                if long_lived:
+                    return func()
+                with self.slots:
+                    return func()
+            except Exception as err:
+                if getattr(err, "status", None) != HTTP_STATUS_TOO_MANY_REQUESTS or attempt >= self.max_retries:
+                    raise
+                # The server says when to come back, the jitter keeps all throttled requests from coming back at once
+                delay = retry_after(err)
+                # Never longer than the backoff cap, whatever the header says
+                delay = min(2**attempt if delay is None else delay, RETRY_BACKOFF_MAX)
+                attempt += 1
+                stats.record_retry(ctx, kind, verb)
+                time.sleep(delay + random.uniform(0, delay / 2 + 0.1))
+
+
+scheduler = RequestScheduler()
@@ -0,0 +1,179 @@
+import threading
+from array import array
+from collections import Counter, defaultdict
+from itertools import islice
+
+from t9s.modules.kubernetes.informer import informers
+from t9s.modules.kubernetes.objects import Resource
+
+# Values longer than this (last-applied-configuration and friends) are not worth indexing, their key still is
+MAX_VALUE_CHARS = 128
+# Grams shared by this many objects say nothing about a misspelled term, fuzzy matching skips them
+MAX_FUZZY_POSTING = 50000
+# Matches ranked for a query, the rest of a very broad match is not shown anyway
+MAX_RANKED = 500
+# Candidates checked one by one before the rest is narrowed down by a second posting
+MAX_SCANNED = 2048
+# Names and values are padded so that their first characters form grams of their own, which is how terms shorter
+# than a trigram are matched against the start of a name or value
+NAME_PAD = "\x01\x01"
+VALUE_PAD = "  "
+
+
+def grams(text: str) -> set[str]:
+    return set(map("".join, zip(text, text[1:], text[2:])))
+
+
+class SearchIndex:
+    """
+    Trigram index over the name, kind, namespace, labels and annotations of every object the informers hold, kept up
+    to date from their deltas. The rarest gram of a query picks the candidates, which are checked against the text
+    of the object until enough of them matched. Postings are append only arrays of document ids: a deleted or changed
+    object leaves a tombstone behind, and all postings are rebuilt once tombstones outnumber live documents.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.postings: defaultdict[str, array] = defaultdict(lambda: array("I"))
+        # Document id to resource and to its lowercase text, None for tombstones
+        self.docs: list[Resource] = list()
+        self.texts: list[str] = list()
+        self.doc_of: dict[str, int] = dict()
+        self.dead = 0
+
+    def __len__(self):
+        return len(self.doc_of)
+
+    @staticmethod
+    def text(resource: Resource) -> str:
+        """Name first, then one line per value"""
+        values = [resource.name or "", resource.kind or "", resource.namespace or ""]
+        for field in ["labels", "annotations"]:
+            for key, value in (resource.metadata.get(field) or {}).items():
+                values.append(f"{key}={value}" if len(value or "") <= MAX_VALUE_CHARS else key)
+        return "\n".join(values).lower()
+
+    @staticmethod
+    def text_grams(text: str) -> set[str]:
+        return grams(NAME_PAD + text.replace("\n", "\n" + VALUE_PAD))
+
+    def on_delta(self, event_type, resource: Resource) -> None:
+        self.remove(resource.uid) if event_type == "DELETED" else self.add(resource)
+
+    def add(self, resource: Resource) -> None:
+        if not resource.uid:
+            return
+        text = self.text(resource)
+        with self._lock:
+            previous = self.doc_of.get(resource.uid)
+            # Most updates are status changes, they only swap the resource
+            if previous is not None and self.texts[previous] == text:
+                self.docs[previous] = resource
+                return
+        found = self.text_grams(text)
+        with self._lock:
+            self.tombstone(resource.uid)
+            self.insert(resource, text, found)
+
+    def remove(self, uid) -> None:
+        with self._lock:
+            self.tombstone(uid)
+
+    def remove_context(self, ctx) -> None:
+        """Drops the objects of a context whose informers were stopped, they are not kept up to date anymore"""
+        with self._lock:
+            for uid in [uid for uid, doc in self.doc_of.items() if self.docs[doc].context == ctx]:
+                self.tombstone(uid)
+
+    def insert(self, resource: Resource, text: str, found: set[str]) -> None:
+        doc = len(self.docs)
+        self.docs.append(resource)
+        self.texts.append(text)
+        self.doc_of[resource.uid] = doc
+        for gram in found:
+            self.postings[gram].append(doc)
+
+    def tombstone(self, uid) -> None:
+        doc = self.doc_of.pop(uid, None)
+        if doc is None:
+            return
+        self.docs[doc], self.texts[doc] = None, None
+        self.dead += 1
+        if self.dead > max(1000, len(self.doc_of)):
+            self.compact()
+
+    def compact(self) -> None:
+        live = [(resource, text) for resource, text in zip(self.docs, self.texts) if resource is not None]
+        self.postings.clear()
+        self.docs, self.texts, self.doc_of, self.dead = list(), list(), dict(), 0
+        for resource, text in live:
+            self.insert(resource, text, self.text_grams(text))
+
+    def term_postings(self, term: str) -> list:
+        """Postings that each hold every document matching term"""
+        if len(term) < 3:
+            # Too short for a trigram, matched against the start of the name or a value
+            names, values = self.postings.get(NAME_PAD[len(term) - 1 :] + term, ()), self.postings.get(VALUE_PAD[len(term) - 1 :] + term, ())
+            # A document whose name and one of its values both start with term is in both, search() skips the repeat
+            return [names + values if names and values else names or values]
+        return [self.postings.get(gram, ()) for gram in grams(term)]
+
+    @staticmethod
+    def matches(text: str, term: str) -> bool:
+        return term in text if len(term) > 2 else text.startswith(term) or f"\n{term}" in text
+
+    def fuzzy(self, term: str) -> set[int]:
+        """Documents holding at least half of the grams of a term that matched nothing as is"""
+        term_grams = grams(term)
+        counts = Counter()
+        for gram in term_grams:
+            posting = self.postings.get(gram, ())
+            if len(posting) <= MAX_FUZZY_POSTING:
+                counts.update(posting)
+        need = max(1, (len(term_grams) + 1) // 2)
+        return {doc for doc, count in counts.items() if count >= need and self.docs[doc] is not None}
+
+    @staticmethod
+    def rank(resource: Resource, term: str) -> tuple:
+        name = (resource.name or "").lower()
+        return 0 if name.startswith(term) else 1 if term in name else 2, len(name), name, resource.namespace or ""
+
+    def search(self, query: str, limit: int = 50) -> list[Resource]:
+        """
+        Resources matching every whitespace separated term of query, names starting with the first term first.
+        Terms shorter than a trigram match the start of names and values, longer ones match anywhere.
+        A single term that matches nothing falls back to fuzzy trigram matching.
+        """
+        terms = query.lower().split()
+        if not terms:
+            return list()
+        with self._lock:
+            texts = self.texts
+            # Postings of short terms can hold a document twice, only the few that matched are remembered
+            seen = set()
+
+            def check(doc):
+                if doc in seen or texts[doc] is None or not all(self.matches(texts[doc], term) for term in terms):
+                    return False
+                seen.add(doc)
+                return True
+
+            by_term = [sorted(self.term_postings(term), key=len) for term in terms]
+            # The rarest posting of each term, a second posting of a single term says less about the match
+            postings = sorted((postings[0] for postings in by_term), key=len) if len(terms) > 1 else by_term[0]
+            # Stops at MAX_RANKED matches, so a broad query costs about as much as a narrow one
+            found = list(islice(filter(check, islice(postings[0], MAX_SCANNED)), MAX_RANKED))
+            if len(found) < MAX_RANKED and len(postings[0]) > MAX_SCANNED:
+                # Few candidates match, the rest of them are narrowed down with the second rarest posting before being checked
+                rest = postings[0][MAX_SCANNED:]
+                rest = set(rest).intersection(postings[1]) if len(postings) > 1 else rest
+                found += islice(filter(check, rest), MAX_RANKED - len(found))
+            if not found and len(terms) == 1 and len(terms[0]) > 2:
+                found = list(islice(self.fuzzy(terms[0]), MAX_RANKED))
+            matches = [self.docs[doc] for doc in found]
+        return sorted(matches, key=lambda r: self.rank(r, terms[0]))[:limit]
+
+
+search_index = SearchIndex()
+informers.subscribe(search_index.on_delta)
+informers.subscribe_evictions(search_index.remove_context)
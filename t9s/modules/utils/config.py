@@ -0,0 +1,43 @@
+import os
+
+import yaml
+
+CONFIG_PATH = os.environ.get("T9S_CONFIG", os.path.join(os.path.expanduser("~"), ".config", "t9s", "config.yaml"))
+# Events churn all the time and would drown everything else in the tree
+DEFAULT_EXCLUDED_KINDS = ["events", "events.events.k8s.io"]
+
+
+# noinspection PyBroadException
+class Config:
+    """
+    Optional user config, for example
+        kinds:
+          include: [Deployment, pods, certificates.cert-manager.io]
+          exclude: [events, endpointslices.discovery.k8s.io]
+    Kinds are given as kind, plural or plural.group. Without include every discovered kind is listed.
+    """
+
+    def __init__(self, path=CONFIG_PATH):
+        self.path = path
+        self.values = self.load(path)
+
+    @staticmethod
+    def load(path) -> dict:
+        try:
+            with open(path) as f:
+                values = yaml.safe_load(f)
+            return values if isinstance(values, dict) else dict()
+        except Exception:
+            return dict()
+
+    @property
+    def included_kinds(self) -> list[str]:
+        return (self.values.get("kinds") or {}).get("include") or list()
+
+    @property
+    def excluded_kinds(self) -> list[str]:
+        kinds = self.values.get("kinds") or {}
+        return (kinds["exclude"] or list()) if "exclude" in kinds else DEFAULT_EXCLUDED_KINDS
+
+
+config = Config()
@@ -0,0 +1,29 @@
+import importlib
+import threading
+
+
+class LazyModule:
+    """
+    Stands in for a module that is only imported on first attribute access. The kubernetes package imports every API
+    and model class up front, which is most of the startup time, and nothing of it is needed for the first frame.
+    Annotations and except clauses that name the module have to be strings or evaluated late for this to help.
+    """
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def _load(self):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def preload(self) -> None:
+        """Imports the module on a background thread, so that the first use after startup does not wait for it"""
+        threading.Thread(target=self._load, daemon=True, name=f"t9s-import-{self._name}").start()
+
+
+kubernetes = LazyModule("kubernetes")
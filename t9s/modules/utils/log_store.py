@@ -0,0 +1,133 @@
+import heapq
+import time
+from bisect import insort
+
+from rich.markup import escape
+
+from t9s.modules.kubernetes.objects import LogEvent
+from t9s.modules.utils.config import config
+
+DEFAULT_MAX_LINES = 10000
+DEFAULT_MAX_BYTES = 8 * 1024 * 1024
+# How long a quiet stream can hold back lines of the other streams while waiting for it to catch up
+MERGE_GRACE_SECONDS = 1.0
+
+
+class LogStore:
+    """
+    Fixed budget log buffer. Lines are appended per stream (container) in timestamp order and merged into one
+    timestamp ordered buffer of formatted lines with a k-way merge over the stream heads. Merged lines are
+    formatted once and kept in a ring buffer (O(1) append and random access), evicted oldest first once either
+    the line or the byte budget is exceeded. The budget can be set in the config:
+        logs:
+          max_lines: 10000
+          max_bytes: 8388608
+    """
+
+    def __init__(self, max_lines=None, max_bytes=None, grace=MERGE_GRACE_SECONDS):
+        values = config.values.get("logs") or {}
+        self.max_lines = int(max_lines or values.get("max_lines") or DEFAULT_MAX_LINES)
+        self.max_bytes = int(max_bytes or values.get("max_bytes") or DEFAULT_MAX_BYTES)
+        self.grace = grace
+        self._ring: list[str] = [None] * self.max_lines
+        self._head = 0
+        self._size = 0
+        self.bytes = 0
+        self.dropped = 0
+        self.version = 0
+        # stream -> pending (ts, seq, arrival, event) entries, sorted by ts
+        self._pending: dict[str, list[tuple[str, int, float, LogEvent]]] = dict()
+        self._last_seen: dict[str, float] = dict()
+        self._last_ts: dict[str, str] = dict()
+        self._seq = 0
+
+    def __len__(self):
+        return self._size
+
+    def __getitem__(self, i) -> str:
+        if not 0 <= i < self._size:
+            raise IndexError(i)
+        return self._ring[(self._head + i) % self.max_lines]
+
+    def __iter__(self):
+        for i in range(self._size):
+            yield self._ring[(self._head + i) % self.max_lines]
+
+    def clear(self):
+        self._ring = [None] * self.max_lines
+        self._head = 0
+        self._size = 0
+        self.bytes = 0
+        self.dropped = 0
+        self.version += 1
+        self._pending.clear()
+        self._last_seen.clear()
+        self._last_ts.clear()
+
+    def add(self, event: LogEvent, now: float = None):
+        now = time.monotonic() if now is None else now
+        stream = event.stream or event.group
+        pending = self._pending.setdefault(stream, list())
+        self._seq += 1
+        entry = (event.ts, self._seq, now, event)
+        # A single container stream is already ordered, so this is an append in practice
+        if not pending or pending[-1][0] <= event.ts:
+            pending.append(entry)
+        else:
+            insort(pending, entry)
+        self._last_seen[stream] = now
+        self._last_ts[stream] = max(event.ts, self._last_ts.get(stream, event.ts))
+
+    def flush(self, now: float = None, force: bool = False) -> int:
+        """
+        Moves every pending line that can no longer be preceded by a line from another stream into the merged buffer.
+        A line is safe once every stream heard from within the grace period has reached its timestamp.
+        """
+        now = time.monotonic() if now is None else now
+        active = [self._last_ts[s] for s, seen in self._last_seen.items() if now - seen < self.grace]
+        watermark = None if force or not active else min(active)
+        heads = [(pending[0], stream) for stream, pending in self._pending.items() if pending]
+        heapq.heapify(heads)
+        positions = {stream: 0 for _, stream in heads}
+        merged = 0
+        while heads:
+            (ts, _, arrival, event), stream = heads[0]
+            if watermark is not None and ts > watermark and now - arrival < self.grace:
+                break
+            self.append_line(self.format(event))
+            merged += 1
+            positions[stream] += 1
+            pending = self._pending[stream]
+            if positions[stream] < len(pending):
+                heapq.heapreplace(heads, (pending[positions[stream]], stream))
+            else:
+                heapq.heappop(heads)
+        for stream, position in positions.items():
+            del self._pending[stream][:position]
+        if merged:
+            self.version += 1
+        return merged
+
+    def append_line(self, line: str):
+        if self._size == self.max_lines:
+            self.evict()
+        self._ring[(self._head + self._size) % self.max_lines] = line
+        self._size += 1
+        self.bytes += len(line) + 1
+        while self.bytes > self.max_bytes and self._size > 1:
+            self.evict()
+
+    def evict(self):
+        self.bytes -= len(self._ring[self._head]) + 1
+        self._ring[self._head] = None
+        self._head = (self._head + 1) % self.max_lines
+        self._size -= 1
+        self.dropped += 1
+
+    @staticmethod
+    def format(event: LogEvent) -> str:
+        # group is t9s markup, the message is whatever the container printed
+        return f"{event.group}: {escape(event.msg)}"
+
+    def text(self) -> str:
+        return "\n".join(self) + "\n" if self._size else ""
@@ -0,0 +1,37 @@
+import sys
+
+from t9s.modules.kubernetes.objects import Resource
+
+
+def deep_sizeof(value, seen: set) -> int:
+    """Approximate bytes held by value and everything it references, anything already in seen is not counted again"""
+    size = 0
+    pending = [value]
+    while pending:
+        v = pending.pop()
+        if v is None or id(v) in seen:
+            continue
+        seen.add(id(v))
+        size += sys.getsizeof(v)
+        if isinstance(v, dict):
+            pending.extend(v.keys())
+            pending.extend(v.values())
+        elif isinstance(v, (list, tuple, set)):
+            pending.extend(v)
+        elif isinstance(v, Resource):
+            pending.extend(getattr(v, attr) for attr in Resource.__slots__)
+    return size
+
+
+def memory_report(objs: list[Resource], seen: set = None) -> dict:
+    """Object counts and approximate bytes per context, namespace and kind. Shared strings are counted once, first come"""
+    seen = set() if seen is None else seen
+    report = dict()
+    total = dict(objects=0, bytes=0)
+    for o in objs:
+        size = deep_sizeof(o, seen)
+        entry = report.setdefault(o.context, dict()).setdefault(o.namespace, dict()).setdefault(o.kind, dict(objects=0, bytes=0))
+        for counts in [entry, total]:
+            counts["objects"] += 1
+            counts["bytes"] += size
+    return dict(total=total, contexts=report)
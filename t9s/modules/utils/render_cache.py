@@ -0,0 +1,98 @@
+import json
+import re
+from collections import OrderedDict
+
+import yaml
+
+from t9s.modules.kubernetes.objects import Resource
+from t9s.modules.utils.enums import ObjectViewerFormat
+
+# libyaml's emitter is an order of magnitude faster than the pure-Python one
+try:
+    from yaml import CSafeDumper as YamlDumper
+except ImportError:
+    from yaml import SafeDumper as YamlDumper
+
+# metadata fields hidden by the stripped view
+STRIPPED_METADATA_FIELDS = ["managedFields"]
+# string values longer than this are replaced by a short placeholder in the folded view
+FOLD_MIN_CHARS = 512
+BASE64_PATTERN = re.compile(r"[A-Za-z0-9+/=\r\n]+")
+
+
+def stripped_view(value: dict) -> dict:
+    """Shallow copy without the noisy metadata fields, the original dict is left untouched"""
+    metadata = value.get("metadata")
+    if not isinstance(metadata, dict) or not any(f in metadata for f in STRIPPED_METADATA_FIELDS):
+        return value
+    return {**value, "metadata": {k: v for k, v in metadata.items() if k not in STRIPPED_METADATA_FIELDS}}
+
+
+def describe_scalar(value: str) -> str:
+    if "-----BEGIN " in value:
+        return "PEM"
+    if value.lstrip()[:1] in ("{", "["):
+        try:
+            json.loads(value)
+            return "JSON"
+        except ValueError:
+            pass
+    if BASE64_PATTERN.fullmatch(value):
+        return "base64"
+    return "text"
+
+
+def folded_view(value, min_chars=FOLD_MIN_CHARS):
+    """Copy with big string values (certs, base64 blobs, embedded JSON) folded, containers without any are shared as is"""
+    if isinstance(value, str):
+        if len(value) < min_chars:
+            return value
+        return f"<{describe_scalar(value)} folded, {len(value)} chars, {value.count(chr(10)) + 1} lines>"
+    if isinstance(value, dict):
+        folded = {k: folded_view(v, min_chars) for k, v in value.items()}
+        return value if all(folded[k] is v for k, v in value.items()) else folded
+    if isinstance(value, list):
+        folded = [folded_view(v, min_chars) for v in value]
+        return value if all(f is v for f, v in zip(folded, value)) else folded
+    return value
+
+
+def serialize(value: dict, fmt: ObjectViewerFormat) -> str:
+    if fmt == ObjectViewerFormat.JSON:
+        return json.dumps(value, indent=2)
+    return yaml.dump(value, Dumper=YamlDumper, default_flow_style=False, sort_keys=True)
+
+
+class RenderCache:
+    """LRU cache of serialized resources keyed by uid, resourceVersion, format and view flags"""
+
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self.entries: OrderedDict[tuple, str] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(resource: Resource, fmt: ObjectViewerFormat, stripped: bool, folded: bool):
+        metadata = resource.json_value.get("metadata", {}) if resource.json_value else {}
+        resource_version = metadata.get("resourceVersion")
+        # Without both there is no way to tell two versions of an object apart
+        if not resource.uid or not resource_version:
+            return None
+        return resource.context, resource.uid, resource_version, resource.partial, fmt, stripped, folded
+
+    def get(self, resource: Resource, fmt: ObjectViewerFormat, stripped: bool = True, folded: bool = False) -> str:
+        key = self.key(resource, fmt, stripped, folded)
+        if key is not None and key in self.entries:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return self.entries[key]
+        self.misses += 1
+        value = stripped_view(resource.json_value) if stripped else resource.json_value
+        value = folded_view(value) if folded else value
+        text = serialize(value, fmt)
+        if key is not None:
+            self.entries[key] = text
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+        return text
@@ -0,0 +1,49 @@
+import sys
+
+from textual import events
+
+
+class Scrollable:
+    """
+    Widget mixin for the widgets that draw only the rows in view from self.top: arrow and page keys, home, end and the
+    mouse wheel move it. Widgets give their page_height() and clamp top in render(), or in their own scroll_lines().
+    """
+
+    top: int = 0
+
+    def page_height(self) -> int:
+        # Panel borders
+        return max(1, self.size.height - 2)
+
+    def scroll_lines(self, delta) -> None:
+        self.top = max(0, self.top + delta)
+        self.refresh()
+
+    async def on_key(self, event: events.Key) -> None:
+        await self.dispatch_key(event)
+
+    async def key_up(self) -> None:
+        self.scroll_lines(-1)
+
+    async def key_down(self) -> None:
+        self.scroll_lines(1)
+
+    async def key_pageup(self) -> None:
+        self.scroll_lines(-self.page_height())
+
+    async def key_pagedown(self) -> None:
+        self.scroll_lines(self.page_height())
+
+    async def key_home(self) -> None:
+        self.scroll_lines(-self.top)
+
+    async def key_end(self) -> None:
+        # Clamped to the last page like any scroll past the end
+        self.scroll_lines(sys.maxsize)
+
+    # Textual names the wheel events after the content movement, MouseScrollDown is the wheel turning up
+    async def on_mouse_scroll_down(self, event: events.MouseScrollDown) -> None:
+        self.scroll_lines(-3)
+
+    async def on_mouse_scroll_up(self, event: events.MouseScrollUp) -> None:
+        self.scroll_lines(3)
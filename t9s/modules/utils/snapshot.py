@@ -0,0 +1,79 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+from t9s.modules.utils.config import config
+
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "t9s")
+SNAPSHOT_PATH = os.environ.get("T9S_SNAPSHOTS", os.path.join(CACHE_DIR, "snapshots.db"))
+DEFAULT_MAX_MB = 256
+
+
+# noinspection PyBroadException
+class SnapshotCache:
+    """
+    On-disk copy of what the last runs saw, so that the tree can be painted before the API answers:
+    namespaces and discovery per context, object metadata per namespace.
+    Values are zlib compressed JSON rows of a single SQLite table readable by the user only, the least recently used
+    rows are evicted once the table grows past max_bytes. A missing, locked or corrupt file only means there is nothing cached.
+    """
+
+    def __init__(self, path=SNAPSHOT_PATH, max_bytes=None):
+        self.path = path
+        self.max_bytes = max_bytes or int((config.values.get("snapshots") or {}).get("max_mb", DEFAULT_MAX_MB) * 1024 * 1024)
+        self._lock = threading.Lock()
+        self._db: sqlite3.Connection = None
+
+    def db(self) -> sqlite3.Connection:
+        if self._db is None:
+            # Object metadata of the clusters is nobody else's business, the directory and the file are private to the user
+            directory = os.path.dirname(self.path)
+            os.makedirs(directory, mode=0o700, exist_ok=True)
+            # Earlier versions created it with the umask, a directory given in $T9S_SNAPSHOTS is left as it is
+            os.chmod(directory, 0o700) if directory == CACHE_DIR else None
+            os.close(os.open(self.path, os.O_CREAT | os.O_WRONLY, 0o600))
+            os.chmod(self.path, 0o600)
+            self._db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=1)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS snapshots "
+                "(key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, saved REAL NOT NULL, used REAL NOT NULL)"
+            )
+        return self._db
+
+    def get(self, key: str) -> tuple[object, float]:
+        """(value, time.time() it was saved at), or (None, None) if nothing is cached"""
+        try:
+            with self._lock:
+                row = self.db().execute("SELECT value, saved FROM snapshots WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    self.db().execute("UPDATE snapshots SET used = ? WHERE key = ?", (time.time(), key))
+            return (json.loads(zlib.decompress(row[0])), row[1]) if row is not None else (None, None)
+        except Exception:
+            return None, None
+
+    def put(self, key: str, value) -> None:
+        try:
+            blob = zlib.compress(json.dumps(value, separators=(",", ":")).encode(), 1)
+            with self._lock:
+                now = time.time()
+                self.db().execute("INSERT OR REPLACE INTO snapshots VALUES (?, ?, ?, ?, ?)", (key, blob, len(blob), now, now))
+                self.evict()
+        except Exception:
+            pass
+
+    def evict(self) -> None:
+        total = self.db().execute("SELECT COALESCE(SUM(size), 0) FROM snapshots").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self.db().execute("SELECT key, size FROM snapshots ORDER BY used").fetchall():
+            if total <= self.max_bytes:
+                break
+            self.db().execute("DELETE FROM snapshots WHERE key = ?", (key,))
+            total -= size
+
+
+snapshots = SnapshotCache()
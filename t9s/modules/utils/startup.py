@@ -0,0 +1,40 @@
+import subprocess
+import sys
+import time
+from collections import Counter
+
+
+class StartupProfile:
+    """Time of each startup phase for --profile-startup, plus the import time of every top level package"""
+
+    def __init__(self, started: float):
+        self.started = started
+        self.marks: dict[str, float] = dict()
+
+    def mark(self, phase: str, at: float = None) -> None:
+        # Only the first time a phase is reached counts
+        self.marks.setdefault(phase, at or time.perf_counter())
+
+    @staticmethod
+    def import_times(module="t9s.main") -> list[tuple[str, float]]:
+        """(package, ms) of the imports of module, from python -X importtime in a fresh interpreter, slowest first"""
+        out = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], capture_output=True, text=True).stderr
+        own = Counter()
+        for line in out.splitlines():
+            # import time: self [us] | cumulative | imported package
+            parts = line.split("|")
+            if len(parts) == 3 and parts[0].split(":")[-1].strip().isdigit():
+                own[parts[2].strip().split(".")[0]] += int(parts[0].split(":")[-1]) / 1000
+        return own.most_common()
+
+    def report(self, top=12) -> str:
+        lines = ["t9s startup"]
+        previous = self.started
+        for phase, at in self.marks.items():
+            lines.append(f"  {phase:<28} {(at - previous) * 1000:8.1f} ms  {(at - self.started) * 1000:8.1f} ms since start")
+            previous = at
+        times = self.import_times()
+        lines.append(f"import time by package, {sum(ms for _, ms in times):.1f} ms in a fresh interpreter")
+        for package, ms in times[:top]:
+            lines.append(f"  {package:<28} {ms:8.1f} ms")
+        return "\n".join(lines)
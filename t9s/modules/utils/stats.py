@@ -0,0 +1,184 @@
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+
+STATS_PATH = os.environ.get("T9S_STATS", "t9s-stats.jsonl")
+# Upper bounds of the latency buckets in milliseconds, the last bucket has no upper bound
+LATENCY_BUCKETS_MS = [1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000]
+
+
+@dataclass
+class Histogram:
+    counts: list = field(default_factory=lambda: [0] * (len(LATENCY_BUCKETS_MS) + 1))
+    count: int = 0
+    total_ms: float = 0.0
+    max_ms: float = 0.0
+
+    def observe(self, ms: float) -> None:
+        self.counts[next((i for i, bound in enumerate(LATENCY_BUCKETS_MS) if ms <= bound), len(LATENCY_BUCKETS_MS))] += 1
+        self.count += 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q quantile, never more than the max"""
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= q * self.count:
+                return round(min(LATENCY_BUCKETS_MS[i], self.max_ms) if i < len(LATENCY_BUCKETS_MS) else self.max_ms, 1)
+        return 0.0
+
+
+@dataclass
+class ApiStats:
+    latency: Histogram = field(default_factory=Histogram)
+    calls: int = 0
+    # Calls answered by an identical request already in flight, not sent and not in calls
+    shared: int = 0
+    errors: int = 0
+    retries: int = 0
+    bytes: int = 0
+    objects: int = 0
+    last_error: str = None
+
+
+class Stats:
+    """
+    Process-wide performance counters: every API call per (context, kind, verb) and every widget render.
+    Recording is a dict lookup and a few additions under a lock, cheap enough to always be on.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.time()
+        self.api: dict[tuple[str, str, str], ApiStats] = dict()
+        self.renders: dict[str, Histogram] = dict()
+
+    def api_stats(self, ctx, kind, verb) -> ApiStats:
+        key = (ctx or "", kind or "", verb)
+        if key not in self.api:
+            self.api[key] = ApiStats()
+        return self.api[key]
+
+    def record_call(self, ctx, kind, verb, seconds: float, size: int = 0, objects: int = 0, error=None) -> None:
+        with self._lock:
+            entry = self.api_stats(ctx, kind, verb)
+            entry.calls += 1
+            entry.latency.observe(seconds * 1000)
+            entry.bytes += size
+            entry.objects += objects
+            if error is not None:
+                entry.errors += 1
+                entry.last_error = str(getattr(error, "status", None) or error)[:200]
+
+    def record_transfer(self, ctx, kind, verb, size: int = 0, objects: int = 0) -> None:
+        """Bytes and objects that arrived on a long lived call (watch, log stream) after it was recorded"""
+        with self._lock:
+            entry = self.api_stats(ctx, kind, verb)
+            entry.bytes += size
+            entry.objects += objects
+
+    def record_error(self, ctx, kind, verb, error) -> None:
+        """Error on a call that was already recorded, like a watch or log stream breaking"""
+        with self._lock:
+            entry = self.api_stats(ctx, kind, verb)
+            entry.errors += 1
+            entry.last_error = str(getattr(error, "status", None) or error)[:200]
+
+    def record_shared(self, ctx, kind, verb) -> None:
+        with self._lock:
+            self.api_stats(ctx, kind, verb).shared += 1
+
+    def record_retry(self, ctx, kind, verb) -> None:
+        with self._lock:
+            self.api_stats(ctx, kind, verb).retries += 1
+
+    def record_render(self, widget: str, seconds: float) -> None:
+        with self._lock:
+            if widget not in self.renders:
+                self.renders[widget] = Histogram()
+            self.renders[widget].observe(seconds * 1000)
+
+    def rows(self) -> tuple[list[dict], list[dict]]:
+        """(api rows, render rows) as plain dicts, sorted by total time spent"""
+        with self._lock:
+            api = [
+                dict(
+                    context=ctx,
+                    kind=kind,
+                    verb=verb,
+                    calls=s.calls,
+                    shared=s.shared,
+                    errors=s.errors,
+                    retries=s.retries,
+                    bytes=s.bytes,
+                    objects=s.objects,
+                    total_ms=round(s.latency.total_ms, 1),
+                    p50_ms=s.latency.quantile(0.5),
+                    p95_ms=s.latency.quantile(0.95),
+                    max_ms=round(s.latency.max_ms, 1),
+                    buckets=list(s.latency.counts),
+                    last_error=s.last_error,
+                )
+                for (ctx, kind, verb), s in self.api.items()
+            ]
+            renders = [
+                dict(
+                    widget=widget,
+                    renders=h.count,
+                    total_ms=round(h.total_ms, 1),
+                    p50_ms=h.quantile(0.5),
+                    p95_ms=h.quantile(0.95),
+                    max_ms=round(h.max_ms, 1),
+                    buckets=list(h.counts),
+                )
+                for widget, h in self.renders.items()
+            ]
+        return sorted(api, key=lambda r: -r["total_ms"]), sorted(renders, key=lambda r: -r["total_ms"])
+
+    def export(self, path=STATS_PATH) -> int:
+        """Appends one JSON line per row, all lines of an export share the same ts. Returns the number of lines"""
+        api, renders = self.rows()
+        ts = time.time()
+        with open(path, "a") as f:
+            for row in [dict(type="api", **r) for r in api] + [dict(type="render", **r) for r in renders]:
+                f.write(json.dumps(dict(ts=ts, uptime=round(ts - self.started, 1), buckets_ms=LATENCY_BUCKETS_MS, **row)) + "\n")
+        return len(api) + len(renders)
+
+
+stats = Stats()
+
+
+class RenderTimer:
+    """Widget mixin recording the time of each repaint, the render() call and rich laying out its result"""
+
+    def render_lines(self) -> None:
+        start = time.perf_counter()
+        try:
+            super().render_lines()
+        finally:
+            stats.record_render(type(self).__name__, time.perf_counter() - start)
+
+
+def describe_path(path: str, watch: bool = False) -> tuple[str, str]:
+    """
+    (kind, verb) of an API path, the kind as plural.group like discovery has it.
+    /api/v1/namespaces/a/pods is (pods, list), /apis/apps/v1/namespaces/a/deployments/b is (deployments.apps, get)
+    """
+    parts = path.strip("/").split("/")
+    group = ""
+    if parts[0] == "api":
+        rest = parts[2:]
+    elif parts[0] == "apis" and len(parts) > 2:
+        group, rest = parts[1], parts[3:]
+    else:
+        return "discovery", "get"
+    if not rest:
+        return "discovery", "get"
+    if rest[0] == "namespaces" and len(rest) > 2:
+        rest = rest[2:]
+    kind = ".".join(filter(None, ["/".join([rest[0]] + rest[2:]), group]))
+    return kind, "watch" if watch else "list" if len(rest) == 1 else "get"
@@ -1,5 +1,9 @@
+import asyncio
+import time
+
 import rich
 from rich.text import Text, TextType
+from rich.tree import Tree
 from textual import events
 from textual.reactive import Reactive
 from textual.widget import RenderableType
@@ -9,21 +13,62 @@ from textual.widgets import TreeClick, TreeControl, TreeNode, NodeID
 from textual.widgets._tree_control import NodeDataType
 
 from t9s.modules.kubernetes.k8s import K8s
-from t9s.modules.kubernetes.commons import Commons
+from t9s.modules.kubernetes.async_commons import AsyncCommons
+from t9s.modules.kubernetes.hierarchy import ResourceIndex
 from t9s.modules.kubernetes.objects import Resource
-from functools import lru_cache
+from t9s.modules.utils.scroll import Scrollable
+from t9s.modules.utils.stats import RenderTimer
+from collections import deque, OrderedDict
 
+# Labels kept around, a few screens worth of rows
+LABEL_CACHE_SIZE = 1024
+# TreeNode insists on a rich Tree, rows are drawn by ExplorerTree.render so one detached Tree is shared by all nodes
+DETACHED_TREE = Tree("")
+
+
+class ExplorerNode(TreeNode[Resource]):
+    async def expand(self, expanded: bool = True) -> None:
+        self._expanded = expanded
+        self._control.rows_changed()
+
+
+# noinspection PyProtectedMember,PyBroadException
+class ExplorerTree(RenderTimer, Scrollable, TreeControl[Resource]):
+    """
+    Virtualized tree: the expanded part of the tree is flattened into rows once per structural change and only the rows
+    in view are rendered. It scrolls by itself, so changes to the tree are a repaint and never a relayout.
+    """
 
-# noinspection PyProtectedMember
-class ExplorerTree(TreeControl[Resource]):
     def __init__(self, console: rich.console.Console) -> None:
         data = Resource(name="/")
         super().__init__(label=Text("K8s Contexts"), name="Explorer", data=data)
+        self.root = ExplorerNode(None, self.root.id, self, DETACHED_TREE, self.root.label, data)
+        self.nodes[self.root.id] = self.root
         self.rich_console = console
         self.k8s_helper = K8s(self.log)
-        self.commons = Commons(logger=self.log)
+        self.data = AsyncCommons(logger=self.log)
+        self.commons = self.data.commons
+        self.loading: dict[NodeID, asyncio.Future] = dict()
+        self.indexes: dict[tuple[str, str], ResourceIndex] = dict()
+        self.ns_nodes: dict[tuple[str, str], TreeNode[Resource]] = dict()
+        self.uid_nodes: dict[str, TreeNode[Resource]] = dict()
+        self.deltas: deque[tuple[str, Resource]] = deque()
+        self.loop: asyncio.AbstractEventLoop = None
+        self.flush_scheduled = False
+        # (node, guide) for every visible row, rebuilt lazily after the tree changed
+        self.rows: list[tuple[TreeNode[Resource], str]] = None
+        self.row_of: dict[NodeID, int] = dict()
+        self.top = 0
+        self.label_cache: OrderedDict[tuple, RenderableType] = OrderedDict()
+        # Nodes painted from the on-disk snapshot until the API answers, with the age of the snapshot
+        self.stale: dict[NodeID, str] = dict()
+        # Objects a namespace node was seeded with from the snapshot
+        self.seeded: dict[NodeID, list[Resource]] = dict()
 
     has_focus: Reactive[bool] = Reactive(False)
+    # The size of the widget does not depend on the cursor, a repaint is enough
+    cursor: Reactive[NodeID] = Reactive(NodeID(0))
+    show_cursor: Reactive[bool] = Reactive(False)
 
     # Overloading Methods
     async def add(
@@ -34,14 +79,98 @@ class ExplorerTree(TreeControl[Resource]):
     ):
         parent = self.nodes[node_id]
         self.id = NodeID(self.id + 1)
-        child_tree = parent._tree.add(label)
-        child_node: TreeNode[NodeDataType] = TreeNode(parent, self.id, self, child_tree, label, data)
+        child_node: TreeNode[NodeDataType] = ExplorerNode(parent, self.id, self, DETACHED_TREE, label, data)
         parent.children.append(child_node)
-        child_tree.label = child_node
         self.nodes[self.id] = child_node
-        self.refresh(layout=True)
+        self.rows_changed()
         return child_node
 
+    # Virtualized rendering
+    def rows_changed(self) -> None:
+        # Any number of changes in one go end up as one flatten and one repaint
+        self.rows = None
+        self.refresh()
+
+    def visible_rows(self) -> list[tuple[TreeNode[Resource], str]]:
+        if self.rows is None:
+            rows = list[tuple[TreeNode[Resource], str]]()
+            pending = [(self.root, "", "")]
+            while pending:
+                node, guide, child_guide = pending.pop()
+                rows.append((node, guide))
+                if node.expanded and node.children:
+                    last = len(node.children) - 1
+                    for i in range(last, -1, -1):
+                        pending.append(
+                            (node.children[i], child_guide + ("└── " if i == last else "├── "), child_guide + ("    " if i == last else "│   "))
+                        )
+            self.rows = rows
+            self.row_of = {node.id: i for i, (node, _) in enumerate(rows)}
+        return self.rows
+
+    def page_height(self) -> int:
+        top, _, bottom, _ = self.padding or (0, 0, 0, 0)
+        return max(1, self.size.height - top - bottom)
+
+    def render(self) -> RenderableType:
+        rows = self.visible_rows()
+        self.top = max(0, min(self.top, len(rows) - self.page_height()))
+        text = Text("\n", no_wrap=True, overflow="ellipsis")
+        return text.join(Text(guide) + self.render_node(node) for node, guide in rows[self.top : self.top + self.page_height()])
+
+    def find_cursor(self) -> int:
+        self.visible_rows()
+        return self.row_of.get(self.cursor)
+
+    async def move_cursor(self, delta) -> None:
+        if not self.show_cursor:
+            self.show_cursor = True
+            return
+        rows = self.visible_rows()
+        row = max(0, min(self.row_of.get(self.cursor, 0) + delta, len(rows) - 1))
+        self.cursor = rows[row][0].id
+        self.cursor_line = row
+        # Keep the cursor in view
+        if row < self.top:
+            self.top = row
+        elif row >= self.top + self.page_height():
+            self.top = row - self.page_height() + 1
+
+    async def jump_to(self, resource: Resource) -> TreeNode[Resource]:
+        """Puts the cursor on the node of a cached resource, loading its namespace and expanding its parents if needed"""
+        if resource.uid not in self.uid_nodes:
+            ns_node = self.ns_nodes.get((resource.context, resource.namespace))
+            if ns_node is None:
+                ctx_node = next((n for n in self.root.children if n.data.context == resource.context), None)
+                children = ctx_node.children if ctx_node else []
+                ns_node = next((n for n in children if n.data.kind == "Namespace" and n.data.namespace == resource.namespace), None)
+            if ns_node is not None and not ns_node.loaded and ns_node.id not in self.loading:
+                await self.start_load(ns_node, self.load_namespace)
+            if ns_node is not None and ns_node.id in self.loading:
+                # Done once the informers listed everything, a cancelled load is not an error here
+                await asyncio.wait([self.loading[ns_node.id]])
+            # The last pages may still be queued as deltas
+            await self.apply_deltas()
+        node = self.uid_nodes.get(resource.uid)
+        if node is None:
+            return None
+        parent = node.parent
+        while parent is not None:
+            await parent.expand() if not parent.expanded else None
+            parent = parent.parent
+        self.cursor = node.id
+        self.show_cursor = True
+        self.cursor_line = self.find_cursor()
+        self.top = max(0, self.cursor_line - self.page_height() // 2)
+        self.refresh()
+        return node
+
+    async def cursor_down(self) -> None:
+        await self.move_cursor(1)
+
+    async def cursor_up(self) -> None:
+        await self.move_cursor(-1)
+
     # Overload Handlers
     def on_focus(self) -> None:
         self.has_focus = Reactive(True)
@@ -63,6 +192,22 @@ class ExplorerTree(TreeControl[Resource]):
         # TODO: Set a reactive current node that changes info panel
         # await self.post_message(TreeClick(self, cursor_node))
 
+    async def key_pagedown(self, event: events.Key) -> None:
+        event.stop()
+        await self.move_cursor(self.page_height())
+
+    async def key_pageup(self, event: events.Key) -> None:
+        event.stop()
+        await self.move_cursor(-self.page_height())
+
+    async def key_home(self, event: events.Key) -> None:
+        event.stop()
+        await self.move_cursor(-len(self.visible_rows()))
+
+    async def key_end(self, event: events.Key) -> None:
+        event.stop()
+        await self.move_cursor(len(self.visible_rows()))
+
     async def key_enter(self, event: events.Key) -> None:
         cursor_node = self.nodes[self.cursor]
         event.stop()
@@ -70,89 +215,356 @@ class ExplorerTree(TreeControl[Resource]):
         await self.post_message(TreeClick(self, cursor_node))
 
     async def on_mount(self) -> None:
+        self.loop = asyncio.get_running_loop()
+        self.commons.informers.subscribe(self.queue_delta)
+        self.commons.informers.subscribe_evictions(self.queue_eviction)
         await self.load_contexts(self.root)
 
     # Data Loading methods
     # noinspection PyTypeChecker
     async def load_contexts(self, node: TreeNode[Resource]):
         for ctx in self.k8s_helper.contexts:
-            ctx_node = await self.add(node_id=node.id, label=f"{ctx}", data=Resource(name=ctx, kind="Context", context=ctx))
-            await self.load_ns(node=ctx_node)
+            # Namespaces (and the clients for the context) are loaded when the context is first expanded
+            await self.add(node_id=node.id, label=f"{ctx}", data=Resource(name=ctx, kind="Context", context=ctx))
         node.loaded = True
         await node.expand()
-        self.refresh(layout=True)
+        self.refresh()
+
+    async def start_load(self, node: TreeNode[Resource], load) -> None:
+        """Runs load(node) as a task so the widget keeps handling keys and clicks, with a placeholder child until it is done"""
+        placeholder = await self.add(node_id=node.id, label="Loading...", data=Resource(name="Loading", kind="Loading"))
+        await node.expand()
+        self.loading[node.id] = asyncio.ensure_future(self.run_load(node, placeholder, load))
+
+    async def run_load(self, node: TreeNode[Resource], placeholder: TreeNode[Resource], load) -> None:
+        try:
+            await load(node)
+        except asyncio.CancelledError:
+            self.unload(node)
+            await node.expand(False)
+        except Exception as err:
+            self.log(f"Loading {node.data.kind}/{node.data.name} failed: {err}")
+            self.unload(node)
+        finally:
+            self.loading.pop(node.id, None)
+            if placeholder.id in self.nodes:
+                self.remove_node(placeholder)
+            self.refresh()
+
+    def cancel_load(self, node: TreeNode[Resource]) -> None:
+        task = self.loading.get(node.id)
+        task.cancel() if task else None
+
+    def unload(self, node: TreeNode[Resource]) -> None:
+        """
+        Drops the children of a node whose load was cancelled or whose informers were evicted, so that the next click loads
+        it again. The informers are left running, they are only stopped to make room for others.
+        """
+        for child in list(node.children):
+            if child.data.kind != "Loading":
+                self.remove_node(child)
+        if node.data.kind == "Namespace":
+            self.indexes.pop((node.data.context, node.data.namespace), None)
+            self.ns_nodes.pop((node.data.context, node.data.namespace), None)
+        elif node.data.kind == "AllNamespaces":
+            for ns_node in node.parent.children:
+                # Namespaces whose objects were still on the way have an index but are not loaded yet
+                if ns_node.data.kind == "Namespace" and (ns_node.loaded or (ns_node.data.context, ns_node.data.namespace) in self.indexes):
+                    self.unload(ns_node)
+        self.stale.pop(node.id, None)
+        self.seeded.pop(node.id, None)
+        node.loaded = False
+
+    def mark_stale(self, node: TreeNode[Resource], saved: float) -> None:
+        self.stale[node.id] = f"cached {self.commons.human_duration(time.time() - saved)} ago"
 
     async def load_ns(self, node: TreeNode[Resource]):
-        ns_list = self.commons.get_ns_list(ctx=node.data.context)
+        ns_list, saved = await self.data.get_cached_ns_list(ctx=node.data.context)
+        if ns_list:
+            # The namespaces of the last run right away, the API answer replaces them in the background
+            await self.add_namespaces(node, ns_list)
+            self.mark_stale(node, saved)
+            asyncio.ensure_future(self.revalidate_ns(node))
+        else:
+            await self.add_namespaces(node, await self.data.get_ns_list(ctx=node.data.context))
+        node.loaded = True
+        await node.expand()
+        self.refresh()
+
+    async def add_namespaces(self, node: TreeNode[Resource], ns_list: list[str]) -> None:
         self.log(ns_list)
+        present = {child.data.kind: child for child in node.children}
+        present.update({child.data.namespace: child for child in node.children if child.data.kind == "Namespace"})
         if ns_list and isinstance(ns_list, list) and len(ns_list) > 0:
+            if "AllNamespaces" not in present:
+                await node.add(label="All Namespaces", data=Resource(name="All Namespaces", kind="AllNamespaces", context=node.data.context))
             for ns in ns_list:
-                await node.add(label=f"{ns}", data=Resource(name=ns, kind="Namespace", context=node.data.context, namespace=ns))
-        node.loaded = True
-        await node.expand()
-        self.refresh(layout=True)
+                if ns not in present:
+                    await node.add(label=f"{ns}", data=Resource(name=ns, kind="Namespace", context=node.data.context, namespace=ns))
 
-    async def get_objs_for_ctx_ns(self, ctx, ns):
-        return self.commons.list_all_ns_objects(ctx=ctx, ns=ns)
+    async def revalidate_ns(self, node: TreeNode[Resource]) -> None:
+        ns_list = await self.data.get_ns_list(ctx=node.data.context)
+        # An unreachable cluster keeps showing the cached namespaces, still marked as stale
+        if not ns_list or node.id not in self.nodes:
+            return
+        await self.add_namespaces(node, ns_list)
+        for child in list(node.children):
+            if child.data.kind == "Namespace" and child.data.namespace not in ns_list and child.id not in self.loading:
+                self.unload(child)
+                self.remove_node(child)
+        self.stale.pop(node.id, None)
+        self.refresh()
 
-    @staticmethod
-    def get_resource_by_uid(uid, objs: list[Resource]):
+    async def seed_from_snapshot(self, node: TreeNode[Resource]) -> None:
+        """Shows the objects of a namespace as last listed, as long as its informers have not listed anything yet"""
+        ctx, ns = node.data.context, node.data.namespace
+        objs, saved = await self.data.get_cached_ns_objects(ctx=ctx, ns=ns)
+        index = self.indexes.get((ctx, ns))
+        if not objs or index is None or len(index) > 0:
+            return
         for o in objs:
-            if o.uid == uid:
-                return o
-        return None
+            index.add(o)
+        await self.add_roots(node)
+        self.seeded[node.id] = objs
+        self.mark_stale(node, saved)
+        self.refresh()
+
+    async def drop_stale(self, node: TreeNode[Resource]) -> None:
+        """Removes the snapshot objects the informers did not replace once they listed everything"""
+        self.stale.pop(node.id, None)
+        index = self.indexes.get((node.data.context, node.data.namespace))
+        for o in self.seeded.pop(node.id, []):
+            if index is not None and index.get(o.uid) is o:
+                self.deltas.append(("DELETED", o))
+        await self.apply_deltas()
+
+    async def get_objs_for_ctx_ns(self, ctx, ns):
+        # Only what is already cached, the rest of the namespace streams in through apply_deltas page by page
+        return await self.data.watch_ns_objects(ctx=ctx, ns=ns)
+
+    async def load_namespace(self, node: TreeNode[Resource]):
+        await self.load_objects(node)
+        await self.seed_from_snapshot(node)
+        # Keeps the loading placeholder up while the first LIST pages stream in
+        await self.data.list_all_ns_objects(ctx=node.data.context, ns=node.data.namespace)
+        await self.drop_stale(node)
+
+    async def load_all_namespaces(self, node: TreeNode[Resource]):
+        """Fills every namespace of the context from one LIST and WATCH per kind, grouped by namespace here"""
+        ctx = node.data.context
+        ns_nodes = [n for n in node.parent.children if n.data.kind == "Namespace" and not n.loaded]
+        # Indexes first, so deltas that arrive while the snapshot is taken are placed
+        for ns_node in ns_nodes:
+            self.start_index(ns_node)
+        for o in await self.get_objs_for_ctx_ns(ctx=ctx, ns=None):
+            index = self.indexes.get((ctx, o.namespace))
+            index.add(o) if index else None
+        for ns_node in ns_nodes:
+            await self.add_roots(ns_node)
+            await ns_node.expand()
+        node.loaded = True
+        self.refresh()
+        for ns_node in ns_nodes:
+            await self.seed_from_snapshot(ns_node)
+        # Keeps the loading placeholder up while the first LIST pages stream in
+        await self.data.list_all_ns_objects(ctx=ctx, ns=None)
+        for ns_node in ns_nodes:
+            await self.drop_stale(ns_node)
+
+    async def toggle_all_namespaces(self, node: TreeNode[Resource]) -> None:
+        expanded = not node.expanded
+        await node.expand(expanded)
+        for ns_node in node.parent.children:
+            if ns_node.data.kind == "Namespace" and ns_node.loaded:
+                await ns_node.expand(expanded)
+
+    async def release(self, node: TreeNode[Resource]) -> None:
+        """Unloads and collapses a namespace, or every namespace for the all namespaces node, whose informers were evicted"""
+        self.unload(node)
+        for n in node.parent.children if node.data.kind == "AllNamespaces" else [node]:
+            await n.expand(False) if n is node or n.data.kind == "Namespace" else None
+        self.refresh()
+
+    def start_index(self, node: TreeNode[Resource]) -> None:
+        """(Re)builds the owner index of a namespace node"""
+        self.indexes[(node.data.context, node.data.namespace)] = self.commons.get_hierarchy(objs=list())
+        self.ns_nodes[(node.data.context, node.data.namespace)] = node
 
     # noinspection PyTypeChecker
-    async def load_objects(self, node: TreeNode[Resource], objs: list[Resource] = None, hierarchy: dict = None):
+    async def add_roots(self, node: TreeNode[Resource]) -> None:
+        for resource in self.indexes[(node.data.context, node.data.namespace)].roots():
+            if resource.uid not in self.uid_nodes:
+                await self.add_resource(parent=node, resource=resource)
+        node.loaded = True
+
+    # noinspection PyTypeChecker
+    async def load_objects(self, node: TreeNode[Resource]):
         """
-        :param node: node is the current node on the tree, for this level it will be namespace for first run of recursion
-        :param objs: is a list of all objects in namespace, pass this bad boy along in recursion
-        :param hierarchy: hierarchy dict that specifies the UID hierarchy
+        :param node: node is the current node on the tree, a namespace node (re)builds the owner index of that namespace
         :return:
         """
-        if not objs or not hierarchy and node.data.kind == "Namespace":
-            objs = await self.get_objs_for_ctx_ns(ctx=node.data.context, ns=node.data.namespace)
-            hierarchy = self.commons.get_hierarchy(objs=objs)
+        ctx, ns = node.data.context, node.data.namespace
+        if node.data.kind == "Namespace":
+            self.start_index(node)
+            for o in await self.get_objs_for_ctx_ns(ctx=ctx, ns=ns):
+                self.indexes[(ctx, ns)].add(o)
+            resources = self.indexes[(ctx, ns)].roots()
+        else:
+            resources = self.indexes[(ctx, ns)].get_children(node.data.uid)
         # TODO: Group namespace level ConfigMaps, Secrets and SAs under 1 main kind group. i.e. All secrets under "Secrets/"
-        uid_list = hierarchy.keys()
-        for uid in uid_list:
-            resource = self.get_resource_by_uid(uid=uid, objs=objs)
-            if hierarchy[uid]:
-                resource.has_children = True
-            label = f"{resource.kind}/{resource.name}"
-            child = await self.add(node_id=node.id, label=label, data=resource)
-            if hierarchy[uid]:
-                await self.load_objects(node=child, objs=objs, hierarchy=hierarchy[uid])
+        for resource in resources:
+            if resource.uid not in self.uid_nodes:
+                await self.add_resource(parent=node, resource=resource)
         node.loaded = True
         await node.expand() if node.parent.data.kind != "Namespace" else None
-        self.refresh(layout=True)
+        self.refresh()
+
+    async def add_resource(self, parent: TreeNode[Resource], resource: Resource) -> TreeNode[Resource]:
+        """Adds a resource and everything it owns under parent"""
+        index = self.indexes[(resource.context, resource.namespace)]
+        pending = [(parent, [resource])]
+        first = None
+        while pending:
+            node, resources = pending.pop()
+            for r in resources:
+                # Deltas that arrived while a load was in flight may already have placed it
+                if r.uid in self.uid_nodes:
+                    continue
+                r.has_children = index.has_children(r.uid)
+                child = await self.add(node_id=node.id, label=f"{r.kind}/{r.name}", data=r)
+                self.uid_nodes[r.uid] = child
+                first = first or child
+                if r.has_children:
+                    pending.append((child, index.get_children(r.uid)))
+                    child.loaded = True
+                    await child.expand() if node.data.kind != "Namespace" else None
+        return first
+
+    def remove_node(self, node: TreeNode[Resource]) -> None:
+        parent = node.parent
+        parent.children.remove(node)
+        pending = [node]
+        while pending:
+            n = pending.pop()
+            self.nodes.pop(n.id, None)
+            if self.uid_nodes.get(n.data.uid) is n:
+                del self.uid_nodes[n.data.uid]
+            pending.extend(n.children)
+        if self.cursor not in self.nodes:
+            self.cursor = parent.id
+        if parent.data.kind not in ["Context", "Namespace"]:
+            parent.data.has_children = len(parent.children) > 0
+        self.rows_changed()
+
+    async def place_resource(self, resource: Resource) -> None:
+        """Puts a new or re-parented resource under its owner node, or under the namespace if the owner is not in the index"""
+        ctx, ns = resource.context, resource.namespace
+        index = self.indexes[(ctx, ns)]
+        parent = self.ns_nodes[(ctx, ns)] if index.is_root(resource) else self.uid_nodes.get(resource.owner)
+        if parent is None:
+            return
+        # Objects that arrived before their owner were shown as roots, move them under the owner
+        for child in index.get_children(resource.uid):
+            if child.uid in self.uid_nodes:
+                self.remove_node(self.uid_nodes[child.uid])
+        await self.add_resource(parent=parent, resource=resource)
+        if parent.data.kind not in ["Context", "Namespace"]:
+            parent.data.has_children = True
+
+    def queue_delta(self, event_type, resource: Resource) -> None:
+        # Called from informer threads, applied on the event loop by apply_deltas
+        self.deltas.append((event_type, resource))
+        if not self.flush_scheduled and self.loop is not None:
+            self.flush_scheduled = True
+            self.loop.call_soon_threadsafe(asyncio.ensure_future, self.apply_deltas())
+
+    def queue_eviction(self, ctx) -> None:
+        # Called from the thread that started the informers of another context
+        self.loop.call_soon_threadsafe(asyncio.ensure_future, self.evicted(ctx)) if self.loop is not None else None
+
+    async def evicted(self, ctx) -> None:
+        """Unloads and collapses the namespaces of a context whose informers made room for others"""
+        ctx_node = next((n for n in self.root.children if n.data.context == ctx), None)
+        node = next((n for n in ctx_node.children if n.data.kind == "AllNamespaces"), None) if ctx_node else None
+        if node is None:
+            return
+        for n in ctx_node.children:
+            self.cancel_load(n) if n.id in self.loading else None
+        await self.release(node)
+
+    async def apply_deltas(self) -> None:
+        self.flush_scheduled = False
+        changed = False
+        while self.deltas:
+            event_type, resource = self.deltas.popleft()
+            index = self.indexes.get((resource.context, resource.namespace))
+            if index is None:
+                continue
+            changed = True
+            if event_type == "DELETED":
+                index.remove(resource.uid)
+                if resource.uid in self.uid_nodes:
+                    orphans = [self.uid_nodes[r.uid].data for r in index.get_children(resource.uid) if r.uid in self.uid_nodes]
+                    self.remove_node(self.uid_nodes[resource.uid])
+                    # Children left behind (orphan deletion policy) become roots until they are deleted themselves
+                    for orphan in orphans:
+                        await self.place_resource(orphan)
+                continue
+            previous = index.add(resource)
+            node = self.uid_nodes.get(resource.uid)
+            if node is not None and previous is not None and previous.owner == resource.owner:
+                resource.has_children = index.has_children(resource.uid)
+                node.data = resource
+            else:
+                if node is not None:
+                    self.remove_node(node)
+                await self.place_resource(resource)
+        if changed:
+            self.refresh()
 
     async def handle_tree_click(self, message: TreeClick[Resource]) -> None:
-        if message.node.data.context:
+        if message.node.id in self.loading:
+            # Clicking a node that is still loading cancels the load
+            self.cancel_load(message.node)
+        elif message.node.data.context:
             if not message.node.loaded and message.node.data.kind == "Context":
-                await self.load_ns(message.node)
-                await message.node.expand()
+                await self.start_load(message.node, self.load_ns)
             elif not message.node.loaded and message.node.data.kind == "Namespace":
-                await self.load_objects(message.node)
-                await message.node.expand()
+                await self.start_load(message.node, self.load_namespace)
+            elif message.node.data.kind == "AllNamespaces":
+                if message.node.loaded:
+                    await self.toggle_all_namespaces(message.node)
+                else:
+                    await self.start_load(message.node, self.load_all_namespaces)
             elif not message.node.loaded and message.node.data.has_children:
-                await self.load_objects(message.node, None, None)
+                await self.load_objects(message.node)
                 await message.node.expand()
             else:
                 await message.node.toggle()
 
     def render_node(self, node: TreeNode[Resource]) -> RenderableType:
-        return self.render_tree_label(
-            node,
+        # Keyed by node id rather than the node, evicted entries do not keep nodes or their resources alive
+        key = (
+            node.id,
+            str(node.label),
             node.data.kind,
             node.data.has_children,
             node.expanded,
             node.is_cursor,
             node.id == self.hover_node,
             self.has_focus,
+            self.stale.get(node.id),
         )
+        label = self.label_cache.get(key)
+        if label is None:
+            label = self.render_tree_label(node, *key[2:])
+            self.label_cache[key] = label
+            if len(self.label_cache) > LABEL_CACHE_SIZE:
+                self.label_cache.popitem(last=False)
+        else:
+            self.label_cache.move_to_end(key)
+        return label
 
-    @lru_cache(maxsize=1024 * 32)
     def render_tree_label(
         self,
         node: TreeNode[Resource],
@@ -162,6 +574,7 @@ class ExplorerTree(TreeControl[Resource]):
         is_cursor: bool,
         is_hover: bool,
         has_focus: bool,
+        stale: str = None,
     ) -> RenderableType:
         meta = {
             "@click": f"click_label({node.id})",
@@ -206,10 +619,19 @@ class ExplorerTree(TreeControl[Resource]):
         if kind == "Namespace":
             label.stylize("#39cbf7") if not expanded else label.stylize("bold #83dcf7")
             icon = "📂" if expanded else "📁"
+        if kind == "AllNamespaces":
+            label.stylize("#39cbf7") if not expanded else label.stylize("bold #83dcf7")
+            icon = "🌐"
+        if kind == "Loading":
+            label.stylize("italic #b8b6b6")
+            icon = "⏳"
 
         if is_cursor and has_focus:
             label.stylize("reverse")
 
         icon_label = Text(f"{icon} ", no_wrap=True, overflow="ellipsis") + label
+        if stale:
+            # Painted from the snapshot of an earlier run, the API has not answered yet
+            icon_label.append(f"  ({stale})", style="italic #ebae3d")
         icon_label.apply_meta(meta)
         return icon_label
@@ -1,16 +1,51 @@
+import os
+
 from rich.panel import Panel
 from textual.reactive import Reactive
 from textual.widget import Widget
-import pyfiglet
+
+from t9s.modules.utils.snapshot import CACHE_DIR
+
+HEADER_FONT = "speed"
+
+
+# noinspection PyBroadException
+def banner(text: str, font: str = HEADER_FONT) -> str:
+    """
+    Figlet rendering of text. Importing pyfiglet and loading its font takes longer than a frame, so the result is kept
+    in a small file of its own in the cache directory and pyfiglet is only imported when that file is missing.
+    """
+    path = os.path.join(CACHE_DIR, f"banner-{font}-{text.encode().hex()}.txt")
+    try:
+        with open(path, encoding="utf-8") as file:
+            return file.read()
+    except Exception:
+        pass
+    import pyfiglet
+
+    rendered = pyfiglet.Figlet(font=font, width=40).renderText(text)
+    try:
+        os.makedirs(CACHE_DIR, mode=0o700, exist_ok=True)
+        # Written aside and moved in place, a second t9s starting at the same time never reads half a banner
+        with open(f"{path}.{os.getpid()}", "w", encoding="utf-8") as file:
+            file.write(rendered)
+        os.replace(f"{path}.{os.getpid()}", path)
+    except Exception:
+        pass
+    return rendered
 
 
 class T9s_Header(Widget):
     def __init__(self):
         super().__init__()
         self.mouse_over = Reactive(False)
+        # Static, rendered once
+        self.panel: Panel = None
 
     def render(self) -> Panel:
-        return Panel(pyfiglet.Figlet(font="speed", width=40).renderText("t9s"), style="bold #69b4ff", border_style="black")
+        if self.panel is None:
+            self.panel = Panel(banner("t9s"), style="bold #69b4ff", border_style="black")
+        return self.panel
 
     def on_enter(self) -> None:
         self.mouse_over = True
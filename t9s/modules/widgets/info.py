@@ -7,18 +7,21 @@ from rich.text import Text
 from rich.traceback import Traceback
 from textual.widget import Widget
 
+from t9s.modules.kubernetes.informer import informers
 from t9s.modules.kubernetes.objects import Resource
 from t9s.modules.utils.enums import ObjectViewerFormat
+from t9s.modules.utils.stats import RenderTimer
 
 
 # noinspection PyBroadException
-class ObjectInfo(Widget):
+class ObjectInfo(RenderTimer, Widget):
     def __init__(self):
         super().__init__()
         self.resource: Resource = Resource(json_value={"message": "No Resource Selected"})
         self.format: ObjectViewerFormat = ObjectViewerFormat.YAML
 
     def render(self):
+        self.resource = informers.latest(self.resource)
         panel_group: RenderableType
         try:
             panel_group = Group(
@@ -1,23 +1,23 @@
-import threading
+import asyncio
 import random
 import time
 
-import rich.repr
-
-from queue import Queue
-from kubernetes.watch import watch
 from rich.console import RenderableType
 from rich.panel import Panel
+from rich.text import Text
 from textual import events
-
-# noinspection PyProtectedMember
-from textual._types import MessageTarget
-from textual.message import Message
 from textual.widget import Widget
 
-from t9s.modules.kubernetes.commons import Commons
-from t9s.modules.kubernetes.k8s import K8s
+from t9s.modules.kubernetes.async_commons import AsyncCommons
+from t9s.modules.kubernetes.hierarchy import ResourceIndex
+from t9s.modules.kubernetes.log_stream import LogMultiplexer
 from t9s.modules.kubernetes.objects import Resource, LogEvent
+from t9s.modules.utils.log_store import LogStore
+from t9s.modules.utils.scroll import Scrollable
+from t9s.modules.utils.stats import RenderTimer
+
+# Lines formatted around the visible window
+LOG_RENDER_MARGIN = 10
 
 rich_logger_colors = [
     "#faa005",
@@ -37,117 +37,195 @@ rich_logger_colors = [
 ]
 
 
-@rich.repr.auto
-class LogUpdate(Message, bubble=True):
-    def __init__(self, sender: MessageTarget, render_op) -> None:
-        self.render_op = render_op
-        super().__init__(sender)
-
-
-class LogThread(threading.Thread):
-    def __init__(self, q, client, pod, namespace, container, *args, **kwargs):
-        super(LogThread, self).__init__(*args, **kwargs)
-        self._stop = threading.Event()
-        self.q = q
-        self.client = client
-        self.pod = pod
-        self.namespace = namespace
-        self.container = container
-        self.color = random.choice(rich_logger_colors)
-
-    def stop(self):
-        self._stop.set()
-
-    def stopped(self):
-        return self._stop.is_set()
-
-    def run(self):
-        w = watch.Watch()
-        for event in w.stream(
-            self.client.read_namespaced_pod_log,
-            name=self.pod,
-            namespace=self.namespace,
-            container=self.container,
-            pretty="true",
-            since_seconds=7 * 86400,
-            tail_lines=100,
-            timestamps=True,
-        ):
-            if self.stopped():
-                w.stop()
-                return
-            self.q.put_nowait(
-                LogEvent(
-                    group=f"[bold][{self.color}]<{self.container}>[/{self.color}][/bold]", msg="".join(event.split(" ")[1:]), ts=event.split(" ")[0]
-                )
-            )
-
-
-class LogViewer(Widget):
-    def __init__(self):
+class LogViewer(RenderTimer, Scrollable, Widget):
+    def __init__(self, max_lines=None, max_bytes=None):
         super().__init__()
-        self.k8s_helper = K8s(logger=self.log)
-        self.commons = Commons(logger=self.log)
-        self.logs: list[LogEvent] = list()
+        self.data = AsyncCommons(logger=self.log)
+        self.commons = self.data.commons
+        self.logs = LogStore(max_lines=max_lines, max_bytes=max_bytes)
         self.live_reload = True
         self.resource: Resource = Resource(json_value={"message": "No Resource Selected"})
-        self.q: Queue[LogEvent] = Queue()
-        self.log_threads: list[LogThread] = list()
+        self.streams = LogMultiplexer(logger=self.log)
+        # Owner index of the namespace while logs of a Deployment/ReplicaSet/... are aggregated, pod uid -> stream keys
+        self.index: ResourceIndex = None
+        self.pod_streams: dict[str, list[str]] = dict()
+        self.loop: asyncio.AbstractEventLoop = None
+        self.follow = True
+        # Absolute line number of the first visible line when not following
+        self.top = 0
+        self.line_cache: dict[int, Text] = dict()
 
     def generate_log_str(self) -> str:
-        op = str()
-        for log in self.logs:
-            op = op + f"{log.group}: {log.msg}\n"
-        return op
+        return self.logs.text()
+
+    def drain(self) -> bool:
+        """Moves queued lines into the store, returns True if the merged buffer changed"""
+        version = self.logs.version
+        for event in self.streams.drain():
+            self.logs.add(event)
+        self.logs.flush()
+        return self.logs.version != version
+
+    def formatted(self, i) -> Text:
+        # Cache is keyed by the absolute line number, which does not shift when old lines are evicted
+        key = self.logs.dropped + i
+        text = self.line_cache.get(key)
+        if text is None:
+            text = Text.from_markup(self.logs[i])
+            self.line_cache[key] = text
+        return text
+
+    def line_height(self, i, width) -> int:
+        return max(1, -(-self.formatted(i).cell_len // width))
+
+    def window(self) -> tuple[int, int]:
+        """[start, end) of the stored lines that fit in the panel, in follow mode counted back from the newest line"""
+        height = max(1, self.size.height - 2)
+        width = max(1, self.size.width - 4)
+        total = len(self.logs)
+        if self.follow:
+            start, rows = total, 0
+            while start > 0 and rows < height:
+                start -= 1
+                rows += self.line_height(start, width)
+            # The panel crops at the bottom, so drop a wrapped first line rather than the newest one
+            if rows > height and start < total - 1:
+                start += 1
+            return start, total
+        start = min(max(0, self.top - self.logs.dropped), max(0, total - 1))
+        end, rows = start, 0
+        while end < total and rows < height:
+            rows += self.line_height(end, width)
+            end += 1
+        return start, end
 
     def render(self):
         syntax: RenderableType
-        while not self.q.empty():
-            self.logs.append(self.q.get(block=False))
-        if len(self.logs) > 0:
-
-            self.logs.sort(key=lambda x: x.ts)
-        syntax = self.generate_log_str()
+        start, end = self.window()
+        # Format a small margin around the window so scrolling a few lines does not re-parse, forget everything else
+        low, high = max(0, start - LOG_RENDER_MARGIN), min(len(self.logs), end + LOG_RENDER_MARGIN)
+        for i in range(low, high):
+            self.formatted(i)
+        keep = range(self.logs.dropped + low, self.logs.dropped + high)
+        self.line_cache = {key: text for key, text in self.line_cache.items() if key in keep}
+        syntax = Text("\n").join(self.formatted(i) for i in range(start, end))
+        # Follow streams never end, the ones past the cap only start when a pod goes away
+        waiting = len(self.streams.waiting)
         return Panel(
             syntax,
-            title=f"[bold][#ebae3d]Logs[/#ebae3d]: {self.resource.name} - Live Reload: [{self.live_reload}]",
+            title=f"[bold][#ebae3d]Logs[/#ebae3d]: {self.resource.name} - Live Reload: [{self.live_reload}] - Follow: [{self.follow}]",
+            subtitle=f"[#ebae3d]{waiting} more containers not followed, {self.streams.max_streams} at most[/#ebae3d]" if waiting else None,
             border_style="#69b4ff",
+            height=self.size.height or None,
         )
 
+    def scroll_lines(self, delta) -> None:
+        start, end = self.window()
+        top = max(0, start + delta)
+        if delta > 0 and top + (end - start) >= len(self.logs):
+            self.follow = True
+        else:
+            self.follow = False
+            self.top = self.logs.dropped + top
+        self.refresh()
+
+    async def key_home(self) -> None:
+        self.follow = False
+        self.top = self.logs.dropped
+        self.refresh()
+
+    async def key_end(self) -> None:
+        self.follow = True
+        self.refresh()
+
     async def on_mount(self, event: events.Mount) -> None:
+        self.loop = asyncio.get_running_loop()
+        self.commons.informers.subscribe(self.queue_delta)
         # TODO make interval configurable
-        self.set_interval(0.5, callback=self.refresh)
+        self.set_interval(0.5)
 
     async def on_timer(self, event: events.Timer) -> None:
-        if self.live_reload:
-            await self.emit(LogUpdate(self, render_op=self.render()))
+        # Lines keep being collected while live reload is off, only the repaint is skipped
+        if self.drain() and self.live_reload:
+            self.refresh()
 
     def set_live_reload(self, value: bool):
         self.live_reload = value
 
+    def follow_pod(self, pod: Resource, label_pod: bool) -> None:
+        # Listed pods only carry metadata, the container names come from the full object
+        self.pod_streams[pod.uid] = list()
+        asyncio.ensure_future(self.follow_containers(pod, label_pod, self.pod_streams))
+
+    async def follow_containers(self, pod: Resource, label_pod: bool, pod_streams: dict) -> None:
+        try:
+            pod = await self.data.get_full_object(pod)
+        except Exception as err:
+            self.log(f"Fetching {pod.api_path} failed: {err}")
+            pod = None
+        # Nothing to follow if the viewer was reset or the pod deleted in the meantime
+        if pod is None or pod_streams is not self.pod_streams or pod.uid not in self.pod_streams:
+            return
+        # One colour per pod when several pods are merged, one per container otherwise
+        color = random.choice(rich_logger_colors)
+        keys = list()
+        for container in self.commons.get_container_list_from_pod(pod):
+            color = random.choice(rich_logger_colors) if not label_pod else color
+            label = f"{pod.name}/{container}" if label_pod else container
+            keys.append(
+                self.streams.follow(
+                    ctx=pod.context, namespace=pod.namespace, pod=pod.name, container=container, group=f"[bold][{color}]<{label}>[/{color}][/bold]"
+                )
+            )
+        self.pod_streams[pod.uid] = keys
+
+    def owned_pods(self, owner: Resource) -> list[Resource]:
+        self.index = self.commons.get_hierarchy(objs=self.commons.informers.snapshot(ctx=owner.context, ns=owner.namespace))
+        return [r for r in self.index.walk(owner.uid) if r.kind == "Pod"]
+
+    def queue_delta(self, event_type, resource: Resource) -> None:
+        # Called from informer threads, only deltas of the namespace being aggregated are of interest
+        if (
+            self.index is not None
+            and self.loop is not None
+            and (resource.context, resource.namespace) == (self.resource.context, self.resource.namespace)
+        ):
+            self.loop.call_soon_threadsafe(self.apply_delta, event_type, resource)
+
+    def apply_delta(self, event_type, resource: Resource) -> None:
+        """Keeps the owner index current and picks up (or drops) pods as they roll out"""
+        if self.index is None or (resource.context, resource.namespace) != (self.resource.context, self.resource.namespace):
+            return
+        if event_type == "DELETED":
+            self.index.remove(resource.uid)
+            for key in self.pod_streams.pop(resource.uid, []):
+                self.streams.stop(key)
+            return
+        self.index.add(resource)
+        if resource.kind == "Pod" and resource.uid not in self.pod_streams and self.index.is_owned_by(resource.uid, self.resource.uid):
+            self.follow_pod(resource, label_pod=True)
+
     def update_resource(self, resource: Resource) -> None:
         self.reset()
         self.resource = resource
+        pods = list[Resource]()
         if self.resource.kind == "Pod":
-            # Get containers
-            containers = list()
-            for container in self.resource.json_value["spec"]["containers"]:
-                containers.append(container["name"])
-            for container in self.resource.json_value["spec"]["initContainers"]:
-                containers.append(container["name"])
-            for container in containers:
-                t = LogThread(self.q, self.k8s_helper.core_clients[self.resource.context], self.resource.name, self.resource.namespace, container)
-                self.log_threads.append(t)
-                t.start()
-        else:
-            self.logs = [LogEvent(group=f"[bold]t9s[/bold]", ts=str(int(time.time())), msg="No Logs to show")]
+            self.follow_pod(self.resource, label_pod=False)
+        elif self.resource.uid:
+            pods = self.owned_pods(self.resource)
+            for pod in pods:
+                self.follow_pod(pod, label_pod=True)
+        if self.resource.kind != "Pod" and not pods:
+            self.logs.add(LogEvent(group=f"[bold]t9s[/bold]", ts=str(int(time.time())), msg="No Logs to show"))
+            self.logs.flush(force=True)
         self.refresh(layout=True)
 
     def reset(self):
-        # Stop all running threads
-        for t in self.log_threads:
-            t.stop()
+        # Cancel all streams, their sockets are closed right away
+        self.streams.reset()
+        self.index = None
+        self.pod_streams = dict()
         # Cleanup old state
-        self.log_threads = list()
-        self.q = Queue()
-        self.logs = list()
+        self.logs.clear()
+        self.line_cache = dict()
+        self.follow = True
@@ -0,0 +1,89 @@
+import time
+
+import rich.repr
+from rich.console import Group
+from rich.panel import Panel
+from rich.text import Text
+from textual import events
+from textual.message import Message, MessageTarget
+from textual.widget import Widget
+
+from t9s.modules.kubernetes.objects import Resource
+from t9s.modules.kubernetes.search import search_index
+from t9s.modules.utils.stats import RenderTimer
+
+
+@rich.repr.auto
+class SearchSelect(Message, bubble=True):
+    """Sent when the search prompt closes, resource is None if it was dismissed"""
+
+    def __init__(self, sender: MessageTarget, resource: Resource = None) -> None:
+        self.resource = resource
+        super().__init__(sender)
+
+    def __rich_repr__(self) -> rich.repr.Result:
+        yield "resource", self.resource
+
+
+class SearchBar(RenderTimer, Widget):
+    """
+    Search prompt over every object the informers hold. Results are refreshed on every key press,
+    up/down pick one, enter jumps to it and escape closes the prompt.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.index = search_index
+        self.query = ""
+        self.results: list[Resource] = list()
+        self.selected = 0
+        self.elapsed = 0.0
+
+    def page_height(self) -> int:
+        # Panel borders and the prompt line
+        return max(1, self.size.height - 3)
+
+    def render(self):
+        lines = [Text.assemble(("/", "bold #69b4ff"), (self.query, "bold white"), ("█", "#69b4ff"))]
+        first = max(0, self.selected - self.page_height() + 1)
+        for i, r in enumerate(self.results[first : first + self.page_height()], start=first):
+            line = Text.assemble((f"{r.context}/", "#ebae3d"), (f"{r.namespace}/", "#39cbf7"), (f"{r.kind}/", "white"), (r.name, "#b8b6b6"))
+            line.stylize("reverse") if i == self.selected else None
+            lines.append(line)
+        return Panel(
+            Group(*lines),
+            title="[bold]Search[/bold]",
+            subtitle=f"{len(self.results)} matches in {self.elapsed * 1000:.1f}ms, {len(self.index)} objects indexed",
+            border_style="#69b4ff",
+            height=self.size.height or None,
+        )
+
+    def open(self) -> None:
+        self.query = ""
+        self.results = list()
+        self.selected = 0
+        self.visible = True
+
+    def search(self) -> None:
+        start = time.perf_counter()
+        self.results = self.index.search(self.query) if self.query.strip() else list()
+        self.elapsed = time.perf_counter() - start
+        self.selected = 0
+        self.refresh()
+
+    async def on_key(self, event: events.Key) -> None:
+        # Every key belongs to the prompt while it is open, none of them reach the app bindings
+        event.stop()
+        if event.key == "escape":
+            await self.emit(SearchSelect(self))
+        elif event.key == "enter":
+            await self.emit(SearchSelect(self, self.results[self.selected] if self.results else None))
+        elif event.key in ["up", "down"]:
+            self.selected = max(0, min(self.selected + (1 if event.key == "down" else -1), len(self.results) - 1))
+            self.refresh()
+        elif event.key in ["ctrl+h", "backspace"]:
+            self.query = self.query[:-1]
+            self.search()
+        elif len(event.key) == 1 and event.key.isprintable():
+            self.query += event.key
+            self.search()
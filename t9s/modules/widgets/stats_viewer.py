@@ -0,0 +1,87 @@
+from rich import box
+from rich.console import Group
+from rich.filesize import decimal
+from rich.panel import Panel
+from rich.table import Table
+from rich.text import Text
+from textual import events
+from textual.widget import Widget
+
+from t9s.modules.utils.scroll import Scrollable
+from t9s.modules.utils.stats import stats, RenderTimer, STATS_PATH
+
+
+def ms(value: float) -> str:
+    return f"{value:.0f}ms" if value >= 10 else f"{value:.1f}ms"
+
+
+class StatsViewer(RenderTimer, Scrollable, Widget):
+    """
+    Latency, errors and volume of every API call per context, kind and verb, and the time spent painting each widget.
+    Percentiles are bucket upper bounds, refreshed every second while the panel is shown.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.stats = stats
+        self.top = 0
+
+    async def on_mount(self, event: events.Mount) -> None:
+        self.set_interval(1, self.tick)
+
+    def tick(self) -> None:
+        self.refresh() if self.visible else None
+
+    def page_height(self) -> int:
+        # Panel borders, both table headers and the render table
+        return max(1, self.size.height - 6 - len(self.stats.renders))
+
+    def render(self):
+        api, renders = self.stats.rows()
+        self.top = max(0, min(self.top, len(api) - self.page_height()))
+        api_table = Table(box=box.SIMPLE_HEAD, expand=True, header_style="bold #69b4ff", padding=(0, 1), show_edge=False)
+        for column in ["Context", "Kind", "Verb", "Calls", "Shared", "Errors", "Retries", "p50", "p95", "Max", "Total", "Bytes", "Objects"]:
+            # Only context and kind give way on a narrow terminal, the numbers are never cut
+            if column in ["Context", "Kind"]:
+                api_table.add_column(column, no_wrap=True, overflow="ellipsis", ratio=1)
+            else:
+                api_table.add_column(column, no_wrap=True, justify="left" if column == "Verb" else "right")
+        for row in api[self.top : self.top + self.page_height()]:
+            api_table.add_row(
+                Text(row["context"], style="#ebae3d"),
+                Text(row["kind"], style="white"),
+                row["verb"],
+                str(row["calls"]),
+                str(row["shared"]),
+                Text(str(row["errors"]), style="bold red" if row["errors"] else ""),
+                Text(str(row["retries"]), style="bold #ebae3d" if row["retries"] else ""),
+                ms(row["p50_ms"]),
+                ms(row["p95_ms"]),
+                ms(row["max_ms"]),
+                ms(row["total_ms"]),
+                decimal(row["bytes"]),
+                str(row["objects"]),
+                style="#b8b6b6",
+            )
+        render_table = Table(box=box.SIMPLE_HEAD, expand=True, header_style="bold #69b4ff", padding=(0, 1), show_edge=False)
+        for column in ["Widget", "Renders", "p50", "p95", "Max", "Total"]:
+            render_table.add_column(
+                column, no_wrap=True, ratio=1 if column == "Widget" else None, justify="left" if column == "Widget" else "right"
+            )
+        for row in renders:
+            render_table.add_row(
+                Text(row["widget"], style="white"),
+                str(row["renders"]),
+                ms(row["p50_ms"]),
+                ms(row["p95_ms"]),
+                ms(row["max_ms"]),
+                ms(row["total_ms"]),
+                style="#b8b6b6",
+            )
+        return Panel(
+            Group(api_table, render_table),
+            title=f"[bold]Stats[/bold] - {len(api)} endpoints, {sum(row['calls'] for row in api)} requests",
+            subtitle=f"x exports to {STATS_PATH}",
+            border_style="#69b4ff",
+            height=self.size.height or None,
+        )
@@ -0,0 +1,86 @@
+import asyncio
+
+from rich import box
+from rich.panel import Panel
+from rich.table import Table
+from rich.text import Text
+from textual.widget import Widget
+
+from t9s.modules.kubernetes.async_commons import AsyncCommons
+from t9s.modules.kubernetes.objects import Resource
+from t9s.modules.utils.scroll import Scrollable
+from t9s.modules.utils.stats import RenderTimer
+
+
+# noinspection PyBroadException
+class TableViewer(RenderTimer, Scrollable, Widget):
+    """
+    Every object of the kind of the selected resource, one row each, with the columns the API server prints for it.
+    Rows come from a server side Table LIST, only the rows in view are turned into a rich Table.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.data = AsyncCommons(logger=self.log)
+        self.resource: Resource = Resource(json_value={"message": "No Resource Selected"})
+        self.columns: list[str] = list()
+        self.rows: list[list[str]] = list()
+        # Collection the rows were listed from
+        self.collection = None
+        self.loading: asyncio.Future = None
+        self.top = 0
+
+    def page_height(self) -> int:
+        # Panel borders and the table header
+        return max(1, self.size.height - 4)
+
+    def render(self):
+        self.top = max(0, min(self.top, len(self.rows) - self.page_height()))
+        if self.loading is not None and not self.loading.done():
+            body = Text("Loading...", style="italic #b8b6b6")
+        elif not self.columns:
+            body = Text("No Table to show")
+        else:
+            body = Table(box=box.SIMPLE_HEAD, expand=True, header_style="bold #69b4ff", padding=(0, 1), show_edge=False)
+            for column in self.columns:
+                body.add_column(column, no_wrap=True, overflow="ellipsis")
+            for row in self.rows[self.top : self.top + self.page_height()]:
+                # Table rows start with the object name
+                body.add_row(*row, style="bold white reverse" if row and row[0] == self.resource.name else "#b8b6b6")
+        end = min(len(self.rows), self.top + self.page_height())
+        position = f"{self.top + 1 if self.rows else 0}-{end}/{len(self.rows)}"
+        return Panel(
+            body,
+            title=f"[bold][#ebae3d]{self.resource.context}[/#ebae3d]/[#39cbf7]{self.resource.namespace}[/#39cbf7]/"
+            f"[white]{self.resource.kind}[/white][/bold] - {position}",
+            border_style="#69b4ff",
+            height=self.size.height or None,
+        )
+
+    async def load(self, resource: Resource) -> None:
+        try:
+            table = await self.data.get_kind_table(resource)
+        except Exception as err:
+            self.log(f"Listing {resource.collection} as Table failed: {err}")
+            table = None
+        self.columns, self.rows = table or (list(), list())
+        self.top = next((i for i, row in enumerate(self.rows) if row and row[0] == resource.name), 0)
+        self.refresh()
+
+    def reload(self) -> None:
+        self.loading.cancel() if self.loading else None
+        self.collection = self.resource.collection
+        self.columns, self.rows = list(), list()
+        self.loading = asyncio.ensure_future(self.load(self.resource)) if self.collection else None
+        self.refresh()
+
+    def update_resource(self, resource: Resource) -> None:
+        self.resource = resource
+        # Listing is only worth it while the table is shown, show() catches up otherwise
+        if self.visible and resource.collection != self.collection:
+            self.reload()
+        self.refresh()
+
+    def show(self) -> None:
+        self.visible = True
+        self.reload()
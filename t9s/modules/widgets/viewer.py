@@ -1,46 +1,123 @@
-import json
-import yaml
+import asyncio
+
+from rich.cells import cell_len
 from rich.console import RenderableType
 from rich.panel import Panel
 from rich.syntax import Syntax
 from rich.traceback import Traceback
 from textual.widget import Widget
 
+from t9s.modules.kubernetes.async_commons import AsyncCommons
+from t9s.modules.kubernetes.full_objects import FullObjectCache
+from t9s.modules.kubernetes.informer import informers
 from t9s.modules.kubernetes.objects import Resource
 from t9s.modules.utils.enums import ObjectViewerFormat
+from t9s.modules.utils.render_cache import RenderCache
+from t9s.modules.utils.scroll import Scrollable
+from t9s.modules.utils.stats import RenderTimer
 
 
 # noinspection PyBroadException
-class ObjectViewer(Widget):
+class ObjectViewer(RenderTimer, Scrollable, Widget):
+    """
+    Scrolls by itself and only highlights the lines in view, so the cost of a repaint does not depend on the size of
+    the document. Big string values are folded unless folding is switched off.
+    Listed resources only carry metadata, their full object is fetched in the background and shown once it arrives.
+    """
+
     def __init__(self):
         super().__init__()
+        self.data = AsyncCommons(logger=self.log)
+        # Keys of full objects being fetched, or whose fetch failed
+        self.fetching = set()
         self.resource: Resource = Resource(json_value={"message": "No Resource Selected"})
         self.format: ObjectViewerFormat = ObjectViewerFormat.YAML
+        # Hide managedFields and friends, the cached object itself is never modified
+        self.stripped = True
+        self.folded = True
+        self.document_cache = RenderCache()
+        self.text = ""
+        self.lines: list[str] = list()
+        # First visible line
+        self.top = 0
+
+    def full_object(self, resource: Resource) -> Resource:
+        if not resource.partial:
+            return resource
+        full = self.data.commons.full_objects.get(resource)
+        key = FullObjectCache.key(resource)
+        if full is None and key not in self.fetching:
+            self.fetching.add(key)
+            asyncio.ensure_future(self.fetch(resource, key))
+        return full or resource
+
+    async def fetch(self, resource: Resource, key) -> None:
+        try:
+            full = await self.data.get_full_object(resource)
+        except Exception as err:
+            self.log(f"Fetching {resource.api_path} failed: {err}")
+            full = None
+        # A failed fetch stays in fetching so that repaints do not retry it, the next resourceVersion will
+        if full is not None:
+            self.fetching.discard(key)
+        self.refresh()
+
+    def document(self) -> list[str]:
+        text = self.document_cache.get(self.resource, self.format, stripped=self.stripped, folded=self.folded)
+        # Cache hits return the very same string, only a new document is split
+        if text is not self.text:
+            self.text = text
+            self.lines = text.splitlines()
+        return self.lines
+
+    def code_width(self) -> int:
+        # Panel borders and padding, plus the line number column rich adds
+        return max(1, self.size.width - 4 - len(str(len(self.lines))) - 3)
+
+    def window(self) -> tuple[int, int]:
+        """[start, end) of the document lines that fit in the panel"""
+        height = max(1, self.size.height - 2)
+        width = self.code_width()
+        self.top = min(self.top, max(0, len(self.lines) - 1))
+        end, rows = self.top, 0
+        while end < len(self.lines) and rows < height:
+            rows += max(1, -(-cell_len(self.lines[end]) // width))
+            end += 1
+        return self.top, end
 
     def render(self):
+        self.resource = self.full_object(informers.latest(self.resource))
         syntax: RenderableType
-        # TODO: Add toggles to give people choice to show these fields
-        self.resource.json_value["metadata"].pop("managedFields") if (
-            "metadata" in self.resource.json_value and "managedFields" in self.resource.json_value["metadata"]
-        ) else None
-
+        position = " - metadata only" if self.resource.partial else ""
         try:
-            if self.format == ObjectViewerFormat.JSON:
-                syntax = Syntax(json.dumps(self.resource.json_value, indent=2), "json", theme="native", line_numbers=True, word_wrap=True)
-            else:
-                syntax = Syntax(
-                    yaml.safe_dump(yaml.safe_load(json.dumps(self.resource.json_value))), "yaml", theme="native", line_numbers=True, word_wrap=True
-                )
+            lines = self.document()
+            start, end = self.window()
+            # An unfolded multi-megabyte line can not show more than a panel full of characters anyway
+            limit = max(1, self.size.height) * self.code_width()
+            code = "\n".join(line[:limit] for line in lines[start:end])
+            syntax = Syntax(code, self.format.value, theme="native", line_numbers=True, word_wrap=True, start_line=start + 1)
+            position += f" - {start + 1}-{end}/{len(lines)}"
         except Exception:
             syntax = Traceback(theme="monokai", width=None, show_locals=True)
         return Panel(
             syntax,
-            title=f"[bold][#ebae3d]{self.resource.context}[/#ebae3d]/[#39cbf7]{self.resource.namespace}[/#39cbf7]/[white]{self.resource.kind}[/white]/[#b8b6b6]{self.resource.name}[/#b8b6b6][/bold]",
+            title=f"[bold][#ebae3d]{self.resource.context}[/#ebae3d]/[#39cbf7]{self.resource.namespace}[/#39cbf7]/[white]{self.resource.kind}[/white]/[#b8b6b6]{self.resource.name}[/#b8b6b6][/bold]{position}",
             border_style="#69b4ff",
+            height=self.size.height or None,
         )
 
+    def scroll_lines(self, delta) -> None:
+        self.top = max(0, min(self.top + delta, len(self.lines) - 1))
+        self.refresh()
+
+    async def key_end(self) -> None:
+        self.top = max(0, len(self.lines) - self.page_height())
+        self.refresh()
+
     def update_resource(self, resource: Resource) -> None:
         self.resource = resource
+        self.fetching.clear()
+        self.top = 0
         self.refresh(layout=True)
 
     def switch_format(self) -> None:
@@ -48,4 +125,13 @@ class ObjectViewer(Widget):
             self.format = ObjectViewerFormat.JSON
         else:
             self.format = ObjectViewerFormat.YAML
+        self.top = 0
+        self.refresh(layout=True)
+
+    def switch_stripped(self) -> None:
+        self.stripped = not self.stripped
+        self.refresh(layout=True)
+
+    def switch_folded(self) -> None:
+        self.folded = not self.folded
         self.refresh(layout=True)
@@ -0,0 +1,52 @@
+import json
+
+import pytest
+
+from t9s.modules.kubernetes.decoder import BACKENDS, Decoder, field_tree, project
+
+ITEM = {
+    "kind": "Pod",
+    "metadata": {"name": "a", "uid": "1", "labels": {"app": "x"}, "managedFields": [{"manager": "kubectl"}]},
+    "spec": {"containers": [{"name": "c"}]},
+}
+
+
+def test_field_tree():
+    assert field_tree(("metadata.name", "metadata.uid", "kind")) == {"metadata": {"name": {}, "uid": {}}, "kind": {}}
+
+
+def test_project_keeps_only_the_fields():
+    tree = field_tree(("metadata.name", "metadata.uid", "kind"))
+    assert project(ITEM, tree) == {"kind": "Pod", "metadata": {"name": "a", "uid": "1"}}
+
+
+def test_project_keeps_whole_subtree():
+    assert project(ITEM, field_tree(("metadata.labels", "spec"))) == {"metadata": {"labels": {"app": "x"}}, "spec": ITEM["spec"]}
+
+
+def test_project_skips_missing_fields():
+    assert project(ITEM, field_tree(("metadata.namespace", "status.phase"))) == {"metadata": {}}
+
+
+def test_project_keeps_non_dict_values():
+    assert project({"metadata": None, "spec": [1, 2]}, field_tree(("metadata.name", "spec.x"))) == {"metadata": None, "spec": [1, 2]}
+
+
+def test_project_empty_tree_keeps_value():
+    assert project(ITEM, {}) is ITEM
+
+
+def test_unknown_backend_falls_back_to_installed():
+    assert Decoder("yaml").backend in BACKENDS
+    assert Decoder("json").backend == "json"
+
+
+@pytest.mark.parametrize("backend", [backend for backend in BACKENDS if Decoder.installed(backend)])
+def test_backends_decode_alike(backend):
+    decoder = Decoder(backend)
+    body = json.dumps({"metadata": {"resourceVersion": "7"}, "items": [ITEM, ITEM]}).encode()
+    assert decoder.loads(body)["items"] == [ITEM, ITEM]
+    assert decoder.loads_list(body, ("metadata.name", "kind")) == {
+        "metadata": {"resourceVersion": "7"},
+        "items": [{"kind": "Pod", "metadata": {"name": "a"}}] * 2,
+    }
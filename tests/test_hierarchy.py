@@ -0,0 +1,91 @@
+from t9s.modules.kubernetes.hierarchy import ResourceIndex
+from t9s.modules.kubernetes.objects import Resource
+
+
+def resource(uid, owner=None):
+    return Resource(name=uid, kind="Pod", context="c", namespace="n", uid=uid, owner=owner)
+
+
+def tree():
+    # deploy -> rs -> pod1, pod2 and a pod owned by something that is not listed
+    return ResourceIndex([resource("deploy"), resource("rs", "deploy"), resource("pod1", "rs"), resource("pod2", "rs"), resource("orphan", "gone")])
+
+
+def uids(resources):
+    return [r.uid for r in resources]
+
+
+def test_roots_include_objects_with_unknown_owner():
+    assert uids(tree().roots()) == ["deploy", "orphan"]
+
+
+def test_children():
+    index = tree()
+    assert uids(index.get_children("rs")) == ["pod1", "pod2"]
+    assert index.has_children("deploy")
+    assert not index.has_children("pod1")
+
+
+def test_children_added_before_their_owner():
+    index = ResourceIndex([resource("pod", "rs")])
+    assert index.is_root(index.get("pod"))
+    index.add(resource("rs"))
+    assert uids(index.roots()) == ["rs"]
+    assert uids(index.get_children("rs")) == ["pod"]
+
+
+def test_add_returns_the_replaced_resource():
+    index = tree()
+    previous = index.get("pod1")
+    assert index.add(resource("pod1", "rs")) is previous
+    assert index.add(resource("new")) is None
+    assert len(index) == 6
+
+
+def test_add_reparents_on_owner_change():
+    index = tree()
+    index.add(resource("rs2", "deploy"))
+    index.add(resource("pod1", "rs2"))
+    assert uids(index.get_children("rs")) == ["pod2"]
+    assert uids(index.get_children("rs2")) == ["pod1"]
+
+
+def test_remove():
+    index = tree()
+    assert index.remove("pod1").uid == "pod1"
+    assert index.remove("pod1") is None
+    assert "pod1" not in index
+    assert uids(index.get_children("rs")) == ["pod2"]
+    index.remove("pod2")
+    assert not index.has_children("rs")
+
+
+def test_removed_owner_makes_children_roots():
+    index = tree()
+    index.remove("deploy")
+    assert uids(index.roots()) == ["rs", "orphan"]
+
+
+def test_walk_is_depth_first():
+    assert uids(tree().walk("deploy")) == ["rs", "pod1", "pod2"]
+    assert uids(tree().walk("pod1")) == []
+
+
+def test_walk_survives_owner_cycles():
+    index = ResourceIndex([resource("a", "c"), resource("b", "a"), resource("c", "b")])
+    assert uids(index.walk("a")) == ["b", "c"]
+    assert not index.roots()
+
+
+def test_is_owned_by():
+    index = tree()
+    assert index.is_owned_by("pod1", "rs")
+    assert index.is_owned_by("pod1", "deploy")
+    assert not index.is_owned_by("deploy", "pod1")
+    assert not index.is_owned_by("orphan", "deploy")
+
+
+def test_is_owned_by_survives_owner_cycles():
+    index = ResourceIndex([resource("a", "b"), resource("b", "a")])
+    assert index.is_owned_by("a", "b")
+    assert not index.is_owned_by("a", "x")
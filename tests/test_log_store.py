@@ -0,0 +1,108 @@
+from t9s.modules.kubernetes.objects import LogEvent
+from t9s.modules.utils.log_store import LogStore
+
+
+def event(stream, ts, msg=None):
+    return LogEvent(group=stream, msg=msg or ts, ts=ts, stream=stream)
+
+
+def store(**kwargs):
+    return LogStore(**{"max_lines": 100, "max_bytes": 1 << 20, "grace": 1.0, **kwargs})
+
+
+def test_flush_merges_streams_in_timestamp_order():
+    logs = store()
+    for e in [event("a", "01"), event("a", "03"), event("b", "02"), event("b", "04")]:
+        logs.add(e, now=0)
+    # Both streams reached 03, so 04 could still be preceded by a line of a
+    assert logs.flush(now=0) == 3
+    assert list(logs) == ["a: 01", "b: 02", "a: 03"]
+    logs.add(event("a", "05"), now=0.5)
+    assert logs.flush(now=0.5) == 1
+    assert list(logs)[-1] == "b: 04"
+
+
+def test_flush_waits_for_a_quiet_stream_during_grace():
+    logs = store()
+    logs.add(event("a", "01"), now=0)
+    logs.add(event("b", "05"), now=0)
+    logs.add(event("b", "06"), now=0.8)
+    assert logs.flush(now=0.8) == 1
+    assert list(logs) == ["a: 01"]
+    # a has been quiet for longer than the grace, b no longer waits for it
+    assert logs.flush(now=1.5) == 2
+    assert list(logs) == ["a: 01", "b: 05", "b: 06"]
+
+
+def test_flush_releases_lines_held_longer_than_grace():
+    logs = store()
+    logs.add(event("a", "01"), now=0)
+    logs.add(event("b", "05"), now=0)
+    # a keeps talking but stays behind, b's line is not held back forever
+    logs.add(event("a", "02"), now=1.2)
+    assert logs.flush(now=1.2) == 3
+    assert list(logs) == ["a: 01", "a: 02", "b: 05"]
+
+
+def test_flush_force_merges_everything():
+    logs = store()
+    logs.add(event("a", "01"), now=0)
+    logs.add(event("b", "02"), now=0)
+    assert logs.flush(now=0, force=True) == 2
+
+
+def test_out_of_order_lines_of_a_stream_are_sorted():
+    logs = store()
+    for ts in ["03", "01", "02"]:
+        logs.add(event("a", ts), now=0)
+    logs.flush(now=0, force=True)
+    assert list(logs) == ["a: 01", "a: 02", "a: 03"]
+
+
+def test_version_changes_only_when_lines_are_merged():
+    logs = store()
+    assert logs.flush(now=0) == 0
+    assert logs.version == 0
+    logs.add(event("a", "01"), now=0)
+    logs.flush(now=0)
+    assert logs.version == 1
+
+
+def test_line_budget_evicts_oldest():
+    logs = store(max_lines=3)
+    for i in range(5):
+        logs.add(event("a", f"{i:02}"), now=0)
+    logs.flush(now=0, force=True)
+    assert list(logs) == ["a: 02", "a: 03", "a: 04"]
+    assert len(logs) == 3
+    assert logs.dropped == 2
+    assert logs[0] == "a: 02"
+    assert logs.text() == "a: 02\na: 03\na: 04\n"
+
+
+def test_byte_budget_evicts_oldest():
+    # Every line is "a: NN" plus its newline
+    logs = store(max_bytes=13)
+    for i in range(4):
+        logs.add(event("a", f"{i:02}"), now=0)
+    logs.flush(now=0, force=True)
+    assert list(logs) == ["a: 02", "a: 03"]
+    assert logs.bytes == 12
+    assert logs.dropped == 2
+
+
+def test_messages_are_escaped():
+    logs = store()
+    logs.add(event("a", "01", msg="[red]x[/red]"), now=0)
+    logs.flush(now=0, force=True)
+    assert logs[0] == "a: \\[red]x\\[/red]"
+
+
+def test_clear():
+    logs = store()
+    logs.add(event("a", "01"), now=0)
+    logs.flush(now=0, force=True)
+    logs.add(event("a", "02"), now=0)
+    logs.clear()
+    assert len(logs) == 0 and logs.text() == ""
+    assert logs.flush(now=0, force=True) == 0
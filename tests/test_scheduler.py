@@ -0,0 +1,65 @@
+import time
+from email.utils import formatdate
+from types import SimpleNamespace
+
+import pytest
+
+from t9s.modules.kubernetes.scheduler import TokenBucket, retry_after
+
+
+def error(**headers):
+    return SimpleNamespace(status=429, headers=headers)
+
+
+def test_retry_after_seconds():
+    assert retry_after(error(**{"Retry-After": "3"})) == 3.0
+    assert retry_after(error(**{"Retry-After": "0.5"})) == 0.5
+
+
+def test_retry_after_negative_seconds_is_zero():
+    assert retry_after(error(**{"Retry-After": "-2"})) == 0.0
+
+
+def test_retry_after_http_date():
+    assert retry_after(error(**{"Retry-After": formatdate(time.time() + 10, usegmt=True)})) == pytest.approx(10, abs=1.5)
+
+
+def test_retry_after_date_without_zone_is_gmt():
+    date = formatdate(time.time() + 10, usegmt=True).replace(" GMT", " -0000")
+    assert retry_after(error(**{"Retry-After": date})) == pytest.approx(10, abs=1.5)
+
+
+def test_retry_after_past_date_is_zero():
+    assert retry_after(error(**{"Retry-After": formatdate(time.time() - 60, usegmt=True)})) == 0.0
+
+
+@pytest.mark.parametrize("headers", [{}, {"Retry-After": ""}, {"Retry-After": "soon"}])
+def test_retry_after_missing_or_malformed(headers):
+    assert retry_after(error(**headers)) is None
+
+
+def test_retry_after_without_headers():
+    assert retry_after(Exception("connection refused")) is None
+    assert retry_after(SimpleNamespace(headers=None)) is None
+
+
+def test_token_bucket_allows_burst():
+    bucket = TokenBucket(qps=10, burst=5)
+    assert [bucket.reserve() for _ in range(5)] == [0.0] * 5
+
+
+def test_token_bucket_waits_after_burst():
+    bucket = TokenBucket(qps=10, burst=2)
+    bucket.reserve(), bucket.reserve()
+    # Waiters queue up behind each other, one token every 1 / qps
+    waits = [bucket.reserve() for _ in range(3)]
+    assert waits == pytest.approx([0.1, 0.2, 0.3], abs=0.01)
+    assert bucket.tokens == pytest.approx(-3, abs=0.1)
+
+
+def test_token_bucket_refills_up_to_burst():
+    bucket = TokenBucket(qps=10, burst=2)
+    bucket.reserve(), bucket.reserve()
+    bucket.updated -= 60
+    assert bucket.reserve() == 0.0
+    assert bucket.tokens == pytest.approx(1)
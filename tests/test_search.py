@@ -0,0 +1,119 @@
+import pytest
+
+from t9s.modules.kubernetes.objects import Resource
+from t9s.modules.kubernetes.search import MAX_RANKED, MAX_SCANNED, SearchIndex
+
+
+def resource(name, uid=None, ctx="c", ns="default", kind="Pod", labels=None):
+    return Resource(
+        name=name, kind=kind, context=ctx, namespace=ns, uid=uid or f"{ctx}/{ns}/{name}", json_value={"metadata": {"labels": labels or {}}}
+    )
+
+
+def names(resources):
+    return [r.name for r in resources]
+
+
+@pytest.fixture
+def index():
+    index = SearchIndex()
+    for r in [
+        resource("nginx", labels={"app": "nginx"}),
+        resource("nginx-backup", ns="backup"),
+        resource("api-server", labels={"tier": "backend"}),
+        resource("redis", kind="StatefulSet", labels={"app": "cache"}),
+    ]:
+        index.add(r)
+    return index
+
+
+def docs(index, postings):
+    return {index.docs[doc].name for posting in postings for doc in posting}
+
+
+def test_term_postings_of_a_short_term_match_starts_of_names_and_values(index):
+    assert docs(index, index.term_postings("ng")) == {"nginx", "nginx-backup"}
+    # api-server only has "ap" inside the name, the app label starts a value
+    assert docs(index, index.term_postings("ap")) == {"nginx", "redis", "api-server"}
+    assert docs(index, index.term_postings("x")) == set()
+
+
+def test_term_postings_of_a_long_term_hold_one_posting_per_gram(index):
+    postings = index.term_postings("redis")
+    assert len(postings) == 3
+    assert all(docs(index, [posting]) == {"redis"} for posting in postings)
+
+
+def test_term_postings_of_an_unknown_gram_are_empty(index):
+    assert list(index.term_postings("zzz")[0]) == []
+
+
+def test_search_ranks_name_prefix_first(index):
+    assert names(index.search("nginx")) == ["nginx", "nginx-backup"]
+    assert names(index.search("backup")) == ["nginx-backup"]
+
+
+def test_search_short_term_has_no_duplicates(index):
+    # nginx is in both the name and the value posting of "ng"
+    assert names(index.search("ng")) == ["nginx", "nginx-backup"]
+
+
+def test_search_matches_every_term(index):
+    assert names(index.search("nginx backup")) == ["nginx-backup"]
+    assert names(index.search("app=cache")) == ["redis"]
+    assert names(index.search("statefulset")) == ["redis"]
+    assert index.search("nginx redis") == []
+    assert index.search("  ") == []
+
+
+def test_search_falls_back_to_fuzzy(index):
+    assert names(index.search("nginz")) == ["nginx", "nginx-backup"]
+
+
+def test_search_is_case_insensitive(index):
+    assert names(index.search("REDIS")) == ["redis"]
+
+
+def test_search_limit(index):
+    assert len(index.search("ng", limit=1)) == 1
+
+
+def test_update_replaces_the_document(index):
+    index.add(resource("redis", labels={"app": "queue"}, kind="StatefulSet"))
+    assert names(index.search("queue")) == ["redis"]
+    assert index.search("cache") == []
+    assert len(index) == 4
+
+
+def test_remove(index):
+    index.on_delta("DELETED", resource("redis", kind="StatefulSet"))
+    assert index.search("redis") == []
+    assert len(index) == 3
+
+
+def test_remove_context(index):
+    index.add(resource("nginx", ctx="other"))
+    index.remove_context("c")
+    assert [(r.name, r.context) for r in index.search("nginx")] == [("nginx", "other")]
+    assert len(index) == 1
+
+
+def test_compact_keeps_live_documents(index):
+    index.remove("c/default/redis")
+    index.compact()
+    assert index.dead == 0
+    assert None not in index.docs
+    assert names(index.search("nginx")) == ["nginx", "nginx-backup"]
+    assert index.search("redis") == []
+
+
+def test_search_past_the_scanned_candidates():
+    index = SearchIndex()
+    for i in range(MAX_SCANNED + 10):
+        index.add(resource(f"pod-{i}", kind="Service"))
+        index.add(resource(f"web-{i}", kind="Service"))
+    for i in range(5):
+        index.add(resource(f"pod-web-{i}", kind="Service"))
+    # None of the first candidates of either term matches both, the few that do are after them
+    assert names(index.search("pod web")) == [f"pod-web-{i}" for i in range(5)]
+    assert len(index.search("pod", limit=10000)) == MAX_RANKED
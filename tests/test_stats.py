@@ -0,0 +1,27 @@
+import pytest
+
+from t9s.modules.utils.stats import describe_path
+
+
+@pytest.mark.parametrize(
+    "path, watch, expected",
+    [
+        ("/api/v1/namespaces/a/pods", False, ("pods", "list")),
+        ("/api/v1/namespaces/a/pods/b", False, ("pods", "get")),
+        ("/api/v1/namespaces/a/pods/b/log", False, ("pods/log", "get")),
+        ("/api/v1/namespaces/a/pods", True, ("pods", "watch")),
+        ("/api/v1/namespaces", False, ("namespaces", "list")),
+        ("/api/v1/namespaces/a", False, ("namespaces", "get")),
+        ("/api/v1/nodes", False, ("nodes", "list")),
+        ("/apis/apps/v1/namespaces/a/deployments", False, ("deployments.apps", "list")),
+        ("/apis/apps/v1/namespaces/a/deployments/b", False, ("deployments.apps", "get")),
+        ("/apis/apps/v1/deployments", True, ("deployments.apps", "watch")),
+        ("/api", False, ("discovery", "get")),
+        ("/api/v1", False, ("discovery", "get")),
+        ("/apis", False, ("discovery", "get")),
+        ("/apis/apps/v1", False, ("discovery", "get")),
+        ("/version", False, ("discovery", "get")),
+    ],
+)
+def test_describe_path(path, watch, expected):
+    assert describe_path(path, watch=watch) == expected